@@ -1,11 +1,23 @@
 import streamlit as st
 import streamlit_authenticator as stauth
-from youtube_transcript_api import YouTubeTranscriptApi
-import openai
 from dotenv import load_dotenv
-import re
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+import os
+import time
+from auth import get_auth_config
+from jobs import ACTIVE_STATUSES, DONE, FAILED, get_job_queue
+from caption_parser import format_timestamp
+from metrics import record_stage, stage, start_metrics_server, trace_request
+from prefetch import start_prefetcher
+from search_index import get_search_index, index_video, video_url
+from summarizer import (
+    caption_fragments,
+    extract_video_id,
+    get_video_cues,
+    generate_summary_with_gpt4,
+    list_caption_tracks,
+    normalize_captions,
+    stream_summary_with_gpt4,
+)
 
 # Load environment variables
 load_dotenv()
@@ -17,191 +29,165 @@ st.set_page_config(
     layout="wide"
 )
 
+# Seconds between refreshes while a background job is running
+JOB_POLL_SECONDS = float(os.getenv('JOB_POLL_SECONDS', '1.5'))
+
+# Prometheus metrics endpoint (started once per process)
+if os.getenv('METRICS_PORT'):
+    start_metrics_server(int(os.getenv('METRICS_PORT')))
+
+# Warm captions (and summaries) of watched channels and playlists in the background
+if os.getenv('PREFETCH_CHANNELS') or os.getenv('PREFETCH_PLAYLISTS'):
+    start_prefetcher()
+
 # Authentication configuration
 def setup_authentication():
-    """Setup authentication with the specified credentials"""
-    config = {
-        'credentials': {
-            'usernames': {
-                'Marco': {
-                    'email': 'marco@example.com',
-                    'name': 'Marco',
-                    'password': stauth.Hasher(['P@oComOvo13']).generate()[0]
-                }
-            }
-        },
-        'cookie': {
-            'expiry_days': 30,
-            'key': 'youtube_summarizer_key',
-            'name': 'youtube_summarizer_cookie'
-        }
-    }
-    return config
+    """Setup authentication with the pre-hashed credentials (loaded once per process)"""
+    return get_auth_config()
 
-def extract_video_id(url):
-    """Extract YouTube video ID from various URL formats"""
-    patterns = [
-        r'(?:youtube\.com\/watch\?v=|youtu\.be\/|youtube\.com\/embed\/)([^&\n?#]+)',
-        r'youtube\.com\/watch\?.*v=([^&\n?#]+)'
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, url)
-        if match:
-            return match.group(1)
-    return None
-
-def get_video_captions(video_id, youtube_api_key=None, preferred_language=None):
-    """Download captions for a YouTube video using YouTube Data API v3 or fallback to youtube-transcript-api"""
-    
-    # If no YouTube API key provided, use fallback method
-    if not youtube_api_key:
-        st.info("ℹ️ Using fallback method (youtube-transcript-api) - for better results, add YouTube Data API key")
-        return get_video_captions_fallback(video_id, preferred_language)
+def render_summary_stream(captions, api_key, video_id=None, refresh_interval=0.1):
+    """Render the summary progressively as tokens stream in and return the final text"""
+    summary_placeholder = st.empty()
+    partial_area = None
+    partial_placeholders = []
+    partial_texts = []
+    changed = set()  # Partial summaries to redraw at the next render
+    summary_text = ""
+    last_render = 0.0
+    render_started = time.monotonic()
+    render_seconds = 0.0
+    render_updates = 0
     
     try:
-        # Build YouTube API service
-        youtube = build('youtube', 'v3', developerKey=youtube_api_key)
-        
-        # First, get available caption tracks
-        captions_response = youtube.captions().list(
-            part='snippet',
-            videoId=video_id
-        ).execute()
-        
-        if not captions_response.get('items'):
-            st.error("❌ No captions found for this video.")
-            return None
-        
-        # Display available captions
-        st.info("ℹ️ Available captions:")
-        available_captions = []
-        for caption in captions_response['items']:
-            lang = caption['snippet']['language']
-            is_auto = caption['snippet'].get('trackKind') == 'ASR'
-            caption_type = "Auto-generated" if is_auto else "Manual"
-            caption_id = caption['id']
-            available_captions.append({
-                'id': caption_id,
-                'language': lang,
-                'is_auto': is_auto,
-                'type': caption_type
-            })
-            st.write(f"• {lang} - {caption_type}")
-        
-        # Find the best caption to use
-        caption_to_use = None
-        
-        # If preferred language is specified, try to find it
-        if preferred_language:
-            for caption in available_captions:
-                if caption['language'] == preferred_language:
-                    caption_to_use = caption
-                    break
-        
-        # If no preferred language or not found, try English variants
-        if not caption_to_use:
-            for lang in ['en', 'en-US', 'en-GB']:
-                for caption in available_captions:
-                    if caption['language'] == lang:
-                        caption_to_use = caption
-                        break
-                if caption_to_use:
-                    break
-        
-        # If still no caption found, use the first available
-        if not caption_to_use and available_captions:
-            caption_to_use = available_captions[0]
-        
-        if not caption_to_use:
-            st.error("❌ No suitable captions found.")
-            return None
-        
-        st.success(f"✅ Using captions: {caption_to_use['language']} ({caption_to_use['type']})")
-        
-        # Download the caption content
-        caption_response = youtube.captions().download(
-            id=caption_to_use['id'],
-            tfmt='srt'  # SubRip format
-        ).execute()
-        
-        # Parse the SRT content
-        srt_content = caption_response.decode('utf-8')
-        captions = []
-        
-        # Simple SRT parser
-        lines = srt_content.strip().split('\n')
-        i = 0
-        while i < len(lines):
-            line = lines[i].strip()
-            if line.isdigit():  # Subtitle number
-                i += 1  # Skip timestamp line
-                i += 1  # Move to text
-                text_lines = []
-                while i < len(lines) and lines[i].strip():
-                    text_lines.append(lines[i].strip())
-                    i += 1
-                if text_lines:
-                    captions.append(' '.join(text_lines))
-            i += 1
-        
-        return ' '.join(captions)
-        
-    except HttpError as e:
-        error_details = e.error_details[0] if e.error_details else {}
-        reason = error_details.get('reason', 'Unknown error')
-        
-        if reason == 'quotaExceeded':
-            st.error("❌ YouTube API quota exceeded. Please try again later or use a different API key.")
-        elif reason == 'forbidden':
-            st.error("❌ Access denied. The video might be private or restricted.")
-        elif reason == 'notFound':
-            st.error("❌ Video not found or captions not available.")
-        else:
-            st.error(f"❌ YouTube API error: {reason}")
-        
-        return None
-        
+        for event in stream_summary_with_gpt4(captions, api_key, video_id=video_id):
+            if event.kind == 'plan' and event.index > 1 and partial_area is None:
+                # One live area per chunk, added as chunks start (the count is an estimate at first)
+                partial_area = st.expander("🧩 Partial summaries", expanded=True)
+            elif event.kind in ('changes', 'waiting'):
+                st.info(event.text)
+            elif event.kind == 'delta':
+                if partial_area is not None:
+                    while len(partial_placeholders) <= event.index:
+                        with partial_area:
+                            partial_placeholders.append(st.empty())
+                        partial_texts.append("")
+                    partial_texts[event.index] += event.text
+                    changed.add(event.index)
+                else:
+                    summary_text += event.text
+            elif event.kind == 'reduce':
+                summary_text += event.text
+            elif event.kind == 'done':
+                summary_text = event.text
+            
+            # Throttle re-renders; Streamlit sends the whole element on every update
+            now = time.monotonic()
+            if event.kind in ('chunk_done', 'done') or now - last_render >= refresh_interval:
+                for index in sorted(changed):
+                    partial_placeholders[index].markdown(partial_texts[index] or "⏳ ...")
+                changed.clear()
+                if summary_text:
+                    summary_placeholder.markdown(summary_text + ("" if event.kind == 'done' else " ▌"))
+                last_render = time.monotonic()
+                render_seconds += last_render - now
+                render_updates += 1
     except Exception as e:
-        st.error(f"❌ Error downloading captions: {str(e)}")
+        st.error(f"Error generating summary: {str(e)}")
         return None
+    finally:
+        record_stage('render', render_started, render_seconds, detail=f"{render_updates} updates")
+    
+    return summary_text or None
 
-def generate_summary_with_gpt4(captions, api_key):
-    """Generate summary using OpenAI GPT-4"""
-    try:
-        client = openai.OpenAI(api_key=api_key)
-        
-        # Split captions if too long (GPT-4 has token limits)
-        max_chunk_size = 8000  # Conservative limit
-        if len(captions) > max_chunk_size:
-            chunks = [captions[i:i+max_chunk_size] for i in range(0, len(captions), max_chunk_size)]
-        else:
-            chunks = [captions]
-        
-        summaries = []
-        for i, chunk in enumerate(chunks):
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a helpful assistant that creates concise, well-structured summaries of YouTube video content based on captions. Focus on the main points, key insights, and important details."
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Please create a comprehensive summary of this YouTube video based on its captions. Organize the summary with clear sections and bullet points where appropriate:\n\n{chunk}"
-                    }
-                ],
-                max_tokens=1000,
-                temperature=0.7
+def render_trace(totals, rows, expander=True):
+    """Show where the time of one request went
+
+    Streamlit does not allow nested expanders, so pass expander=False when the
+    trace is drawn inside one.
+    """
+    if expander:
+        with st.expander("🔍 Request trace", expanded=True):
+            render_trace(totals, rows, expander=False)
+        return
+    cols = st.columns(5)
+    cols[0].metric("Total time", f"{totals['total_seconds']:.2f}s")
+    cols[1].metric("Prompt tokens", totals['prompt_tokens'])
+    cols[2].metric("Completion tokens", totals['completion_tokens'])
+    cols[3].metric("Cache hits / misses", f"{totals['cache_hits']} / {totals['cache_misses']}")
+    cols[4].metric("YouTube quota units", totals['youtube_quota_units'])
+    if rows:
+        st.table(rows)
+
+def render_job(job, show_trace=False):
+    """Show the progress or the result of one background job (drawn inside its expander)"""
+    if job['status'] in ACTIVE_STATUSES:
+        st.progress(min(1.0, job['progress']), text=f"⏳ {job['message']}")
+        if job['partial']:
+            st.markdown(job['partial'] + " ▌")
+    elif job['status'] == FAILED:
+        st.error(f"❌ {job['error'] or 'Job failed'}")
+    elif job['status'] == DONE:
+        result = job['result']
+        # Tabs rather than expanders: the job is already drawn inside an expander
+        trace = result.get('trace') if show_trace else None
+        tabs = st.tabs(["📝 Summary", "📄 Captions"] + (["🔍 Request trace"] if trace else []))
+        with tabs[0]:
+            st.markdown(result['summary'])
+            st.download_button(
+                label="📥 Download Summary",
+                data=result['summary'],
+                file_name=f"youtube_summary_{job['video_id']}.txt",
+                mime="text/plain",
+                key=f"download_{job['id']}"
             )
-            summaries.append(response.choices[0].message.content)
-        
-        return '\n\n'.join(summaries)
+        with tabs[1]:
+            st.text_area("Full Captions", result['captions'], height=200, key=f"captions_{job['id']}")
+        if trace:
+            with tabs[2]:
+                render_trace(trace['summary'], trace['rows'], expander=False)
     
-    except Exception as e:
-        st.error(f"Error generating summary: {str(e)}")
-        return None
+    if job['status'] not in ACTIVE_STATUSES:
+        if st.button("🗑️ Remove", key=f"remove_{job['id']}"):
+            get_job_queue().delete(job['id'])
+            st.rerun()
+
+def render_jobs(username, show_trace=False):
+    """List the user's background jobs and return True while any of them is still running"""
+    jobs = get_job_queue().list_jobs(username)
+    if not jobs:
+        return False
+    
+    st.subheader("🗂️ Your Summaries")
+    status_icons = {'queued': '🕒', 'running': '⏳', DONE: '✅', FAILED: '❌'}
+    active_job_id = st.session_state.get('active_job_id')
+    for job in jobs:
+        expanded = job['id'] == active_job_id or job['status'] in ACTIVE_STATUSES
+        label = f"{status_icons.get(job['status'], '')} {job['video_id']} - {time.strftime('%Y-%m-%d %H:%M', time.localtime(job['created_at']))}"
+        with st.expander(label, expanded=expanded):
+            render_job(job, show_trace)
+    return any(job['status'] in ACTIVE_STATUSES for job in jobs)
+
+def render_search():
+    """Full-text search over every transcript and summary processed so far"""
+    query = st.text_input(
+        "🔎 Search transcripts and summaries",
+        placeholder='e.g. "gradient descent" learning rate',
+        help="Searches every video summarized on this server; quote words to match an exact phrase"
+    )
+    if not query:
+        return
+    
+    started = time.perf_counter()
+    hits = get_search_index().search(query, limit=20)
+    elapsed = (time.perf_counter() - started) * 1000
+    if not hits:
+        st.info("ℹ️ No matching transcripts or summaries")
+        return
+    
+    st.caption(f"{len(hits)} results in {elapsed:.0f} ms")
+    for hit in hits:
+        where = format_timestamp(hit.start) if hit.kind == 'caption' else "summary"
+        st.markdown(f"**{where}** · [{hit.video_id}]({video_url(hit.video_id, hit.start)}) — {hit.snippet}")
 
 def main():
     # Setup authentication
@@ -227,6 +213,7 @@ def main():
     if authentication_status:
         st.title("🎬 YouTube Caption Summarizer")
         st.markdown("Download YouTube video captions and generate AI-powered summaries using GPT-4")
+        render_search()
         
         # Sidebar for logout
         with st.sidebar:
@@ -264,8 +251,31 @@ def main():
                 help="Enter your OpenAI API key to use GPT-4"
             )
             
+            stream_summary = st.checkbox(
+                "Stream summary as it is generated",
+                value=True,
+                help="Show the summary token by token instead of waiting for the full result"
+            )
+            include_timestamps = st.checkbox(
+                "Include timestamps in summary",
+                value=False,
+                help="Cite [mm:ss] positions in the video next to key points"
+            )
+            
+            run_in_background = st.checkbox(
+                "Run in background",
+                value=True,
+                help="Keep generating while you use the page; results survive reloads and reconnects"
+            )
+            
+            show_trace = st.checkbox(
+                "Show request trace",
+                value=False,
+                help="Show per-stage timings, tokens, cache hits and quota units for this request"
+            )
+            
             if not youtube_api_key:
-                st.warning("⚠️ Please enter your YouTube Data API key to access captions")
+                st.info("ℹ️ Without a YouTube Data API key, captions are fetched with youtube-transcript-api")
             if not openai_api_key:
                 st.warning("⚠️ Please enter your OpenAI API key to generate summaries")
         
@@ -289,74 +299,80 @@ def main():
                     # Show available captions if YouTube API key is provided
                     if youtube_api_key:
                         try:
-                            youtube = build('youtube', 'v3', developerKey=youtube_api_key)
-                            captions_response = youtube.captions().list(
-                                part='snippet',
-                                videoId=video_id
-                            ).execute()
+                            available_captions = list_caption_tracks(video_id, youtube_api_key)
                             
-                            if captions_response.get('items'):
+                            if available_captions:
                                 st.info("ℹ️ Available captions for this video:")
-                                available_captions = []
-                                
-                                for caption in captions_response['items']:
-                                    lang = caption['snippet']['language']
-                                    is_auto = caption['snippet'].get('trackKind') == 'ASR'
-                                    caption_type = "Auto-generated" if is_auto else "Manual"
-                                    available_captions.append({
-                                        'id': caption['id'],
-                                        'language': lang,
-                                        'is_auto': is_auto,
-                                        'type': caption_type
-                                    })
-                                    st.write(f"• {lang} - {caption_type}")
+                                for caption in available_captions:
+                                    st.write(f"• {caption['language']} - {caption['type']}")
                                 
                                 # Language selection dropdown
-                                if available_captions:
-                                    st.subheader("🌐 Language Selection")
-                                    language_options = [f"{caption['language']} ({caption['type']})" for caption in available_captions]
-                                    
-                                    selected_language = st.selectbox(
-                                        "Choose caption language:",
-                                        options=language_options,
-                                        index=0,
-                                        help="Select which language captions to use for the summary"
-                                    )
-                                    
-                                    # Get the language code from selection
-                                    selected_index = language_options.index(selected_language)
-                                    selected_lang_code = available_captions[selected_index]['language']
-                                    st.session_state.selected_lang_code = selected_lang_code
-                                else:
-                                    st.warning("⚠️ No captions found for this video")
-                                    selected_lang_code = None
-                                    st.session_state.selected_lang_code = None
+                                st.subheader("🌐 Language Selection")
+                                language_options = [f"{caption['language']} ({caption['type']})" for caption in available_captions]
+                                
+                                selected_language = st.selectbox(
+                                    "Choose caption language:",
+                                    options=language_options,
+                                    index=0,
+                                    help="Select which language captions to use for the summary"
+                                )
+                                
+                                # Remember the chosen track so the download needs no second list call
+                                selected_index = language_options.index(selected_language)
+                                selected_lang_code = available_captions[selected_index]['language']
+                                st.session_state.selected_lang_code = selected_lang_code
+                                st.session_state.selected_caption_id = available_captions[selected_index]['id']
                             else:
                                 st.warning("⚠️ No captions found for this video")
                                 selected_lang_code = None
                                 st.session_state.selected_lang_code = None
+                                st.session_state.selected_caption_id = None
                         except Exception as e:
                             st.warning("⚠️ Could not check available captions")
                             selected_lang_code = None
                             st.session_state.selected_lang_code = None
+                            st.session_state.selected_caption_id = None
                     else:
                         st.info("ℹ️ Enter YouTube API key to see available captions")
                         selected_lang_code = None
                         st.session_state.selected_lang_code = None
+                        st.session_state.selected_caption_id = None
                 else:
                     st.error("❌ Could not extract video ID from URL. Please check the URL format.")
         
         # Generate summary button
-        if st.button("🚀 Generate Summary", type="primary", disabled=not (youtube_url and youtube_api_key and openai_api_key)):
-            if youtube_url and youtube_api_key and openai_api_key:
-                with st.spinner("Downloading captions..."):
+        if st.button("🚀 Generate Summary", type="primary", disabled=not (youtube_url and openai_api_key)):
+            if youtube_url and openai_api_key and run_in_background:
+                video_id = extract_video_id(youtube_url)
+                if video_id:
+                    st.session_state.active_job_id = get_job_queue().submit(
+                        username,
+                        video_id,
+                        youtube_api_key,
+                        openai_api_key,
+                        preferred_language=st.session_state.get('selected_lang_code', None),
+                        caption_id=st.session_state.get('selected_caption_id', None),
+                        timestamps=include_timestamps
+                    )
+                    st.success("✅ Summary job queued. You can keep using the page while it runs.")
+                else:
+                    st.error("❌ Invalid YouTube URL")
+            elif youtube_url and openai_api_key:
+                with trace_request('generate') as trace, st.spinner("Downloading captions..."):
                     video_id = extract_video_id(youtube_url)
                     if video_id:
                         # Get the selected language from the session state or use None
                         selected_lang_code = st.session_state.get('selected_lang_code', None)
-                        captions = get_video_captions(video_id, youtube_api_key, selected_lang_code)
+                        selected_caption_id = st.session_state.get('selected_caption_id', None)
+                        cues = get_video_cues(
+                            video_id, youtube_api_key, selected_lang_code, ui=st, caption_id=selected_caption_id
+                        )
                         
-                        if captions:
+                        if cues:
+                            cues = normalize_captions(cues, ui=st)
+                            index_video(video_id, cues, language=selected_lang_code)
+                            captions = cues.text()
+                            summary_input = caption_fragments(cues, include_timestamps)
                             st.success("✅ Captions downloaded successfully!")
                             
                             # Display captions
@@ -364,29 +380,45 @@ def main():
                                 st.text_area("Full Captions", captions, height=200)
                             
                             # Generate summary
-                            with st.spinner("Generating summary with GPT-4..."):
-                                summary = generate_summary_with_gpt4(captions, openai_api_key)
-                                
+                            if stream_summary:
+                                st.subheader("📋 AI-Generated Summary")
+                                summary = render_summary_stream(summary_input, openai_api_key, video_id)
+                            else:
+                                with st.spinner("Generating summary with GPT-4..."):
+                                    summary = generate_summary_with_gpt4(
+                                        summary_input, openai_api_key, ui=st, video_id=video_id
+                                    )
                                 if summary:
-                                    st.success("✅ Summary generated successfully!")
-                                    
                                     # Display summary
                                     st.subheader("📋 AI-Generated Summary")
-                                    st.markdown(summary)
-                                    
-                                    # Download option
-                                    st.download_button(
-                                        label="📥 Download Summary",
-                                        data=summary,
-                                        file_name=f"youtube_summary_{video_id}.txt",
-                                        mime="text/plain"
-                                    )
-                                else:
-                                    st.error("❌ Failed to generate summary. Please check your API key and try again.")
+                                    with stage('render'):
+                                        st.markdown(summary)
+                            
+                            if summary:
+                                index_video(video_id, summary=summary)
+                                st.success("✅ Summary generated successfully!")
+                                
+                                # Download option
+                                st.download_button(
+                                    label="📥 Download Summary",
+                                    data=summary,
+                                    file_name=f"youtube_summary_{video_id}.txt",
+                                    mime="text/plain"
+                                )
+                            else:
+                                st.error("❌ Failed to generate summary. Please check your API key and try again.")
                         else:
                             st.error("❌ Failed to download captions. The video might not have captions available.")
                     else:
                         st.error("❌ Invalid YouTube URL")
+                
+                if show_trace:
+                    render_trace(trace.summary(), trace.rows())
+        
+        # Background jobs of this user, polled until they finish
+        if render_jobs(username, show_trace):
+            time.sleep(JOB_POLL_SECONDS)
+            st.rerun()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
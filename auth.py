@@ -0,0 +1,76 @@
+"""
+Login configuration for YouTube Caption Summarizer
+
+Passwords are stored as bcrypt hashes, so nothing has to be hashed while a
+page renders. The configuration is read once per process and every caller
+gets its own copy, because streamlit_authenticator modifies the dict it is given.
+"""
+
+import copy
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_AUTH_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'auth_config.yaml')
+
+# Used when no auth_config.yaml exists; the hash is the built-in demo password
+DEFAULT_AUTH_CONFIG = {
+    'credentials': {
+        'usernames': {
+            'Marco': {
+                'email': 'marco@example.com',
+                'name': 'Marco',
+                'password': '$2b$12$inbXdGbOj.rq.mfzhG1dXuhqtzHgEMkp4nt/NLVa1mIBAnc/.kpX6'
+            }
+        }
+    },
+    'cookie': {
+        'expiry_days': 30,
+        'key': 'youtube_summarizer_key',
+        'name': 'youtube_summarizer_cookie'
+    }
+}
+
+_config = None
+_config_lock = threading.Lock()
+
+
+def hash_password(password):
+    """bcrypt hash of a password, in the format streamlit_authenticator expects"""
+    import streamlit_authenticator as stauth
+    return stauth.Hasher([password]).generate()[0]
+
+
+def is_hashed(password):
+    return isinstance(password, str) and password.startswith(('$2a$', '$2b$', '$2y$'))
+
+
+def read_auth_config(path):
+    """Parse an auth config file, hashing any plain-text passwords it still contains"""
+    import yaml
+    with open(path, encoding='utf-8') as f:
+        config = yaml.safe_load(f) or {}
+    for username, user in config.get('credentials', {}).get('usernames', {}).items():
+        if not is_hashed(user.get('password')):
+            logger.warning(
+                "Password of %s in %s is not hashed; hashing it at start-up. "
+                "Store the output of `python run.py --hash-password` instead.", username, path
+            )
+            user['password'] = hash_password(str(user.get('password', '')))
+    config.setdefault('cookie', copy.deepcopy(DEFAULT_AUTH_CONFIG['cookie']))
+    return config
+
+
+def get_auth_config():
+    """Return a copy of the process-wide auth configuration"""
+    global _config
+    with _config_lock:
+        if _config is None:
+            path = os.getenv('AUTH_CONFIG_PATH', DEFAULT_AUTH_CONFIG_PATH)
+            if os.path.exists(path):
+                _config = read_auth_config(path)
+            else:
+                _config = DEFAULT_AUTH_CONFIG
+        return copy.deepcopy(_config)
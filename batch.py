@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Headless batch summarizer for YouTube Caption Summarizer
+
+Summarizes every video from a file of URLs, a playlist or a channel and
+appends one JSON record per video to an output file. Videos already
+summarized in the output file are skipped, so an interrupted job can be
+resumed by running the same command again.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from summarizer import (
+    SUMMARY_CONCURRENCY,
+    LogReporter,
+    extract_channel_id,
+    extract_playlist_id,
+    extract_video_id,
+    list_channel_video_ids,
+    list_playlist_video_ids,
+    summarize_video,
+)
+from scheduler import PRIORITY_BATCH, request_priority
+
+DONE_STATUSES = ('ok',)
+
+
+def read_url_file(path):
+    """Read video IDs from a file with one URL (or ID) per line; '#' starts a comment"""
+    video_ids = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            video_ids.append(extract_video_id(line) or line)
+    return video_ids
+
+
+def collect_video_ids(args):
+    """Gather video IDs from all inputs, keeping the first occurrence of each"""
+    video_ids = []
+    if args.urls:
+        video_ids += read_url_file(args.urls)
+    for playlist in args.playlist or []:
+        video_ids += list_playlist_video_ids(args.youtube_api_key, extract_playlist_id(playlist))
+    for channel in args.channel or []:
+        video_ids += list_channel_video_ids(args.youtube_api_key, extract_channel_id(channel))
+    return list(dict.fromkeys(video_ids))
+
+
+def load_completed(output_path):
+    """Return the IDs of videos already summarized in an existing output file"""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Partially written line from an interrupted run
+            if record.get('status') in DONE_STATUSES:
+                completed.add(record['video_id'])
+    return completed
+
+
+def process_video(video_id, args):
+    """Summarize one video and return its output record"""
+    reporter = LogReporter(prefix=f"[{video_id}] ")
+    start = time.time()
+    try:
+        # Batch work yields the OpenAI budget to interactive sessions
+        with request_priority(PRIORITY_BATCH):
+            result = summarize_video(
+                video_id,
+                args.youtube_api_key,
+                args.openai_api_key,
+                preferred_language=args.language,
+                concurrency=args.chunk_concurrency,
+                timestamps=args.timestamps,
+                ui=reporter
+            )
+    except Exception as e:
+        reporter.error(f"❌ Unexpected error: {str(e)}")
+        result = {'video_id': video_id, 'captions': None, 'summary': None}
+
+    record = {
+        'video_id': video_id,
+        'url': f"https://www.youtube.com/watch?v={video_id}",
+        'status': 'ok' if result['summary'] else 'error',
+        'summary': result['summary'],
+        'error': reporter.errors[-1] if reporter.errors and not result['summary'] else None,
+        'elapsed_seconds': round(time.time() - start, 3),
+        'finished_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    }
+    if args.include_captions:
+        record['captions'] = result['captions']
+    return record
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize YouTube videos in bulk and write the results as JSONL")
+    parser.add_argument('--urls', help="File with one YouTube URL or video ID per line")
+    parser.add_argument('--playlist', action='append', help="Playlist URL or ID (repeatable)")
+    parser.add_argument('--channel', action='append', help="Channel URL or ID (repeatable)")
+    parser.add_argument('-o', '--output', default='summaries.jsonl', help="JSONL output file (appended to)")
+    parser.add_argument('-w', '--workers', type=int, default=4, help="Videos processed in parallel")
+    parser.add_argument('--chunk-concurrency', type=int, default=SUMMARY_CONCURRENCY,
+                        help="Chunks summarized in parallel per video")
+    parser.add_argument('--language', help="Preferred caption language code, e.g. 'en'")
+    parser.add_argument('--timestamps', action='store_true', help="Ask for [mm:ss] timestamps in the summaries")
+    parser.add_argument('--include-captions', action='store_true', help="Also store the caption text")
+    parser.add_argument('--refresh', action='store_true',
+                        help="Summarize videos already done in the output file again; "
+                             "only chunks whose captions changed are sent to OpenAI")
+    parser.add_argument('--youtube-api-key', default=os.getenv('YOUTUBE_API_KEY'),
+                        help="Needed for --playlist and --channel; without it --urls uses youtube-transcript-api")
+    parser.add_argument('--openai-api-key', default=os.getenv('OPENAI_API_KEY'))
+    parser.add_argument('-v', '--verbose', action='store_true', help="Log per-video progress messages")
+    args = parser.parse_args(argv)
+
+    if not (args.urls or args.playlist or args.channel):
+        parser.error("provide at least one of --urls, --playlist or --channel")
+    # Listing playlists and channels needs the Data API; captions have a keyless fallback
+    if (args.playlist or args.channel) and not args.youtube_api_key:
+        parser.error("--playlist and --channel need a YouTube Data API key (--youtube-api-key or YOUTUBE_API_KEY)")
+    if not args.openai_api_key:
+        parser.error("an OpenAI API key is required (--openai-api-key or OPENAI_API_KEY)")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s %(levelname)s %(message)s'
+    )
+
+    print("🎬 YouTube Caption Summarizer - Batch Mode")
+    print("=" * 40)
+    if not args.youtube_api_key:
+        print("ℹ️ No YouTube Data API key: captions are fetched with youtube-transcript-api")
+
+    video_ids = collect_video_ids(args)
+    completed = set() if args.refresh else load_completed(args.output)
+    pending = [video_id for video_id in video_ids if video_id not in completed]
+    print(f"📺 {len(video_ids)} videos found, {len(video_ids) - len(pending)} already done, {len(pending)} to process")
+    if not pending:
+        return 0
+
+    write_lock = threading.Lock()
+    succeeded = failed = 0
+    executor = ThreadPoolExecutor(max_workers=max(1, args.workers))
+    try:
+        with open(args.output, 'a', encoding='utf-8') as output:
+            futures = {executor.submit(process_video, video_id, args): video_id for video_id in pending}
+            for done, future in enumerate(as_completed(futures), 1):
+                record = future.result()
+                with write_lock:
+                    output.write(json.dumps(record, ensure_ascii=False) + '\n')
+                    output.flush()
+                if record['status'] == 'ok':
+                    succeeded += 1
+                    print(f"✅ [{done}/{len(pending)}] {record['video_id']} ({record['elapsed_seconds']}s)")
+                else:
+                    failed += 1
+                    print(f"❌ [{done}/{len(pending)}] {record['video_id']}: {record['error']}")
+    except KeyboardInterrupt:
+        executor.shutdown(wait=False, cancel_futures=True)
+        print("\n👋 Interrupted - run the same command again to resume")
+        return 130
+    executor.shutdown()
+
+    print("=" * 40)
+    print(f"📋 Done: {succeeded} succeeded, {failed} failed. Results in {args.output}")
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,272 @@
+"""
+Local stand-ins for the YouTube Data API and the OpenAI chat completions API
+
+Both servers run on a background thread and inject configurable latency,
+server errors and 429 rate-limit responses, so the pipeline can be measured
+without network access, quota or spend.
+"""
+
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Caption size profiles: video IDs look like "<profile>-<anything>"
+CAPTION_PROFILES = {
+    'short': 150,        # ~10 minutes of 4-second cues
+    'long': 900,         # ~1 hour
+    'multihour': 9000,   # ~10 hour livestream
+}
+CUE_SECONDS = 4
+WORDS = (
+    "the a we this video today talk about data model system performance cache latency request "
+    "token budget stream user summary caption language python server network quota chunk "
+    "important key point example result because so and but then next finally really actually"
+).split()
+
+
+def _timestamp(seconds):
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+
+
+def generate_srt(video_id, cues=None, words_per_cue=12):
+    """Deterministic SRT payload for a video ID"""
+    if cues is None:
+        cues = CAPTION_PROFILES.get(video_id.split('-', 1)[0], CAPTION_PROFILES['short'])
+    rng = random.Random(video_id)
+    blocks = []
+    for i in range(cues):
+        start = i * CUE_SECONDS
+        text = ' '.join(rng.choice(WORDS) for _ in range(words_per_cue))
+        if i % 5 == 4:
+            text += '.'
+        blocks.append(f"{i + 1}\n{_timestamp(start)} --> {_timestamp(start + CUE_SECONDS - 0.1)}\n{video_id} {text}\n")
+    return '\n'.join(blocks)
+
+
+class FaultProfile:
+    """Latency and failure injection shared by both fake servers"""
+
+    def __init__(self, latency=0.05, jitter=0.02, error_rate=0.0, rate_limit_rate=0.0, retry_after=1, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self):
+        with self._lock:
+            jitter = self._rng.uniform(-self.jitter, self.jitter)
+        time.sleep(max(0.0, self.latency + jitter))
+
+    def fault(self):
+        """Return 429, 500 or None for the next request"""
+        with self._lock:
+            roll = self._rng.random()
+        if roll < self.rate_limit_rate:
+            return 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 500
+        return None
+
+
+class _FakeServer:
+    handler_class = None
+
+    def __init__(self, faults=None, host='127.0.0.1', port=0):
+        self.faults = faults or FaultProfile()
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
+        handler = type('Handler', (self.handler_class,), {'server_state': self})
+        self._httpd = ThreadingHTTPServer((host, port), handler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def port(self):
+        return self._httpd.server_address[1]
+
+    def count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real APIs
+    server_state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type='application/json', headers=None):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _inject_fault(self, error_body):
+        state = self.server_state
+        state.faults.delay()
+        status = state.faults.fault()
+        if status is None:
+            return False
+        state.count(f"http_{status}")
+        headers = {'Retry-After': str(state.faults.retry_after)} if status == 429 else None
+        self._send(status, json.dumps(error_body(status)), headers=headers)
+        return True
+
+
+class _YouTubeHandler(_Handler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        state = self.server_state
+
+        def error_body(status):
+            reason = 'rateLimitExceeded' if status == 429 else 'backendError'
+            return {'error': {'code': status, 'message': reason, 'errors': [{'reason': reason}]}}
+
+        if url.path.rstrip('/') == '/youtube/v3/captions':
+            state.count('captions.list')
+            if self._inject_fault(error_body):
+                return
+            video_id = query.get('videoId', [''])[0]
+            body = {
+                'kind': 'youtube#captionListResponse',
+                'items': [{
+                    'kind': 'youtube#caption',
+                    'id': f"{video_id}.en",
+                    'etag': f"etag-{video_id}",
+                    'snippet': {'videoId': video_id, 'language': 'en', 'trackKind': 'standard'},
+                }],
+            }
+            self._send(200, json.dumps(body))
+        elif url.path.startswith('/youtube/v3/captions/'):
+            state.count('captions.download')
+            if self._inject_fault(error_body):
+                return
+            caption_id = url.path.rsplit('/', 1)[-1]
+            video_id = caption_id.rsplit('.', 1)[0]
+            self._send(200, generate_srt(video_id), content_type='text/plain; charset=utf-8')
+        else:
+            self._send(404, json.dumps(error_body(404)))
+
+
+class FakeYouTubeServer(_FakeServer):
+    """Serves captions.list and captions.download for any video ID"""
+
+    handler_class = _YouTubeHandler
+
+    @property
+    def url(self):
+        # Used as the googleapiclient api_endpoint; the service path youtube/v3/ is appended
+        return f"http://127.0.0.1:{self.port}/"
+
+
+class _OpenAIHandler(_Handler):
+    def do_POST(self):
+        state = self.server_state
+        length = int(self.headers.get('Content-Length') or 0)
+        request = json.loads(self.rfile.read(length) or b'{}')
+
+        def error_body(status):
+            if status == 429:
+                return {'error': {'message': 'Rate limit reached', 'type': 'requests', 'code': 'rate_limit_exceeded'}}
+            return {'error': {'message': 'The server had an error', 'type': 'server_error', 'code': None}}
+
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send(404, json.dumps(error_body(404)))
+            return
+        state.count('chat.completions')
+        if self._inject_fault(error_body):
+            return
+
+        prompt_chars = sum(len(message.get('content', '')) for message in request.get('messages', []))
+        completion_tokens = min(int(request.get('max_tokens') or 256), state.completion_tokens)
+        rng = random.Random(prompt_chars)
+        words = [rng.choice(WORDS) for _ in range(completion_tokens)]
+        usage = {
+            'prompt_tokens': prompt_chars // 4,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_chars // 4 + completion_tokens,
+        }
+        base = {'id': 'chatcmpl-fake', 'created': int(time.time()), 'model': request.get('model', 'gpt-4')}
+
+        if not request.get('stream'):
+            time.sleep(completion_tokens / state.tokens_per_second)
+            body = dict(base, object='chat.completion', usage=usage, choices=[{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': ' '.join(words)},
+                'finish_reason': 'stop',
+            }])
+            self._send(200, json.dumps(body))
+            return
+
+        # Server-sent events, one word per chunk
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def send_event(payload):
+            data = f"data: {payload}\n\n".encode('utf-8')
+            self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+            self.wfile.flush()
+
+        for i, word in enumerate(words):
+            time.sleep(1 / state.tokens_per_second)
+            chunk = dict(base, object='chat.completion.chunk', choices=[{
+                'index': 0,
+                'delta': {'content': word if i == 0 else ' ' + word},
+                'finish_reason': None,
+            }])
+            send_event(json.dumps(chunk))
+        send_event(json.dumps(dict(base, object='chat.completion.chunk', choices=[{
+            'index': 0, 'delta': {}, 'finish_reason': 'stop',
+        }])))
+        send_event('[DONE]')
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class FakeOpenAIServer(_FakeServer):
+    """Serves /v1/chat/completions, streaming and non-streaming"""
+
+    handler_class = _OpenAIHandler
+
+    def __init__(self, faults=None, completion_tokens=150, tokens_per_second=500, **kwargs):
+        super().__init__(faults, **kwargs)
+        self.completion_tokens = completion_tokens
+        self.tokens_per_second = tokens_per_second
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}/v1"
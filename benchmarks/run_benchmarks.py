@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for the caption download and summarization pipeline
+
+Runs get_video_cues and the GPT-4 summarization against local stand-in
+servers (see fake_servers.py) and reports throughput, p50/p95/p99 latency
+and peak memory for short, long and multi-hour videos.
+
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --scenarios multihour --stream --json results.json
+    python -m benchmarks.run_benchmarks --baseline results.json --max-regression 0.2
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_servers import CAPTION_PROFILES, FakeOpenAIServer, FakeYouTubeServer, FaultProfile
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def configure_environment(youtube_server, openai_server, cache_dir, args):
+    """Point the pipeline at the fake servers; must run before summarizer is imported"""
+    os.environ.update({
+        'YOUTUBE_API_ENDPOINT': youtube_server.url,
+        'OPENAI_BASE_URL': openai_server.url,
+        'CAPTION_CACHE_PATH': os.path.join(cache_dir, 'captions.sqlite3'),
+        'SUMMARY_CACHE_PATH': os.path.join(cache_dir, 'summaries.sqlite3'),
+        'YOUTUBE_DAILY_QUOTA': str(10 ** 9),
+        'OPENAI_RPM': str(args.openai_rpm),
+        'OPENAI_TPM': str(args.openai_tpm),
+        'SCHEDULER_MAX_RETRIES': str(args.max_retries),
+        'SUMMARY_CONCURRENCY': str(args.chunk_concurrency),
+    })
+
+
+def run_request(summarizer, video_id, stream):
+    """One end-to-end request; returns per-stage timings in seconds"""
+    reporter = summarizer.LogReporter(prefix=f"[{video_id}] ")
+    started = time.perf_counter()
+    cues = summarizer.get_video_cues(video_id, 'benchmark-key', ui=reporter)
+    captions_done = time.perf_counter()
+    if not cues:
+        return {'ok': False, 'error': reporter.errors[-1] if reporter.errors else 'no captions'}
+
+    captions = summarizer.caption_fragments(summarizer.normalize_captions(cues, ui=reporter))
+    first_token = None
+    if stream:
+        summary = None
+        try:
+            for event in summarizer.stream_summary_with_gpt4(captions, 'benchmark-key'):
+                if first_token is None and event.kind in ('delta', 'reduce', 'done'):
+                    first_token = time.perf_counter()
+                if event.kind == 'done':
+                    summary = event.text
+        except Exception as e:
+            reporter.error(str(e))
+    else:
+        summary = summarizer.generate_summary_with_gpt4(captions, 'benchmark-key', ui=reporter)
+    finished = time.perf_counter()
+
+    if not summary:
+        return {'ok': False, 'error': reporter.errors[-1] if reporter.errors else 'no summary'}
+    return {
+        'ok': True,
+        'captions': captions_done - started,
+        'summary': finished - captions_done,
+        'total': finished - started,
+        'ttft': (first_token or finished) - started,
+        'cues': len(cues),
+    }
+
+
+def run_scenario(summarizer, scenario, args):
+    run_id = uuid.uuid4().hex[:8]
+    video_ids = [f"{scenario}-{run_id}-{i}" for i in range(args.requests)]
+
+    # Latency / throughput pass (unique video IDs, so every request misses the caches)
+    wall_started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(lambda video_id: run_request(summarizer, video_id, args.stream), video_ids))
+    wall = time.perf_counter() - wall_started
+
+    # Memory pass: a single request under tracemalloc (it slows Python down, so kept separate)
+    tracemalloc.start()
+    run_request(summarizer, f"{scenario}-{run_id}-memory", args.stream)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    ok = [result for result in results if result['ok']]
+    report = {
+        'scenario': scenario,
+        'cues': CAPTION_PROFILES[scenario],
+        'requests': len(results),
+        'failures': len(results) - len(ok),
+        'throughput_rps': round(len(ok) / wall, 3) if wall else 0.0,
+        'peak_memory_mib': round(peak / (1024 * 1024), 2),
+    }
+    for stage in ('captions', 'summary', 'total') + (('ttft',) if args.stream else ()):
+        values = [result[stage] for result in ok]
+        for pct in (50, 95, 99):
+            report[f"{stage}_p{pct}_ms"] = round(percentile(values, pct) * 1000, 1)
+    errors = sorted({result['error'] for result in results if not result['ok']})
+    if errors:
+        report['errors'] = errors[:5]
+    return report
+
+
+def print_report(reports, servers):
+    print()
+    header = f"{'scenario':<10} {'cues':>6} {'ok/req':>8} {'rps':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak MiB':>9}"
+    print(header)
+    print('-' * len(header))
+    for report in reports:
+        print(
+            f"{report['scenario']:<10} {report['cues']:>6} "
+            f"{report['requests'] - report['failures']:>3}/{report['requests']:<4} "
+            f"{report['throughput_rps']:>7.2f} {report['total_p50_ms']:>9.1f} {report['total_p95_ms']:>9.1f} "
+            f"{report['total_p99_ms']:>9.1f} {report['peak_memory_mib']:>9.2f}"
+        )
+    print()
+    for report in reports:
+        stages = ', '.join(
+            f"{stage} p95 {report[f'{stage}_p95_ms']:.1f} ms"
+            for stage in ('captions', 'summary', 'ttft') if f'{stage}_p95_ms' in report
+        )
+        print(f"  {report['scenario']}: {stages}")
+        for error in report.get('errors', []):
+            print(f"    ❌ {error}")
+    for name, server in servers.items():
+        print(f"  {name} server: {dict(server.stats)}")
+
+
+def compare_to_baseline(reports, baseline_path, max_regression):
+    """Return the list of regressions against a previous --json result"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {report['scenario']: report for report in json.load(f)['reports']}
+    regressions = []
+    for report in reports:
+        previous = baseline.get(report['scenario'])
+        if not previous:
+            continue
+        for key in ('total_p95_ms', 'total_p99_ms', 'peak_memory_mib'):
+            if previous.get(key) and report[key] > previous[key] * (1 + max_regression):
+                regressions.append(f"{report['scenario']} {key}: {previous[key]} -> {report[key]}")
+        if previous.get('throughput_rps') and report['throughput_rps'] < previous['throughput_rps'] * (1 - max_regression):
+            regressions.append(
+                f"{report['scenario']} throughput_rps: {previous['throughput_rps']} -> {report['throughput_rps']}"
+            )
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline against local fake YouTube/OpenAI servers")
+    parser.add_argument('--scenarios', default='short,long,multihour',
+                        help=f"Comma-separated subset of: {', '.join(CAPTION_PROFILES)}")
+    parser.add_argument('--requests', type=int, default=10, help="Requests per scenario")
+    parser.add_argument('--concurrency', type=int, default=4, help="Concurrent requests")
+    parser.add_argument('--chunk-concurrency', type=int, default=4, help="Chunks summarized in parallel")
+    parser.add_argument('--stream', action='store_true', help="Use the streaming summary path and report TTFT")
+    parser.add_argument('--youtube-latency-ms', type=float, default=80)
+    parser.add_argument('--openai-latency-ms', type=float, default=300)
+    parser.add_argument('--openai-tokens-per-second', type=float, default=500)
+    parser.add_argument('--completion-tokens', type=int, default=150)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument('--retry-after', type=float, default=0.2, help="Retry-After seconds sent with 429s")
+    parser.add_argument('--max-retries', type=int, default=5)
+    parser.add_argument('--openai-rpm', type=int, default=10 ** 6)
+    parser.add_argument('--openai-tpm', type=int, default=10 ** 9)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--json', help="Write the results to this file")
+    parser.add_argument('--baseline', help="Compare against a previous --json result")
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help="Allowed relative slowdown vs. the baseline before failing")
+    args = parser.parse_args(argv)
+    args.scenarios = [scenario.strip() for scenario in args.scenarios.split(',') if scenario.strip()]
+    unknown = [scenario for scenario in args.scenarios if scenario not in CAPTION_PROFILES]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.ERROR)
+
+    def faults(latency_ms):
+        return FaultProfile(
+            latency=latency_ms / 1000,
+            jitter=latency_ms / 4000,
+            error_rate=args.error_rate,
+            rate_limit_rate=args.rate_limit_rate,
+            retry_after=args.retry_after,
+            seed=args.seed
+        )
+
+    youtube_server = FakeYouTubeServer(faults(args.youtube_latency_ms)).start()
+    openai_server = FakeOpenAIServer(
+        faults(args.openai_latency_ms),
+        completion_tokens=args.completion_tokens,
+        tokens_per_second=args.openai_tokens_per_second
+    ).start()
+
+    print("🏁 YouTube Caption Summarizer - Offline Benchmark")
+    print("=" * 40)
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            configure_environment(youtube_server, openai_server, cache_dir, args)
+            import summarizer  # Imported late: it reads its configuration from the environment
+
+            reports = []
+            for scenario in args.scenarios:
+                print(f"⏱️  {scenario}: {args.requests} requests, concurrency {args.concurrency}...")
+                reports.append(run_scenario(summarizer, scenario, args))
+    finally:
+        youtube_server.stop()
+        openai_server.stop()
+
+    print_report(reports, {'YouTube': youtube_server, 'OpenAI': openai_server})
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'args': {k: v for k, v in vars(args).items() if k not in ('json', 'baseline')},
+                       'reports': reports}, f, indent=2)
+        print(f"\n💾 Results written to {args.json}")
+
+    if args.baseline:
+        regressions = compare_to_baseline(reports, args.baseline, args.max_regression)
+        if regressions:
+            print("\n❌ Performance regressions:")
+            for regression in regressions:
+                print(f"   - {regression}")
+            return 1
+        print("\n✅ No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
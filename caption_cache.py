@@ -0,0 +1,168 @@
+"""
+Persistent on-disk caption cache for YouTube Caption Summarizer
+"""
+
+import os
+import threading
+import time
+
+from stores import ProcessWide, open_sqlite
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'captions.sqlite3')
+ENGLISH_VARIANTS = ['en', 'en-US', 'en-GB']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS captions (
+    video_id TEXT NOT NULL,
+    language TEXT NOT NULL,
+    track_kind TEXT NOT NULL,
+    track_id TEXT,
+    etag TEXT,
+    format TEXT NOT NULL,
+    content TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    validated_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (video_id, language, track_kind)
+);
+CREATE INDEX IF NOT EXISTS captions_last_access ON captions (last_access);
+"""
+
+_COLUMNS = ['video_id', 'language', 'track_kind', 'track_id', 'etag', 'format',
+            'content', 'size', 'fetched_at', 'validated_at', 'last_access']
+
+
+class CaptionCache:
+    """SQLite-backed caption store with size/age-based LRU eviction and ETag revalidation"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=256 * 1024 * 1024,
+                 max_age=30 * 24 * 3600, revalidate_after=24 * 3600):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.revalidate_after = revalidate_after
+        self._lock = threading.Lock()
+
+        self._conn = open_sqlite(path, _SCHEMA)
+
+    def _row_to_entry(self, row):
+        return dict(zip(_COLUMNS, row)) if row else None
+
+    def find(self, video_id, preferred_language=None, track_id=None):
+        """Return the best cached track for a video, mirroring the live selection order"""
+        # A preferred language that is not cached must go upstream, it may exist there
+        languages = [preferred_language] if preferred_language else ENGLISH_VARIANTS
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM captions WHERE video_id = ? ORDER BY fetched_at",
+                (video_id,)
+            ).fetchall()
+        entries = [self._row_to_entry(row) for row in rows]
+        if not entries:
+            return None
+
+        if track_id:
+            for entry in entries:
+                if entry['track_id'] == track_id:
+                    return self._touch(entry)
+            return None
+
+        for lang in languages:
+            for entry in entries:
+                if entry['language'] == lang:
+                    return self._touch(entry)
+
+        if preferred_language:
+            return None
+        return self._touch(entries[0])
+
+    def get(self, video_id, language, track_kind):
+        """Return the cached entry for an exact (video, language, track kind) key"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM captions "
+                "WHERE video_id = ? AND language = ? AND track_kind = ?",
+                (video_id, language, track_kind)
+            ).fetchone()
+        entry = self._row_to_entry(row)
+        return self._touch(entry) if entry else None
+
+    def _touch(self, entry):
+        now = time.time()
+        entry['last_access'] = now
+        with self._lock:
+            self._conn.execute(
+                "UPDATE captions SET last_access = ? WHERE video_id = ? AND language = ? AND track_kind = ?",
+                (now, entry['video_id'], entry['language'], entry['track_kind'])
+            )
+        return entry
+
+    def is_fresh(self, entry):
+        """True if the entry was validated recently enough to serve without any API call"""
+        return time.time() - entry['validated_at'] < self.revalidate_after
+
+    def mark_validated(self, entry):
+        """Record that the upstream ETag still matches the cached copy"""
+        now = time.time()
+        entry['validated_at'] = now
+        with self._lock:
+            self._conn.execute(
+                "UPDATE captions SET validated_at = ? WHERE video_id = ? AND language = ? AND track_kind = ?",
+                (now, entry['video_id'], entry['language'], entry['track_kind'])
+            )
+        return entry
+
+    def put(self, video_id, language, track_kind, content, track_id=None, etag=None, format='srt'):
+        """Store a caption payload and evict old or least recently used entries"""
+        now = time.time()
+        size = len(content.encode('utf-8'))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO captions "
+                f"({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                (video_id, language, track_kind, track_id, etag, format,
+                 content, size, now, now, now)
+            )
+        self.evict()
+
+    def evict(self):
+        """Drop entries past max_age, then least recently used entries until under max_bytes"""
+        with self._lock:
+            self._conn.execute("DELETE FROM captions WHERE fetched_at < ?", (time.time() - self.max_age,))
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM captions").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            rows = self._conn.execute(
+                "SELECT video_id, language, track_kind, size FROM captions ORDER BY last_access"
+            ).fetchall()
+            for video_id, language, track_kind, size in rows:
+                if total <= self.max_bytes:
+                    break
+                self._conn.execute(
+                    "DELETE FROM captions WHERE video_id = ? AND language = ? AND track_kind = ?",
+                    (video_id, language, track_kind)
+                )
+                total -= size
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def caption_cache_from_env():
+    """Build a caption cache configured from environment variables"""
+    return CaptionCache(
+        path=os.getenv('CAPTION_CACHE_PATH', DEFAULT_CACHE_PATH),
+        max_bytes=int(float(os.getenv('CAPTION_CACHE_MAX_MB', '256')) * 1024 * 1024),
+        max_age=float(os.getenv('CAPTION_CACHE_MAX_AGE_DAYS', '30')) * 24 * 3600,
+        revalidate_after=float(os.getenv('CAPTION_CACHE_REVALIDATE_HOURS', '24')) * 3600
+    )
+
+
+_cache = ProcessWide(caption_cache_from_env)
+
+
+def get_caption_cache():
+    """Return the process-wide caption cache"""
+    return _cache.get()
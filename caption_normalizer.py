@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Caption normalization for YouTube Caption Summarizer
+
+Auto-generated (ASR) tracks repeat every line in the following cue, and are
+full of [Music] tags, filler words and stutters. Cleaning them up before
+summarization sends fewer tokens to the model without losing content.
+
+Steps (all enabled by default):
+
+* ``dedupe``: drop words a cue repeats from the end of the previous cue
+  (rolling ASR captions) and cues that repeat the previous one entirely
+* ``annotations``: strip non-speech annotations such as [Music], (applause),
+  ♪ and >> speaker markers
+* ``fillers``: remove filler words (um, uh, erm, hmm, ...)
+* ``repeats``: collapse immediately repeated words and short phrases
+  ("I I think", "you know you know")
+"""
+
+import argparse
+import re
+import sys
+from collections import namedtuple
+
+from caption_parser import CueStore, parse_captions
+from chunking import DEFAULT_MODEL, count_tokens
+
+NORMALIZATION_STEPS = ('dedupe', 'annotations', 'fillers', 'repeats')
+
+# Words a cue may repeat from the previous one; longer overlaps are not rolling captions
+MAX_ROLLING_OVERLAP = 40
+# Shorter overlaps ("... and" / "and then ...") are usually genuine
+MIN_ROLLING_OVERLAP = 2
+
+_ANNOTATION = re.compile(
+    r'\[[^\]]{0,40}\]'                        # [Music], [Applause], [ __ ]
+    r'|\((?:music|applause|laughter|laughs|laughing|cheering|inaudible|silence|crosstalk)\)'
+    r'|[♪♫]+'
+    r'|>>',
+    re.IGNORECASE
+)
+# Filler words by language (base ISO 639-1 code). Tracks in other or unknown
+# languages keep every word: "er" is a pronoun in German, Dutch and Swedish.
+FILLER_WORDS = {
+    'en': r'u+m+|u+h+|uhm|erm|er|ah+|hmm+|mm+|mhm',
+}
+_FILLERS = {
+    language: re.compile(rf'\b(?:{words})\b[,.]?', re.IGNORECASE)
+    for language, words in FILLER_WORDS.items()
+}
+# Longest phrase (in words) collapsed when it is immediately repeated
+MAX_REPEATED_PHRASE = 4
+_SPACE_BEFORE_PUNCTUATION = re.compile(r'\s+([,.!?;:])')
+_LEADING_PUNCTUATION = re.compile(r'^[\s,.;:]+')
+_ANNOTATION_CHARS = frozenset('[(♪♫>')
+_KEY_PUNCTUATION = '.,!?;:"()-'
+
+NormalizationReport = namedtuple(
+    'NormalizationReport', ['cues_before', 'cues_after', 'tokens_before', 'tokens_after']
+)
+
+
+def parse_steps(value):
+    """Parse a CAPTION_NORMALIZE setting: 'all', 'off' or a comma-separated list of steps"""
+    value = (value or '').strip().lower()
+    if value in ('', 'all', 'on', '1', 'true'):
+        return NORMALIZATION_STEPS
+    if value in ('off', 'none', '0', 'false'):
+        return ()
+    steps = tuple(step.strip() for step in value.split(',') if step.strip())
+    unknown = [step for step in steps if step not in NORMALIZATION_STEPS]
+    if unknown:
+        raise ValueError(f"Unknown caption normalization step(s): {', '.join(unknown)}")
+    return steps
+
+
+def strip_annotations(text):
+    if _ANNOTATION_CHARS.isdisjoint(text):
+        return text
+    return _ANNOTATION.sub(' ', text)
+
+
+def base_language(language):
+    """'en' for 'en', 'en-US' or 'en_GB'; None when unknown"""
+    return (language or '').replace('_', '-').split('-')[0].lower() or None
+
+
+def remove_fillers(text, language='en'):
+    filler = _FILLERS.get(base_language(language))
+    return filler.sub(' ', text) if filler else text
+
+
+def track_steps(steps, language=None, track_kind=None):
+    """The steps that are safe for a caption track
+
+    Fillers are only removed for languages with a filler list, and rolling
+    caption dedupe is skipped for manual tracks, which do not repeat lines.
+    """
+    skipped = set()
+    if base_language(language) not in FILLER_WORDS:
+        skipped.add('fillers')
+    if track_kind is not None and track_kind != 'ASR':
+        skipped.add('dedupe')
+    return tuple(step for step in steps if step not in skipped)
+
+
+def collapse_repeats(words, keys):
+    """Drop immediately repeated words and phrases of up to MAX_REPEATED_PHRASE words"""
+    kept_words = []
+    kept_keys = []
+    for word, key in zip(words, keys):
+        kept_words.append(word)
+        kept_keys.append(key)
+        # A repeat ends with a word seen in the last few words; most words are not
+        if key not in kept_keys[-MAX_REPEATED_PHRASE - 1:-1]:
+            continue
+        count = len(kept_keys)
+        for size in range(1, min(MAX_REPEATED_PHRASE, count // 2) + 1):
+            if kept_keys[count - 1 - size] == key and kept_keys[-size:] == kept_keys[-2 * size:-size]:
+                del kept_words[-size:]
+                del kept_keys[-size:]
+                break
+    return kept_words
+
+
+def tidy(text):
+    """Collapse whitespace and the stray punctuation left behind by removed words"""
+    text = ' '.join(text.split())
+    text = _SPACE_BEFORE_PUNCTUATION.sub(r'\1', text)
+    return _LEADING_PUNCTUATION.sub('', text)
+
+
+def _word_key(word):
+    return word.lower().strip(_KEY_PUNCTUATION)
+
+
+def rolling_overlap(previous_words, words):
+    """Number of leading words that repeat the end of the previous cue"""
+    longest = min(len(previous_words), len(words), MAX_ROLLING_OVERLAP)
+    for size in range(longest, 0, -1):
+        if previous_words[-size:] == words[:size]:
+            if size >= MIN_ROLLING_OVERLAP or size == len(words):
+                return size
+            break
+    return 0
+
+
+def normalize_cues(cues, steps=NORMALIZATION_STEPS, language=None, track_kind=None):
+    """Return a new CueStore with the selected normalization steps applied
+
+    language and track_kind default to the track the cues came from; steps
+    that do not suit the track are skipped (see track_steps).
+    """
+    language = language or cues.language
+    track_kind = track_kind or cues.track_kind
+    steps = track_steps(steps, language, track_kind)
+    normalized = CueStore(language, track_kind)
+    previous_keys = []
+    for start, end, text in cues:
+        if 'annotations' in steps:
+            text = strip_annotations(text)
+        if 'fillers' in steps:
+            text = remove_fillers(text, language)
+
+        words = text.split()
+        keys = [_word_key(word) for word in words]
+        if 'dedupe' in steps:
+            overlap = rolling_overlap(previous_keys, keys)
+            if keys:
+                previous_keys = keys
+            words = words[overlap:]
+            keys = keys[overlap:]
+        if 'repeats' in steps:
+            words = collapse_repeats(words, keys)
+
+        text = ' '.join(words)
+        text = tidy(text)
+        if text:
+            normalized.append(start, end, text)
+    return normalized
+
+
+def normalization_report(before, after, model=DEFAULT_MODEL):
+    """Token and cue counts of a transcript before and after normalization"""
+    return NormalizationReport(
+        cues_before=len(before),
+        cues_after=len(after),
+        tokens_before=count_tokens(before.text(), model),
+        tokens_after=count_tokens(after.text(), model),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show what caption normalization does to an SRT/WebVTT file")
+    parser.add_argument('captions_file', help="SRT or WebVTT file ('-' for stdin)")
+    parser.add_argument('--steps', default='all', help=f"Comma-separated subset of: {', '.join(NORMALIZATION_STEPS)}")
+    parser.add_argument('--language', default='en',
+                        help="Caption language; fillers are only removed for: " + ', '.join(FILLER_WORDS))
+    parser.add_argument('--kind', choices=['ASR', 'standard'], default='ASR',
+                        help="Track kind; rolling-caption dedupe only applies to ASR tracks")
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--print', action='store_true', help="Print the normalized text")
+    args = parser.parse_args()
+
+    if args.captions_file == '-':
+        cues = parse_captions(sys.stdin)
+    else:
+        with open(args.captions_file, encoding='utf-8') as f:
+            cues = parse_captions(f)
+
+    normalized = normalize_cues(cues, parse_steps(args.steps), args.language, args.kind)
+    report = normalization_report(cues, normalized, args.model)
+    saved = report.tokens_before - report.tokens_after
+    print(f"📝 Cues: {report.cues_before} -> {report.cues_after}")
+    print(f"🧹 Tokens: {report.tokens_before} -> {report.tokens_after} "
+          f"({saved} saved, {saved / max(1, report.tokens_before):.0%})")
+    if args.print:
+        print()
+        print(normalized.text())
+
+
+if __name__ == "__main__":
+    main()
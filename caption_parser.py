@@ -0,0 +1,245 @@
+"""
+Streaming SRT / WebVTT / transcript parser for YouTube Caption Summarizer
+
+Captions are parsed line by line into a CueStore: start and end times live in
+``array('d')`` columns and cue texts in one shared string buffer, so a
+10-hour livestream costs a few bytes per cue instead of a dict per cue.
+"""
+
+import html
+import io
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+Cue = namedtuple('Cue', ['start', 'end', 'text'])
+
+# 00:01:02,500 (SRT), 00:01:02.500 or 01:02.500 (WebVTT)
+_TIMESTAMP = re.compile(r'(?:(\d+):)?(\d{1,2}):(\d{2})[,.](\d{1,3})')
+_TAG = re.compile(r'<[^>]*>')
+
+
+def parse_timestamp(value):
+    """Convert an SRT/WebVTT timestamp into seconds"""
+    match = _TIMESTAMP.search(value)
+    if not match:
+        raise ValueError(f"Invalid timestamp: {value!r}")
+    hours, minutes, seconds, millis = match.groups()
+    return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds) + int(millis.ljust(3, '0')) / 1000
+
+
+def format_timestamp(seconds):
+    """Format seconds as [hh:]mm:ss for display"""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+def srt_timestamp(seconds):
+    """Format seconds as an SRT timestamp (hh:mm:ss,mmm)"""
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    seconds, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{millis:03d}"
+
+
+def clean_cue_text(text):
+    """Strip markup (<i>, <c.colour>, inline <00:00:01.000> timings) and decode entities"""
+    return html.unescape(_TAG.sub('', text)).strip()
+
+
+class CueStore:
+    """Compact, append-only store of caption cues ordered by start time
+
+    language and track_kind ('ASR' or 'standard') describe the caption track
+    the cues came from, when it is known.
+    """
+
+    __slots__ = ('starts', 'ends', '_offsets', '_parts', '_buffer', 'language', 'track_kind')
+
+    def __init__(self, language=None, track_kind=None):
+        self.starts = array('d')
+        self.ends = array('d')
+        self._offsets = array('q', [0])  # cue i spans _offsets[i]:_offsets[i+1]-1 in the buffer
+        self._parts = []
+        self._buffer = ''
+        self.language = language
+        self.track_kind = track_kind
+
+    def append(self, start, end, text):
+        """Add a cue; cue text is stored on a single line"""
+        text = ' '.join(text.split())
+        if not text:
+            return
+        self.starts.append(start)
+        self.ends.append(end)
+        self._parts.append(text + '\n')
+        self._offsets.append(self._offsets[-1] + len(text) + 1)
+
+    def _flush(self):
+        if self._parts:
+            self._buffer = self._buffer + ''.join(self._parts)
+            self._parts = []
+        return self._buffer
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        buffer = self._flush()
+        return Cue(self.starts[index], self.ends[index],
+                   buffer[self._offsets[index]:self._offsets[index + 1] - 1])
+
+    def __iter__(self):
+        buffer = self._flush()
+        for i in range(len(self)):
+            yield Cue(self.starts[i], self.ends[i], buffer[self._offsets[i]:self._offsets[i + 1] - 1])
+
+    @property
+    def duration(self):
+        return max(self.ends) if len(self) else 0.0
+
+    def text(self, start_index=0, end_index=None):
+        """Caption text of a range of cues joined by spaces"""
+        end_index = len(self) if end_index is None else end_index
+        if end_index <= start_index:
+            return ''
+        buffer = self._flush()
+        return buffer[self._offsets[start_index]:self._offsets[end_index] - 1].replace('\n', ' ')
+
+    def index_range(self, start_time, end_time):
+        """Indexes [i, j) of the cues that overlap the time range [start_time, end_time)"""
+        i = bisect_right(self.starts, start_time)
+        # Step back over cues that started earlier but are still showing
+        while i > 0 and self.ends[i - 1] > start_time:
+            i -= 1
+        j = bisect_left(self.starts, end_time)
+        return i, max(i, j)
+
+    def slice(self, start_time, end_time):
+        """New CueStore holding the cues that overlap [start_time, end_time)"""
+        i, j = self.index_range(start_time, end_time)
+        return self.take(i, j)
+
+    def take(self, start_index, end_index):
+        """New CueStore holding cues [start_index, end_index)"""
+        store = CueStore(self.language, self.track_kind)
+        if end_index <= start_index:
+            return store
+        buffer = self._flush()
+        base = self._offsets[start_index]
+        store.starts = self.starts[start_index:end_index]
+        store.ends = self.ends[start_index:end_index]
+        store._offsets = array('q', (offset - base for offset in self._offsets[start_index:end_index + 1]))
+        store._buffer = buffer[base:self._offsets[end_index]]
+        return store
+
+    def windows(self, seconds):
+        """Yield (start, end, text) for consecutive windows of the given length"""
+        if not len(self):
+            return
+        i = 0
+        window_start = self.starts[0] - self.starts[0] % seconds
+        while i < len(self):
+            window_end = window_start + seconds
+            j = bisect_left(self.starts, window_end, lo=i)
+            if j > i:
+                yield window_start, window_end, self.text(i, j)
+            i = j
+            window_start = window_end
+
+    def to_srt(self):
+        """Serialize the cues as an SRT payload"""
+        return '\n'.join(
+            f"{i}\n{srt_timestamp(start)} --> {srt_timestamp(end)}\n{text}\n"
+            for i, (start, end, text) in enumerate(self, 1)
+        )
+
+
+class CueTexts:
+    """Re-iterable caption text fragments of a CueStore, for summarization
+
+    Yields one fragment per cue, or with seconds one "[mm:ss] text" fragment
+    per window, after an optional header. Joined with spaces they are the
+    transcript, so it can be hashed and chunked without building the string.
+    """
+
+    __slots__ = ('cues', 'seconds', 'header')
+
+    def __init__(self, cues, seconds=None, header=None):
+        self.cues = cues
+        self.seconds = seconds
+        self.header = header
+
+    def __iter__(self):
+        if self.header:
+            yield self.header
+        if self.seconds is None:
+            for cue in self.cues:
+                yield cue.text
+        else:
+            for start, _, text in self.cues.windows(self.seconds):
+                yield f"[{format_timestamp(start)}] {text}"
+
+    def text(self):
+        return ' '.join(self)
+
+
+def iter_cues(lines):
+    """Incrementally parse SRT or WebVTT lines into Cue tuples
+
+    Works for both formats: any line containing '-->' starts a cue and the
+    following non-blank lines are its text. Sequence numbers, cue
+    identifiers, the WEBVTT header and NOTE/STYLE blocks are skipped.
+    """
+    start = end = None
+    text_lines = []
+    for line in lines:
+        line = line.strip().lstrip('\ufeff')
+        if start is not None:
+            if line:
+                text_lines.append(line)
+                continue
+            text = clean_cue_text(' '.join(text_lines))
+            if text:
+                yield Cue(start, end, text)
+            start = end = None
+            text_lines = []
+        elif '-->' in line:
+            left, right = line.split('-->', 1)
+            try:
+                start = parse_timestamp(left)
+                end = parse_timestamp(right.split()[0] if right.split() else right)
+            except ValueError:
+                start = end = None
+    if start is not None:
+        text = clean_cue_text(' '.join(text_lines))
+        if text:
+            yield Cue(start, end, text)
+
+
+def parse_captions(content):
+    """Parse an SRT or WebVTT payload (str, bytes or a file-like object) into a CueStore"""
+    if isinstance(content, bytes):
+        content = content.decode('utf-8')
+    lines = io.StringIO(content) if isinstance(content, str) else content
+    store = CueStore()
+    for cue in iter_cues(lines):
+        store.append(cue.start, cue.end, cue.text)
+    return store
+
+
+def cues_from_transcript(items):
+    """Build a CueStore from youtube-transcript-api items ({'text', 'start', 'duration'})"""
+    store = CueStore()
+    for item in items:
+        start = float(item['start'])
+        store.append(start, start + float(item.get('duration', 0)), clean_cue_text(item['text']))
+    return store
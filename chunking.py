@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Token-aware caption chunking for YouTube Caption Summarizer
+"""
+
+import argparse
+import logging
+import re
+import sys
+import zlib
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "gpt-4"
+
+# Context window sizes (tokens) for the models we summarize with
+MODEL_CONTEXT_WINDOWS = {
+    'gpt-4': 8192,
+    'gpt-4-32k': 32768,
+    'gpt-4-1106-preview': 128000,
+    'gpt-4-turbo': 128000,
+    'gpt-4o': 128000,
+    'gpt-3.5-turbo': 4096,
+    'gpt-3.5-turbo-16k': 16384,
+}
+
+# Tokens reserved for the prompt template and chat message framing
+PROMPT_OVERHEAD_TOKENS = 150
+CHARS_PER_TOKEN = 4
+# Characters at the end of a chunk that identify where it ended (see chunk_anchor)
+ANCHOR_CHARS = 120
+# Content-defined chunk ends (see _is_boundary): a chunk is closed once it holds CUT_MIN_FILL
+# of the budget, at a segment its hash picks; one is picked every CUT_MEAN_GAP of the budget
+# on average, so chunks are about 3/4 full and only about 5% of them are cut by the budget
+CUT_MIN_FILL = 0.625
+CUT_MEAN_GAP = 0.125
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+_encoders = {}
+_tiktoken = None  # Imported on first use (it is slow to import); False when not installed
+
+
+def _load_tiktoken():
+    global _tiktoken
+    if _tiktoken is None:
+        try:
+            import tiktoken
+            _tiktoken = tiktoken
+        except ImportError:  # Fall back to a character-based estimate
+            _tiktoken = False
+    return _tiktoken or None
+
+
+def _get_encoder(model):
+    global _tiktoken
+    tiktoken = _load_tiktoken()
+    if tiktoken is None:
+        return None
+    if model not in _encoders:
+        try:
+            try:
+                encoder = tiktoken.encoding_for_model(model)
+            except KeyError:
+                encoder = tiktoken.get_encoding('cl100k_base')
+        except Exception as e:  # The encoding is downloaded on first use, which fails offline
+            logger.warning("Could not load the tiktoken encoding (%s); estimating tokens from characters", e)
+            _tiktoken = False
+            return None
+        _encoders[model] = encoder
+    return _encoders[model]
+
+
+def count_tokens(text, model=DEFAULT_MODEL):
+    """Count the tokens a model sees for the given text"""
+    encoder = _get_encoder(model)
+    if encoder is None:
+        return max(1, (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN) if text else 0
+    return len(encoder.encode(text))
+
+
+def token_budget(model=DEFAULT_MODEL, max_output_tokens=1000):
+    """Largest chunk size (tokens) that still leaves room for the prompt and the completion"""
+    context = MODEL_CONTEXT_WINDOWS.get(model, MODEL_CONTEXT_WINDOWS[DEFAULT_MODEL])
+    return context - max_output_tokens - PROMPT_OVERHEAD_TOKENS
+
+
+def split_sentences(text):
+    """Split running caption text into sentences"""
+    return [sentence for sentence in _SENTENCE_END.split(text.strip()) if sentence]
+
+
+def _split_oversized(segment, model, max_tokens):
+    """Break a single segment that exceeds the budget on word boundaries"""
+    pieces = []
+    words = []
+    tokens = 0
+    for word in segment.split():
+        word_tokens = count_tokens(' ' + word, model)
+        if words and tokens + word_tokens > max_tokens:
+            pieces.append(' '.join(words))
+            words = []
+            tokens = 0
+        words.append(word)
+        tokens += word_tokens
+    if words:
+        pieces.append(' '.join(words))
+    return pieces
+
+
+def iter_sentences(fragments, max_chars=8000):
+    """Lazily split a stream of caption fragments (e.g. cue texts) into sentences
+
+    Fragments are joined with spaces, so the sentences match split_sentences()
+    on the joined text (as returned by CueStore.text()). Unpunctuated text is cut at a fragment boundary once it
+    exceeds max_chars, so memory stays bounded.
+    """
+    if isinstance(fragments, str):
+        fragments = [fragments]
+    pending = ''
+    for fragment in fragments:
+        text = f"{pending} {fragment}" if pending else fragment.lstrip()
+        position = 0
+        for match in _SENTENCE_END.finditer(text):
+            if match.start() > position:
+                yield text[position:match.start()]
+            position = match.end()
+        pending = text[position:]
+        if len(pending) > max_chars:
+            yield pending
+            pending = ''
+    pending = pending.rstrip()
+    if pending:
+        yield pending
+
+
+def _is_boundary(text, tokens, max_tokens):
+    """True for a segment that ends a chunk by its content alone
+
+    A hash of the text picks segments with a probability proportional to
+    their tokens. The same sentence is picked in every version of a
+    transcript, so an edit only moves the chunk ends next to it.
+    """
+    gap = max(1.0, CUT_MEAN_GAP * max_tokens)
+    return zlib.crc32(text.encode('utf-8')) / 2 ** 32 < tokens / gap
+
+
+def mean_chunk_tokens(max_tokens):
+    """Typical size of a chunk cut with a budget of max_tokens"""
+    return max(1, int(max_tokens * (CUT_MIN_FILL + CUT_MEAN_GAP)))
+
+
+def chunk_anchor(chunk):
+    """Hash of the end of a chunk, used to cut a later version of the text at the same place"""
+    return zlib.crc32(chunk[-ANCHOR_CHARS:].encode('utf-8'))
+
+
+def _tail_anchor(current):
+    """chunk_anchor() of the chunk that current would be joined into, from its last segments only"""
+    parts = []
+    length = 0
+    for text, _ in reversed(current):
+        parts.append(text)
+        length += len(text) + 1
+        if length > ANCHOR_CHARS:
+            break
+    return chunk_anchor(' '.join(reversed(parts)))
+
+
+def _carry_over(current, overlap_tokens):
+    """Tail of a finished chunk that is repeated as context at the start of the next one"""
+    carried = []
+    carried_tokens = 0
+    for text, tokens in reversed(current):
+        if carried_tokens + tokens > overlap_tokens:
+            break
+        carried.insert(0, (text, tokens))
+        carried_tokens += tokens
+    return carried, carried_tokens
+
+
+def iter_chunks(segments, model=DEFAULT_MODEL, max_tokens=None, overlap_tokens=0, anchors=None):
+    """Lazily pack whole segments (cues or sentences) into chunks of at most max_tokens tokens
+
+    Chunks end at content-defined boundaries (_is_boundary) once they are
+    CUT_MIN_FILL full, and at the latest when the next segment would not fit.
+    Because boundaries depend on the text and not on where the previous
+    chunk ended, an insertion, deletion or edit changes only the chunk or
+    two around it. anchors are chunk_anchor() values of a previous chunking
+    of the same transcript; a chunk is also closed wherever a previous chunk
+    ended, which realigns the chunks quickly after a cut forced by the budget.
+    """
+    max_tokens = max_tokens or token_budget(model)
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+    min_tokens = CUT_MIN_FILL * max_tokens
+
+    current = []  # (text, tokens) pairs of the chunk being filled
+    current_tokens = 0
+    fresh = 0  # segments in current that are not overlap from the previous chunk
+
+    for segment in segments:
+        segment = segment.strip()
+        if not segment:
+            continue
+        tokens = count_tokens(' ' + segment, model)
+        pieces = [(segment, tokens)]
+        if tokens > max_tokens - overlap_tokens:
+            pieces = [(piece, count_tokens(' ' + piece, model))
+                      for piece in _split_oversized(segment, model, max_tokens - overlap_tokens)]
+
+        for text, tokens in pieces:
+            if current and current_tokens + tokens > max_tokens:
+                yield ' '.join(text for text, _ in current)
+                # Carry the tail of this chunk over as context for the next one
+                current, current_tokens = _carry_over(current, overlap_tokens)
+                fresh = 0
+            current.append((text, tokens))
+            current_tokens += tokens
+            fresh += 1
+            if (current_tokens >= min_tokens and _is_boundary(text, tokens, max_tokens)) or (
+                    anchors and _tail_anchor(current) in anchors):
+                yield ' '.join(text for text, _ in current)
+                current, current_tokens = _carry_over(current, overlap_tokens)
+                fresh = 0
+
+    # The trailing chunk is only worth sending if it holds more than overlap
+    if fresh:
+        yield ' '.join(text for text, _ in current)
+
+
+def chunk_segments(segments, model=DEFAULT_MODEL, max_tokens=None, overlap_tokens=0, anchors=None):
+    """Pack whole segments (cues or sentences) into chunks of at most max_tokens tokens"""
+    return list(iter_chunks(segments, model, max_tokens, overlap_tokens, anchors))
+
+
+def chunk_text(text, model=DEFAULT_MODEL, max_tokens=None, overlap_tokens=0, anchors=None):
+    """Chunk running caption text on sentence boundaries"""
+    return chunk_segments(split_sentences(text), model, max_tokens, overlap_tokens, anchors)
+
+
+def plan_chunks(captions, model=DEFAULT_MODEL, max_tokens=None, overlap_tokens=0):
+    """Dry run: report the chunks that would be sent without calling the model"""
+    max_tokens = max_tokens or token_budget(model)
+    if isinstance(captions, str):
+        chunks = chunk_text(captions, model, max_tokens, overlap_tokens)
+        input_tokens = count_tokens(captions, model)
+    else:
+        chunks = chunk_segments(captions, model, max_tokens, overlap_tokens)
+        input_tokens = sum(count_tokens(' ' + segment, model) for segment in captions)
+    chunk_tokens = [count_tokens(chunk, model) for chunk in chunks]
+    return {
+        'model': model,
+        'token_budget': max_tokens,
+        'overlap_tokens': overlap_tokens,
+        'input_tokens': input_tokens,
+        'chunks': len(chunks),
+        'chunk_tokens': chunk_tokens,
+        'total_tokens': sum(chunk_tokens),
+        'exact': _load_tiktoken() is not None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dry-run the caption chunker on a text file")
+    parser.add_argument('captions_file', help="Plain-text captions file ('-' for stdin)")
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--max-tokens', type=int, default=None, help="Token budget per chunk")
+    parser.add_argument('--overlap', type=int, default=0, help="Overlap between chunks in tokens")
+    args = parser.parse_args()
+
+    if args.captions_file == '-':
+        captions = sys.stdin.read()
+    else:
+        with open(args.captions_file, encoding='utf-8') as f:
+            captions = f.read()
+
+    plan = plan_chunks(captions, args.model, args.max_tokens, args.overlap)
+    print(f"📐 Model: {plan['model']} (budget {plan['token_budget']} tokens/chunk, overlap {plan['overlap_tokens']})")
+    print(f"📝 Input tokens: {plan['input_tokens']}{'' if plan['exact'] else ' (estimated)'}")
+    print(f"✂️  Planned chunks: {plan['chunks']}")
+    for i, tokens in enumerate(plan['chunk_tokens'], 1):
+        print(f"   {i:>3}: {tokens} tokens")
+    print(f"📦 Total tokens sent: {plan['total_tokens']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Shared YouTube and OpenAI API clients for YouTube Caption Summarizer
+
+Building a client is not free: ``build()`` parses the discovery document and
+every new client opens fresh TLS connections. Clients are therefore created
+once per API key and reused by every rerun, session and worker thread.
+The client libraries themselves are imported on first use, so they do not
+slow down app start-up.
+
+* OpenAI clients are thread-safe (httpx connection pool), so one instance per
+  key is shared by everybody.
+* YouTube ``Resource`` objects sit on an ``httplib2.Http`` connection, which is
+  not thread-safe. They are kept in a small per-key pool and borrowed
+  exclusively with ``youtube_client()``.
+"""
+
+import atexit
+import logging
+import os
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Idle YouTube clients kept per API key; extra ones are closed when returned
+YOUTUBE_POOL_SIZE = 8
+
+
+class ClientRegistry:
+    """Thread-safe registry of reusable API clients keyed by API key"""
+
+    def __init__(self, youtube_pool_size=YOUTUBE_POOL_SIZE):
+        self.youtube_pool_size = youtube_pool_size
+        self._lock = threading.Lock()
+        self._openai = {}
+        self._youtube_idle = defaultdict(list)
+        self._closed = False
+
+    def openai(self, api_key):
+        """Return the shared OpenAI client for an API key"""
+        with self._lock:
+            client = self._openai.get(api_key)
+            if client is None:
+                import openai
+                # OPENAI_BASE_URL points the client at a proxy or a local stand-in server.
+                # The SDK's own retries are off: scheduler.py retries with backoff, and
+                # retrying in both places would multiply the attempts per request.
+                client = openai.OpenAI(
+                    api_key=api_key,
+                    base_url=os.getenv('OPENAI_BASE_URL') or None,
+                    max_retries=0
+                )
+                self._openai[api_key] = client
+            return client
+
+    def _build_youtube(self, api_key):
+        from googleapiclient.discovery import build
+        # The bundled (static) discovery document avoids a network fetch per client
+        endpoint = os.getenv('YOUTUBE_API_ENDPOINT')
+        return build(
+            'youtube', 'v3',
+            developerKey=api_key,
+            static_discovery=True,
+            cache_discovery=False,
+            client_options={'api_endpoint': endpoint} if endpoint else None
+        )
+
+    @contextmanager
+    def youtube(self, api_key):
+        """Borrow a YouTube client for exclusive use by the calling thread"""
+        with self._lock:
+            idle = self._youtube_idle[api_key]
+            client = idle.pop() if idle else None
+        if client is None:
+            client = self._build_youtube(api_key)
+        try:
+            yield client
+        finally:
+            self._release_youtube(api_key, client)
+
+    def _release_youtube(self, api_key, client):
+        with self._lock:
+            idle = self._youtube_idle[api_key]
+            if not self._closed and len(idle) < self.youtube_pool_size:
+                idle.append(client)
+                return
+        _close_quietly(client)
+
+    def close(self):
+        """Close every pooled client and their HTTP connections"""
+        with self._lock:
+            self._closed = True
+            clients = list(self._openai.values())
+            for idle in self._youtube_idle.values():
+                clients.extend(idle)
+            self._openai.clear()
+            self._youtube_idle.clear()
+        for client in clients:
+            _close_quietly(client)
+
+
+def _close_quietly(client):
+    try:
+        client.close()
+    except Exception as e:
+        logger.debug("Error closing client: %s", e)
+
+
+_registry = ClientRegistry()
+atexit.register(_registry.close)
+
+
+def get_openai_client(api_key):
+    """Return the process-wide OpenAI client for an API key"""
+    return _registry.openai(api_key)
+
+
+def youtube_client(api_key):
+    """Context manager lending a pooled YouTube Data API v3 client"""
+    return _registry.youtube(api_key)
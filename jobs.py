@@ -0,0 +1,307 @@
+"""
+Background summarization jobs for YouTube Caption Summarizer
+
+The download-and-summarize pipeline runs on a process-wide worker pool
+instead of the Streamlit script thread, so widget interactions, reruns and
+reconnects do not throw work away. Every job is a row in a SQLite job table
+holding its status, progress and result; sessions submit jobs and poll the
+table. API keys are only kept in memory and are never written to disk.
+
+Several app processes may share the job table. Each queue stamps its active
+jobs with its instance ID and a heartbeat; jobs whose heartbeat stopped
+belong to a process that exited and are failed by the next queue that looks.
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import registry, trace_request
+from search_index import index_video
+from stores import ProcessWide, open_sqlite
+from summarizer import (
+    LogReporter,
+    caption_fragments,
+    get_video_cues,
+    normalize_captions,
+    stream_summary_with_gpt4,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOBS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'jobs.sqlite3')
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT NOT NULL DEFAULT '',
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    instance TEXT NOT NULL DEFAULT '',
+    heartbeat_at REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_owner ON jobs (owner, created_at);
+"""
+_COLUMNS = "id, owner, video_id, params, status, progress, message, result, error, created_at, updated_at"
+# Columns added after the first release, for job tables created before them
+_ADDED_COLUMNS = [
+    ('instance', "TEXT NOT NULL DEFAULT ''"),
+    ('heartbeat_at', 'REAL NOT NULL DEFAULT 0'),
+]
+
+
+class JobReporter(LogReporter):
+    """Reporter that mirrors pipeline status messages into the job row"""
+
+    def __init__(self, queue, job_id):
+        super().__init__(prefix=f"[job {job_id[:8]}] ")
+        self.queue = queue
+        self.job_id = job_id
+
+    def info(self, message):
+        super().info(message)
+        self.queue.update(self.job_id, message=message)
+
+    success = info
+
+    def warning(self, message):
+        super().warning(message)
+        self.queue.update(self.job_id, message=message)
+
+
+class JobQueue:
+    """SQLite job table served by a bounded pool of worker threads"""
+
+    def __init__(self, path=DEFAULT_JOBS_PATH, workers=4, max_age=7 * 24 * 3600, stale_after=60):
+        self.path = path
+        self.max_age = max_age
+        self.stale_after = stale_after
+        self.instance = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='summary-job')
+        self._partial = {}  # job ID -> summary text streamed so far (in memory only)
+        self._stopped = threading.Event()
+
+        self._conn = open_sqlite(path, _SCHEMA)
+        self._migrate()
+        self._recover()
+        self.prune()
+        threading.Thread(target=self._heartbeat_loop, name='job-heartbeat', daemon=True).start()
+
+    def _migrate(self):
+        with self._lock:
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            for column, definition in _ADDED_COLUMNS:
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+
+    def _recover(self):
+        """Fail jobs whose process stopped sending heartbeats; their API keys are gone with it
+
+        Active jobs of other running processes that share the table are left alone.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? "
+                "WHERE status IN (?, ?) AND instance != ? AND heartbeat_at < ?",
+                (FAILED, "Interrupted by a server restart, please submit it again", now,
+                 *ACTIVE_STATUSES, self.instance, now - self.stale_after)
+            )
+
+    def _heartbeat(self):
+        """Mark this queue's active jobs as alive"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE instance = ? AND status IN (?, ?)",
+                (time.time(), self.instance, *ACTIVE_STATUSES)
+            )
+
+    def _heartbeat_loop(self):
+        while not self._stopped.wait(self.stale_after / 4):
+            try:
+                self._heartbeat()
+                self._recover()
+            except Exception as e:
+                logger.warning("Job heartbeat failed: %s", e)
+
+    def submit(self, owner, video_id, youtube_api_key, openai_api_key, preferred_language=None,
+               caption_id=None, timestamps=False):
+        """Queue a summary job and return its ID; an identical active job is reused"""
+        params = {
+            'preferred_language': preferred_language,
+            'caption_id': caption_id,
+            'timestamps': bool(timestamps),
+        }
+        params_json = json.dumps(params, sort_keys=True)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM jobs WHERE owner = ? AND video_id = ? AND params = ? AND status IN (?, ?)",
+                (owner, video_id, params_json, *ACTIVE_STATUSES)
+            ).fetchone()
+            if row:
+                return row[0]
+            job_id = uuid.uuid4().hex
+            self._conn.execute(
+                "INSERT INTO jobs (id, owner, video_id, params, status, message, created_at, updated_at, "
+                "instance, heartbeat_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, owner, video_id, params_json, QUEUED, "Waiting for a worker...", now, now,
+                 self.instance, now)
+            )
+        registry.inc('jobs_total', status='submitted')
+        self._executor.submit(self._run, job_id, video_id, youtube_api_key, openai_api_key, params)
+        return job_id
+
+    def update(self, job_id, **fields):
+        """Update columns of a job row"""
+        fields['updated_at'] = time.time()
+        assignments = ', '.join(f"{column} = ?" for column in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def _row_to_job(self, row):
+        job_id, owner, video_id, params, status, progress, message, result, error, created_at, updated_at = row
+        return {
+            'id': job_id,
+            'owner': owner,
+            'video_id': video_id,
+            'params': json.loads(params),
+            'status': status,
+            'progress': progress,
+            'message': message,
+            'result': json.loads(result) if result else None,
+            'error': error,
+            'partial': self._partial.get(job_id, ''),
+            'created_at': created_at,
+            'updated_at': updated_at,
+        }
+
+    def get(self, job_id):
+        """Return a job as a dict, or None"""
+        with self._lock:
+            row = self._conn.execute(f"SELECT {_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def list_jobs(self, owner, limit=20):
+        """Most recent jobs of one user, newest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE owner = ? ORDER BY created_at DESC LIMIT ?", (owner, limit)
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def delete(self, job_id):
+        """Remove a finished job from the table"""
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE id = ? AND status NOT IN (?, ?)", (job_id, *ACTIVE_STATUSES))
+
+    def prune(self):
+        """Drop finished jobs older than max_age"""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM jobs WHERE status NOT IN (?, ?) AND updated_at < ?",
+                (*ACTIVE_STATUSES, time.time() - self.max_age)
+            )
+
+    def _run(self, job_id, video_id, youtube_api_key, openai_api_key, params):
+        reporter = JobReporter(self, job_id)
+        self.update(job_id, status=RUNNING, progress=0.05, message="Downloading captions...")
+        try:
+            with trace_request('job') as trace:
+                result = self._summarize(job_id, video_id, youtube_api_key, openai_api_key, params, reporter)
+            result['trace'] = {'summary': trace.summary(), 'rows': trace.rows()}
+            self.update(job_id, status=DONE, progress=1.0, message="Summary generated",
+                        result=json.dumps(result, ensure_ascii=False))
+            registry.inc('jobs_total', status=DONE)
+        except Exception as e:
+            logger.warning("Job %s failed: %s", job_id, e)
+            self.update(job_id, status=FAILED, error=str(e), message="Failed")
+            registry.inc('jobs_total', status=FAILED)
+        finally:
+            self._partial.pop(job_id, None)
+
+    def _summarize(self, job_id, video_id, youtube_api_key, openai_api_key, params, reporter):
+        cues = get_video_cues(
+            video_id, youtube_api_key, params['preferred_language'], ui=reporter, caption_id=params['caption_id']
+        )
+        if not cues:
+            raise RuntimeError(
+                reporter.errors[-1] if reporter.errors
+                else "Failed to download captions. The video might not have captions available."
+            )
+        cues = normalize_captions(cues, ui=reporter)
+        index_video(video_id, cues, language=params['preferred_language'])
+        self.update(job_id, progress=0.2, message="Generating summary with GPT-4...")
+
+        # Stream the summary so progress and partial text are visible while it is generated.
+        # The cue texts are passed as fragments; chunks are cut from them as they are needed.
+        summary_input = caption_fragments(cues, params['timestamps'])
+        chunks = 1
+        chunks_done = 0
+        summary = None
+        self._partial[job_id] = ''
+        for event in stream_summary_with_gpt4(summary_input, openai_api_key, video_id=video_id):
+            if event.kind == 'plan':
+                # An estimate at first, then the exact count once the last chunk is cut
+                chunks = max(1, event.index)
+            elif event.kind in ('changes', 'waiting'):
+                reporter.info(event.text)
+            elif event.kind == 'delta' and chunks == 1:
+                self._partial[job_id] += event.text
+            elif event.kind == 'chunk_done':
+                chunks_done += 1
+                self.update(job_id, progress=0.2 + 0.7 * min(1.0, chunks_done / chunks),
+                            message=f"Summarized part {chunks_done} of {max(chunks, chunks_done)}")
+                if chunks > 1 and chunks_done == chunks:
+                    self.update(job_id, message="Merging partial summaries...")
+            elif event.kind == 'reduce':
+                self._partial[job_id] += event.text
+            elif event.kind == 'done':
+                summary = event.text
+        if not summary:
+            raise RuntimeError("Failed to generate summary. Please check your API key and try again.")
+        index_video(video_id, summary=summary)
+        return {'captions': cues.text(), 'summary': summary}
+
+    def close(self):
+        self._stopped.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            self._conn.close()
+
+
+def job_queue_from_env():
+    """Build a job queue configured from environment variables"""
+    return JobQueue(
+        path=os.getenv('JOBS_PATH', DEFAULT_JOBS_PATH),
+        workers=int(os.getenv('JOB_WORKERS', '4')),
+        max_age=float(os.getenv('JOBS_MAX_AGE_DAYS', '7')) * 24 * 3600,
+        stale_after=float(os.getenv('JOBS_STALE_SECONDS', '60'))
+    )
+
+
+_queue = ProcessWide(job_queue_from_env)
+
+
+def get_job_queue():
+    """Return the process-wide job queue"""
+    return _queue.get()
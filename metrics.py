@@ -0,0 +1,271 @@
+"""
+Latency, token, cache and quota instrumentation for YouTube Caption Summarizer
+
+Everything is recorded twice: into a process-wide registry that is exposed in
+the Prometheus text format (``start_metrics_server``), and into the current
+request's Trace, if one is active, so the UI can show where a single request
+spent its time.
+"""
+
+import contextvars
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'youtube_summarizer'
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+_HELP = {
+    'stage_duration_seconds': ('histogram', "Time spent per pipeline stage"),
+    'openai_tokens_total': ('counter', "OpenAI tokens by kind (prompt/completion)"),
+    'cache_requests_total': ('counter', "Cache lookups by cache and result (hit/miss)"),
+    'youtube_quota_units_total': ('counter', "YouTube Data API quota units consumed by operation"),
+    'errors_total': ('counter', "Pipeline errors by stage"),
+    'caption_tokens_total': ('counter', "Caption tokens before (raw) and after (normalized) normalization"),
+    'caption_hedge_total': ('counter', "Hedged caption fetches by winning source"),
+    'coalesced_requests_total': ('counter', "Requests served by an identical in-flight request, by kind and scope"),
+    'jobs_total': ('counter', "Background summary jobs by status (submitted/done/failed)"),
+    'prefetch_videos_total': ('counter', "Videos warmed by the prefetcher by resulting status"),
+    'summary_chunks_total': ('counter', "Chunks reused from a video's previous summary or summarized again"),
+}
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms rendered in the Prometheus text format"""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] += value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def counter_value(self, name, **labels):
+        with self._lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0.0)
+
+    def render(self):
+        """Prometheus text exposition of every metric"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (list(h[0]), h[1], h[2]) for key, h in self._histograms.items()}
+
+        lines = []
+        counter_names = {name for name, _ in counters}
+        for name in sorted(counter_names | {name for name, _ in histograms}):
+            kind, help_text = _HELP.get(name, ('counter' if name in counter_names else 'histogram', name))
+            full_name = f"{PREFIX}_{name}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{full_name}{_format_labels(labels)} {_format_value(value)}")
+            for (metric, labels), (bucket_counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    bucket_labels = labels + (('le', _format_value(bound)),)
+                    lines.append(f"{full_name}_bucket{_format_labels(bucket_labels)} {bucket_count}")
+                lines.append(f"{full_name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{full_name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{full_name}_count{_format_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Trace:
+    """Per-request record of stage timings, tokens, cache results and quota use"""
+
+    def __init__(self, name='request'):
+        self.name = name
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self.stages = []  # (stage, offset seconds, duration seconds, detail)
+        self.tokens = defaultdict(int)
+        self.cache = defaultdict(int)
+        self.quota_units = 0
+
+    def add_stage(self, stage, started, duration, detail=''):
+        with self._lock:
+            self.stages.append((stage, started - self.started, duration, detail))
+
+    def rows(self):
+        """Stage rows for display, in start order"""
+        with self._lock:
+            stages = sorted(self.stages, key=lambda row: row[1])
+        return [
+            {
+                'stage': stage,
+                'start (ms)': round(offset * 1000, 1),
+                'duration (ms)': round(duration * 1000, 1),
+                'detail': detail,
+            }
+            for stage, offset, duration, detail in stages
+        ]
+
+    def summary(self):
+        with self._lock:
+            return {
+                'total_seconds': round(time.monotonic() - self.started, 3),
+                'prompt_tokens': self.tokens['prompt'],
+                'completion_tokens': self.tokens['completion'],
+                'cache_hits': sum(v for (cache, result), v in self.cache.items() if result == 'hit'),
+                'cache_misses': sum(v for (cache, result), v in self.cache.items() if result == 'miss'),
+                'youtube_quota_units': self.quota_units,
+            }
+
+
+registry = MetricsRegistry()
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+
+
+@contextmanager
+def trace_request(name='request'):
+    """Collect everything recorded inside the block (and in threads given a copied context) into a Trace"""
+    trace = Trace(name)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextmanager
+def stage(name, detail=''):
+    """Time a pipeline stage"""
+    started = time.monotonic()
+    try:
+        yield
+    except Exception:
+        registry.inc('errors_total', stage=name)
+        raise
+    finally:
+        record_stage(name, started, time.monotonic() - started, detail)
+
+
+def record_stage(name, started, duration, detail=''):
+    """Record a stage measured by the caller (started is a time.monotonic() value)"""
+    registry.observe('stage_duration_seconds', duration, stage=name)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_stage(name, started, duration, detail)
+
+
+def record_tokens(prompt_tokens, completion_tokens):
+    registry.inc('openai_tokens_total', prompt_tokens or 0, kind='prompt')
+    registry.inc('openai_tokens_total', completion_tokens or 0, kind='completion')
+    trace = _current_trace.get()
+    if trace is not None:
+        with trace._lock:
+            trace.tokens['prompt'] += prompt_tokens or 0
+            trace.tokens['completion'] += completion_tokens or 0
+
+
+def record_cache(cache, hit):
+    result = 'hit' if hit else 'miss'
+    registry.inc('cache_requests_total', cache=cache, result=result)
+    trace = _current_trace.get()
+    if trace is not None:
+        with trace._lock:
+            trace.cache[(cache, result)] += 1
+
+
+def record_caption_tokens(raw_tokens, normalized_tokens):
+    registry.inc('caption_tokens_total', raw_tokens, kind='raw')
+    registry.inc('caption_tokens_total', normalized_tokens, kind='normalized')
+
+
+def record_chunk_reuse(reused, summarized):
+    """Count chunks found unchanged in a video's previous summary, and the ones that were not"""
+    registry.inc('summary_chunks_total', reused, result='reused')
+    registry.inc('summary_chunks_total', summarized, result='summarized')
+
+
+def record_hedge(winner):
+    """Count which caption source answered a hedged fetch first (None when both failed)"""
+    registry.inc('caption_hedge_total', winner=winner or 'none')
+
+
+def record_quota(operation, units):
+    registry.inc('youtube_quota_units_total', units, operation=operation)
+    trace = _current_trace.get()
+    if trace is not None:
+        with trace._lock:
+            trace.quota_units += units
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("metrics: " + format, *args)
+
+
+_server = None
+_server_failed = False
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port, host='0.0.0.0'):
+    """Serve /metrics on a background thread; safe to call on every rerun"""
+    global _server, _server_failed
+    with _server_lock:
+        if _server is not None or _server_failed:
+            return _server
+        try:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError as e:
+            # Another process (e.g. a second Streamlit worker) already serves this port
+            logger.warning("Metrics endpoint not started on port %s: %s", port, e)
+            _server_failed = True
+            return None
+        threading.Thread(target=_server.serve_forever, name='metrics-server', daemon=True).start()
+        logger.info("Metrics endpoint listening on http://%s:%s/metrics", host, port)
+        return _server
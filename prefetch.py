@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+Background prefetch for YouTube Caption Summarizer
+
+Watches channels and playlists and pulls the captions of new videos into the
+caption cache (and the search index) during off-peak windows, so the first
+user to open a video does not pay for the captions.list/download round trips.
+With summaries enabled, the GPT-4 summary is generated ahead of time as well.
+
+Prefetching has its own daily budgets on top of the process-wide scheduler: a
+YouTube quota allowance in units and an OpenAI spend allowance in dollars.
+What has been spent is kept in a SQLite ledger with the prefetch state, so
+restarts do not reset the budgets. All calls run at PRIORITY_PREFETCH, behind
+interactive and batch work.
+
+    python prefetch.py --channel UC... --playlist PL... --summarize
+"""
+
+import argparse
+import logging
+import math
+import os
+import sys
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from chunking import CUT_MIN_FILL, count_tokens
+from metrics import registry, trace_request
+from scheduler import PRIORITY_PREFETCH, YOUTUBE_QUOTA_COSTS, quota_day, request_priority
+from search_index import index_video
+from stores import open_sqlite
+from summarizer import (
+    SUMMARY_CHUNK_TOKENS,
+    SUMMARY_MAX_TOKENS,
+    SUMMARY_MODEL,
+    SUMMARY_REDUCE_FAN_IN,
+    LogReporter,
+    caption_fragments,
+    extract_channel_id,
+    extract_playlist_id,
+    final_summary_key,
+    generate_summary_with_gpt4,
+    get_video_cues,
+    list_channel_video_ids,
+    list_playlist_video_ids,
+    normalize_captions,
+)
+from summary_cache import get_summary_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PREFETCH_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'prefetch.sqlite3')
+
+# Quota units needed to fetch one new video's captions (list + download)
+CAPTION_FETCH_UNITS = YOUTUBE_QUOTA_COSTS['captions.list'] + YOUTUBE_QUOTA_COSTS['captions.download']
+
+# USD per 1K tokens of the summary model
+OPENAI_PROMPT_PRICE = float(os.getenv('OPENAI_PROMPT_PRICE_PER_1K', '0.03'))
+OPENAI_COMPLETION_PRICE = float(os.getenv('OPENAI_COMPLETION_PRICE_PER_1K', '0.06'))
+
+NEW = 'new'
+CAPTIONS = 'captions'
+SUMMARIZED = 'summarized'
+FAILED = 'failed'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS prefetch_videos (
+    video_id TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    discovered_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS prefetch_videos_status ON prefetch_videos (status, discovered_at);
+CREATE TABLE IF NOT EXISTS prefetch_spend (
+    day TEXT PRIMARY KEY,
+    youtube_units INTEGER NOT NULL DEFAULT 0,
+    openai_usd REAL NOT NULL DEFAULT 0
+);
+"""
+
+
+def parse_windows(value):
+    """Parse off-peak windows like '01:00-06:00,22:30-23:59' into (start, end) minutes of the day
+
+    A window may wrap around midnight ('22:00-04:00'). An empty value means always.
+    """
+    windows = []
+    for part in (value or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            start, end = (parse_clock(clock) for clock in part.split('-'))
+        except ValueError:
+            raise ValueError(f"Invalid prefetch window {part!r}, expected HH:MM-HH:MM")
+        windows.append((start, end))
+    return windows
+
+
+def parse_clock(value):
+    hours, minutes = value.strip().split(':')
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(value)
+    return hours * 60 + minutes
+
+
+def _minute_of_day(now):
+    local = time.localtime(now)
+    return local.tm_hour * 60 + local.tm_min + local.tm_sec / 60
+
+
+def in_window(windows, now=None):
+    """Whether the local time is inside one of the windows (always True without windows)"""
+    if not windows:
+        return True
+    minute = _minute_of_day(time.time() if now is None else now)
+    for start, end in windows:
+        if start <= end and start <= minute < end:
+            return True
+        if start > end and (minute >= start or minute < end):
+            return True
+    return False
+
+
+def seconds_until_window(windows, now=None):
+    """Seconds until the next window opens (0 when inside one)"""
+    now = time.time() if now is None else now
+    if in_window(windows, now):
+        return 0.0
+    minute = _minute_of_day(now)
+    return min((start - minute) % (24 * 60) for start, _ in windows) * 60
+
+
+def openai_cost(prompt_tokens, completion_tokens):
+    """USD cost of a number of prompt and completion tokens"""
+    return (prompt_tokens * OPENAI_PROMPT_PRICE + completion_tokens * OPENAI_COMPLETION_PRICE) / 1000
+
+
+def estimate_summary_cost(captions):
+    """Upper estimate of the USD cost of summarizing a transcript (text or fragments): every
+    chunk and merge request is assumed to use its full completion allowance"""
+    if isinstance(captions, str):
+        tokens = count_tokens(captions, SUMMARY_MODEL)
+    else:
+        tokens = sum(count_tokens(fragment, SUMMARY_MODEL) for fragment in captions)
+    # Chunks are at least CUT_MIN_FILL full, except where an earlier run's chunk ended
+    chunks = max(1, math.ceil(tokens / (CUT_MIN_FILL * SUMMARY_CHUNK_TOKENS)))
+    merges = math.ceil((chunks - 1) / (SUMMARY_REDUCE_FAN_IN - 1)) if chunks > 1 else 0
+    completion_tokens = (chunks + merges) * SUMMARY_MAX_TOKENS
+    prompt_tokens = tokens + merges * SUMMARY_REDUCE_FAN_IN * SUMMARY_MAX_TOKENS
+    return openai_cost(prompt_tokens, completion_tokens)
+
+
+class PrefetchScheduler:
+    """Keeps the captions (and optionally summaries) of channels and playlists warm"""
+
+    def __init__(self, youtube_api_key, openai_api_key=None, channels=(), playlists=(),
+                 path=DEFAULT_PREFETCH_PATH, windows=(), youtube_budget=2000, openai_budget=0.0,
+                 summarize=False, language=None, max_attempts=3):
+        self.youtube_api_key = youtube_api_key
+        self.openai_api_key = openai_api_key
+        self.channels = [extract_channel_id(channel) for channel in channels]
+        self.playlists = [extract_playlist_id(playlist) for playlist in playlists]
+        self.windows = list(windows)
+        self.youtube_budget = youtube_budget
+        self.openai_budget = openai_budget
+        self.summarize = summarize and bool(openai_api_key)
+        self.language = language
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+
+        self._conn = open_sqlite(path, _SCHEMA)
+
+    def spent_today(self):
+        """(YouTube units, OpenAI USD) spent by prefetching today"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT youtube_units, openai_usd FROM prefetch_spend WHERE day = ?", (quota_day().isoformat(),)
+            ).fetchone()
+        return row if row else (0, 0.0)
+
+    def remaining(self):
+        """(YouTube units, OpenAI USD) left in today's prefetch budgets"""
+        units, usd = self.spent_today()
+        return max(0, self.youtube_budget - units), max(0.0, self.openai_budget - usd)
+
+    def charge(self, units=0, usd=0.0):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO prefetch_spend (day, youtube_units, openai_usd) VALUES (?, ?, ?) "
+                "ON CONFLICT (day) DO UPDATE SET youtube_units = youtube_units + excluded.youtube_units, "
+                "openai_usd = openai_usd + excluded.openai_usd",
+                (quota_day().isoformat(), units, usd)
+            )
+
+    def _set_status(self, video_id, status, error=None, attempt=False):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE prefetch_videos SET status = ?, error = ?, attempts = attempts + ?, updated_at = ? "
+                "WHERE video_id = ?",
+                (status, error, int(attempt), time.time(), video_id)
+            )
+        registry.inc('prefetch_videos_total', status=status)
+
+    def _known_ids(self):
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT video_id FROM prefetch_videos")}
+
+    def discover(self):
+        """List the watched channels and playlists and record videos not seen before"""
+        known = self._known_ids()
+        sources = [('channel', channel) for channel in self.channels] + [('playlist', p) for p in self.playlists]
+        found = 0
+        for kind, source_id in sources:
+            if self.remaining()[0] <= 0:
+                logger.info("Prefetch YouTube budget spent; skipping discovery of %s %s", kind, source_id)
+                break
+            with trace_request('prefetch.discover') as trace:
+                try:
+                    if kind == 'channel':
+                        video_ids = list_channel_video_ids(self.youtube_api_key, source_id, known)
+                    else:
+                        video_ids = list_playlist_video_ids(self.youtube_api_key, source_id, known)
+                except Exception as e:
+                    logger.warning("Could not list %s %s: %s", kind, source_id, e)
+                    video_ids = []
+            self.charge(units=trace.quota_units)
+
+            now = time.time()
+            new_ids = [video_id for video_id in dict.fromkeys(video_ids) if video_id not in known]
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO prefetch_videos (video_id, source, status, discovered_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    ((video_id, f"{kind}:{source_id}", NEW, now, now) for video_id in new_ids)
+                )
+            known.update(new_ids)
+            found += len(new_ids)
+        return found
+
+    def pending(self, limit=None):
+        """Videos still to prefetch, most recently discovered first"""
+        # Videos with cached captions only need a summary, which waits for OpenAI budget
+        summaries_due = self.summarize and self.remaining()[1] > 0
+        statuses = [NEW, FAILED] + ([CAPTIONS] if summaries_due else [])
+        placeholders = ', '.join('?' for _ in statuses)
+        sql = (f"SELECT video_id FROM prefetch_videos WHERE status IN ({placeholders}) AND attempts < ? "
+               "ORDER BY discovered_at DESC, rowid")
+        params = [*statuses, self.max_attempts]
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            return [row[0] for row in self._conn.execute(sql, params)]
+
+    def prefetch_video(self, video_id):
+        """Warm one video's captions and, within budget, its summary; returns the new status"""
+        reporter = LogReporter(prefix=f"[prefetch {video_id}] ")
+        with trace_request('prefetch') as trace:
+            try:
+                cues = get_video_cues(video_id, self.youtube_api_key, self.language, ui=reporter)
+            finally:
+                self.charge(units=trace.quota_units)
+        if not cues:
+            error = reporter.errors[-1] if reporter.errors else "No captions available"
+            self._set_status(video_id, FAILED, error, attempt=True)
+            return FAILED
+
+        cues = normalize_captions(cues, ui=reporter)
+        index_video(video_id, cues, language=self.language)
+        if not self.summarize:
+            self._set_status(video_id, CAPTIONS)
+            return CAPTIONS
+
+        captions = caption_fragments(cues)
+        if get_summary_cache().get(final_summary_key(captions)) is not None:
+            self._set_status(video_id, SUMMARIZED)
+            return SUMMARIZED
+        estimate = estimate_summary_cost(captions)
+        if estimate > self.remaining()[1]:
+            reporter.info(f"💸 Summary deferred: estimated ${estimate:.2f} exceeds today's prefetch budget")
+            self._set_status(video_id, CAPTIONS)
+            return CAPTIONS
+
+        with trace_request('prefetch') as trace:
+            try:
+                summary = generate_summary_with_gpt4(captions, self.openai_api_key, ui=reporter, video_id=video_id)
+            finally:
+                self.charge(usd=openai_cost(trace.tokens['prompt'], trace.tokens['completion']))
+        if not summary:
+            error = reporter.errors[-1] if reporter.errors else "Summary failed"
+            self._set_status(video_id, CAPTIONS, error, attempt=True)
+            return CAPTIONS
+        index_video(video_id, summary=summary)
+        self._set_status(video_id, SUMMARIZED)
+        return SUMMARIZED
+
+    def run_once(self, ignore_windows=False, max_videos=None):
+        """One prefetch pass: discover new videos, then warm them while the window and budgets allow"""
+        counts = {}
+        with request_priority(PRIORITY_PREFETCH):
+            if not (ignore_windows or in_window(self.windows)):
+                return counts
+            counts['discovered'] = self.discover()
+            for video_id in self.pending(max_videos):
+                if not (ignore_windows or in_window(self.windows)):
+                    logger.info("Prefetch window closed")
+                    break
+                if self.remaining()[0] < CAPTION_FETCH_UNITS:
+                    logger.info("Prefetch YouTube budget spent for today")
+                    break
+                status = self.prefetch_video(video_id)
+                counts[status] = counts.get(status, 0) + 1
+        return counts
+
+    def run_forever(self, interval=3600, stop_event=None):
+        """Run a pass every interval seconds inside the windows, sleeping until the next window otherwise"""
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            try:
+                counts = self.run_once()
+                if counts:
+                    logger.info("Prefetch pass finished: %s", counts)
+            except Exception as e:
+                logger.warning("Prefetch pass failed: %s", e)
+            stop_event.wait(max(interval, seconds_until_window(self.windows)))
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM prefetch_videos GROUP BY status").fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def scheduler_from_env(**overrides):
+    """Build a PrefetchScheduler from environment variables; keyword arguments take precedence"""
+    settings = {
+        'youtube_api_key': os.getenv('YOUTUBE_API_KEY'),
+        'openai_api_key': os.getenv('OPENAI_API_KEY'),
+        'channels': [c for c in os.getenv('PREFETCH_CHANNELS', '').split(',') if c.strip()],
+        'playlists': [p for p in os.getenv('PREFETCH_PLAYLISTS', '').split(',') if p.strip()],
+        'path': os.getenv('PREFETCH_PATH', DEFAULT_PREFETCH_PATH),
+        'windows': parse_windows(os.getenv('PREFETCH_WINDOWS', '')),
+        'youtube_budget': int(os.getenv('PREFETCH_YOUTUBE_QUOTA', '2000')),
+        'openai_budget': float(os.getenv('PREFETCH_OPENAI_BUDGET_USD', '0')),
+        'summarize': os.getenv('PREFETCH_SUMMARIES', '0') == '1',
+        'language': os.getenv('PREFETCH_LANGUAGE') or None,
+    }
+    settings.update({key: value for key, value in overrides.items() if value is not None})
+    return PrefetchScheduler(**settings)
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def start_prefetcher():
+    """Run the prefetcher configured by PREFETCH_* variables on a background thread; safe to call on every rerun"""
+    global _prefetcher
+    with _prefetcher_lock:
+        if _prefetcher is not None:
+            return _prefetcher
+        _prefetcher = scheduler_from_env()
+        if not _prefetcher.youtube_api_key:
+            logger.warning("Prefetch not started: YOUTUBE_API_KEY is not set")
+            return _prefetcher
+        interval = float(os.getenv('PREFETCH_INTERVAL_MINUTES', '60')) * 60
+        threading.Thread(
+            target=_prefetcher.run_forever, args=(interval,), name='prefetch', daemon=True
+        ).start()
+        return _prefetcher
+
+
+def main(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Prefetch captions and summaries of channels and playlists")
+    parser.add_argument('--channel', action='append', help="Channel URL or ID (repeatable; default PREFETCH_CHANNELS)")
+    parser.add_argument('--playlist', action='append', help="Playlist URL or ID (repeatable; default PREFETCH_PLAYLISTS)")
+    parser.add_argument('--summarize', action='store_true', default=None, help="Also pre-generate summaries")
+    parser.add_argument('--youtube-budget', type=int, help="YouTube quota units per day for prefetching")
+    parser.add_argument('--openai-budget', type=float, help="OpenAI spend in USD per day for prefetching")
+    parser.add_argument('--windows', help="Off-peak windows, e.g. '01:00-06:00,22:00-23:30' (local time)")
+    parser.add_argument('--language', help="Preferred caption language code, e.g. 'en'")
+    parser.add_argument('--max-videos', type=int, help="Most videos to warm in this pass")
+    parser.add_argument('--now', action='store_true', help="Ignore the off-peak windows")
+    parser.add_argument('--daemon', action='store_true', help="Keep running, one pass every PREFETCH_INTERVAL_MINUTES")
+    parser.add_argument('-v', '--verbose', action='store_true', help="Log per-video progress messages")
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s %(levelname)s %(message)s'
+    )
+
+    prefetcher = scheduler_from_env(
+        channels=args.channel,
+        playlists=args.playlist,
+        summarize=args.summarize,
+        youtube_budget=args.youtube_budget,
+        openai_budget=args.openai_budget,
+        windows=parse_windows(args.windows) if args.windows is not None else None,
+        language=args.language,
+    )
+    if not prefetcher.youtube_api_key:
+        parser.error("a YouTube Data API key is required (YOUTUBE_API_KEY)")
+    if not (prefetcher.channels or prefetcher.playlists):
+        parser.error("provide at least one --channel or --playlist (or PREFETCH_CHANNELS / PREFETCH_PLAYLISTS)")
+
+    print("🔥 YouTube Caption Summarizer - Prefetch")
+    print("=" * 40)
+    if args.daemon:
+        prefetcher.run_forever(float(os.getenv('PREFETCH_INTERVAL_MINUTES', '60')) * 60)
+        return 0
+
+    if not (args.now or in_window(prefetcher.windows)):
+        print(f"🌙 Outside the prefetch windows; the next one opens in "
+              f"{seconds_until_window(prefetcher.windows) / 60:.0f} minutes (use --now to run anyway)")
+        return 0
+    counts = prefetcher.run_once(ignore_windows=args.now, max_videos=args.max_videos)
+    units, usd = prefetcher.spent_today()
+    print(f"📺 {counts.get('discovered', 0)} new videos discovered")
+    for status in (CAPTIONS, SUMMARIZED, FAILED):
+        if counts.get(status):
+            print(f"   {status}: {counts[status]}")
+    print(f"💰 Spent today: {units}/{prefetcher.youtube_budget} YouTube units, "
+          f"${usd:.2f}/${prefetcher.openai_budget:.2f} OpenAI")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,10 +3,36 @@
 Quick start script for YouTube Caption Summarizer
 """
 
+import importlib.util
+import json
 import subprocess
 import sys
 import os
 
+# Imported by app.py before the first page renders
+STARTUP_MODULES = ['streamlit', 'streamlit_authenticator', 'dotenv', 'auth', 'metrics', 'search_index', 'summarizer', 'jobs', 'prefetch']
+# Imported lazily when the first request needs them
+DEFERRED_MODULES = ['openai', 'googleapiclient.discovery', 'youtube_transcript_api', 'tiktoken']
+
+# Runs in a fresh interpreter so nothing is already imported
+STARTUP_PROBE = """
+import importlib, json, sys, time
+timings = []
+def timed(label, fn):
+    started = time.perf_counter()
+    try:
+        fn()
+        timings.append((label, time.perf_counter() - started, None))
+    except Exception as e:
+        timings.append((label, time.perf_counter() - started, str(e)))
+for name in json.loads(sys.argv[1]):
+    timed(name, lambda: importlib.import_module(name))
+timed('auth config', lambda: importlib.import_module('auth').get_auth_config())
+for name in json.loads(sys.argv[2]):
+    timed(name, lambda: importlib.import_module(name))
+print(json.dumps(timings))
+"""
+
 def check_dependencies():
     """Check if required packages are installed"""
     required_packages = [
@@ -14,18 +40,16 @@ def check_dependencies():
         'youtube_transcript_api',
         'openai',
         'streamlit_authenticator',
+        'googleapiclient',
         'python-dotenv'
     ]
     
     missing_packages = []
     
+    # find_spec locates a package without importing it, which keeps this check fast
     for package in required_packages:
-        try:
-            if package == 'python-dotenv':
-                __import__('dotenv')
-            else:
-                __import__(package.replace('-', '_'))
-        except ImportError:
+        module = 'dotenv' if package == 'python-dotenv' else package.replace('-', '_')
+        if importlib.util.find_spec(module) is None:
             missing_packages.append(package)
     
     if missing_packages:
@@ -51,7 +75,40 @@ def check_env_file():
     print("✅ .env file found!")
     return True
 
+def report_startup_time():
+    """Measure how long a cold app start spends importing modules and loading the auth config"""
+    print("\n⏱️  Measuring cold start...")
+    result = subprocess.run(
+        [sys.executable, "-c", STARTUP_PROBE, json.dumps(STARTUP_MODULES), json.dumps(DEFERRED_MODULES)],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if result.returncode != 0:
+        print(f"❌ Startup probe failed:\n{result.stderr}")
+        return
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    startup = timings[:len(STARTUP_MODULES) + 1]
+    deferred = timings[len(STARTUP_MODULES) + 1:]
+    
+    print("   Before the first page:")
+    for label, seconds, error in startup:
+        print(f"     {label:<28} {seconds * 1000:8.1f} ms" + (f"  ❌ {error}" if error else ""))
+    print(f"     {'total':<28} {sum(t[1] for t in startup) * 1000:8.1f} ms")
+    print("   Deferred until first use:")
+    for label, seconds, error in deferred:
+        print(f"     {label:<28} {seconds * 1000:8.1f} ms" + ("  (not installed)" if error else ""))
+
+def hash_password():
+    """Print a bcrypt hash for auth_config.yaml"""
+    import getpass
+    from auth import hash_password as bcrypt_hash
+    password = getpass.getpass("Password to hash: ")
+    print(bcrypt_hash(password))
+
 def main():
+    if '--hash-password' in sys.argv:
+        hash_password()
+        return
+    
     print("🎬 YouTube Caption Summarizer")
     print("=" * 40)
     
@@ -62,6 +119,9 @@ def main():
     # Check environment file
     check_env_file()
     
+    if '--startup-report' in sys.argv:
+        report_startup_time()
+    
     print("\n🚀 Starting the application...")
     print("📱 Open your browser to: http://localhost:8501")
     print("🔐 Login with: Marco / P@oComOvo13")
@@ -0,0 +1,371 @@
+"""
+Quota- and rate-limit-aware request scheduling for YouTube Caption Summarizer
+
+* YouTube Data API calls are charged against a daily quota-unit budget
+  (captions.list = 50 units, captions.download = 200 units, ...). The budget
+  resets at midnight Pacific time, like the real quota.
+* OpenAI calls draw from requests-per-minute and tokens-per-minute token
+  buckets. Callers that cannot be served yet wait in a priority queue, so
+  interactive requests overtake batch and prefetch work.
+* Transient failures (429, 5xx, connection errors) are retried with jittered
+  exponential backoff, honouring Retry-After when the server sends it.
+"""
+
+import contextvars
+import datetime
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import record_quota, stage
+
+try:
+    from zoneinfo import ZoneInfo
+    _QUOTA_TZ = ZoneInfo('America/Los_Angeles')
+except Exception:  # No tz database available; fall back to UTC days
+    _QUOTA_TZ = datetime.timezone.utc
+
+logger = logging.getLogger(__name__)
+
+# Quota cost (units) of the YouTube Data API v3 operations we use
+YOUTUBE_QUOTA_COSTS = {
+    'captions.list': 50,
+    'captions.download': 200,
+    'playlistItems.list': 1,
+    'channels.list': 1,
+    'search.list': 100,
+    'videos.list': 1,
+}
+
+# Lower value = served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+PRIORITY_PREFETCH = 20
+
+_current_priority = contextvars.ContextVar('request_priority', default=PRIORITY_INTERACTIVE)
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded', 'backendError', 'internalError'}
+
+
+class QuotaBudgetExceeded(Exception):
+    """The configured YouTube quota budget cannot cover the request"""
+
+
+class RateLimitTimeout(Exception):
+    """A request waited longer than allowed for OpenAI rate-limit capacity"""
+
+
+class OpenAIQuotaExhausted(Exception):
+    """The OpenAI account is out of credit (a 429 with code insufficient_quota); retrying cannot help"""
+
+
+@contextmanager
+def request_priority(priority):
+    """Run the enclosed calls (and threads started with a copied context) at the given priority"""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority():
+    return _current_priority.get()
+
+
+def quota_day():
+    """The current YouTube quota day (quota resets at midnight Pacific time)"""
+    return datetime.datetime.now(_QUOTA_TZ).date()
+
+
+class YouTubeQuota:
+    """Tracks quota units spent today against a daily budget"""
+
+    def __init__(self, daily_budget=10000):
+        self.daily_budget = daily_budget
+        self._lock = threading.Lock()
+        self._day = self._today()
+        self._used = 0
+
+    def _today(self):
+        return quota_day()
+
+    def _roll_over(self):
+        today = self._today()
+        if today != self._day:
+            self._day = today
+            self._used = 0
+
+    @property
+    def used(self):
+        with self._lock:
+            self._roll_over()
+            return self._used
+
+    @property
+    def remaining(self):
+        with self._lock:
+            self._roll_over()
+            return max(0, self.daily_budget - self._used)
+
+    def reserve(self, operation):
+        """Charge an operation's cost, raising QuotaBudgetExceeded if the budget cannot cover it"""
+        cost = YOUTUBE_QUOTA_COSTS.get(operation, 1)
+        with self._lock:
+            self._roll_over()
+            if self._used + cost > self.daily_budget:
+                raise QuotaBudgetExceeded(
+                    f"YouTube quota budget exhausted ({self._used}/{self.daily_budget} units used today, "
+                    f"{operation} needs {cost})"
+                )
+            self._used += cost
+        return cost
+
+    def exhaust(self):
+        """Mark today's budget as spent (the API itself reported quotaExceeded)"""
+        with self._lock:
+            self._roll_over()
+            self._used = max(self._used, self.daily_budget)
+
+
+class TokenBucket:
+    """Continuously refilling bucket: capacity units per period seconds"""
+
+    def __init__(self, capacity, period=60.0):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until amount units are available (0 if available now)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+    def give_back(self, amount):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class OpenAIBudget:
+    """RPM/TPM token buckets with a priority queue of waiting callers"""
+
+    def __init__(self, requests_per_minute=500, tokens_per_minute=10000, max_wait=300.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._sequence = itertools.count()
+
+    def acquire(self, tokens, priority=None):
+        """Block until one request and `tokens` tokens can be spent; highest priority goes first"""
+        priority = current_priority() if priority is None else priority
+        ticket = (priority, next(self._sequence))
+        deadline = time.monotonic() + self.max_wait
+        with self._cond:
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    if self._waiters[0] == ticket:
+                        wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+                        if wait <= 0:
+                            self.requests.take(1)
+                            self.tokens.take(tokens)
+                            return
+                    else:
+                        wait = 1.0  # Woken up by notify_all when the queue head changes
+                    if now + wait > deadline:
+                        raise RateLimitTimeout(f"Waited more than {self.max_wait:.0f}s for OpenAI rate-limit capacity")
+                    self._cond.wait(wait)
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    def settle(self, reserved, used):
+        """Return tokens reserved up front but not actually consumed"""
+        if used is None or used >= reserved:
+            return
+        with self._cond:
+            self.tokens.give_back(reserved - used)
+            self._cond.notify_all()
+
+    def penalize(self, seconds):
+        """Drain the buckets after a server-side 429 so queued callers back off too"""
+        with self._cond:
+            now = time.monotonic()
+            self.requests._refill(now)
+            self.tokens._refill(now)
+            self.requests.tokens = min(self.requests.tokens, -seconds * self.requests.rate)
+            self.tokens.tokens = min(self.tokens.tokens, -seconds * self.tokens.rate)
+
+
+def _error_status(error):
+    """HTTP status of an OpenAI or googleapiclient error, if any"""
+    status = getattr(error, 'status_code', None)
+    if status is None and getattr(error, 'resp', None) is not None:
+        status = getattr(error.resp, 'status', None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _error_reason(error):
+    details = getattr(error, 'error_details', None)
+    if details and isinstance(details, list) and isinstance(details[0], dict):
+        return details[0].get('reason')
+    return None
+
+
+def retry_after_seconds(error):
+    """Seconds requested by a Retry-After header on an API error, if present"""
+    headers = None
+    response = getattr(error, 'response', None)
+    if response is not None:
+        headers = getattr(response, 'headers', None)
+    if headers is None and getattr(error, 'resp', None) is not None:
+        headers = error.resp  # httplib2 response is a dict of lower-cased headers
+    if not headers:
+        return None
+    value = headers.get('retry-after') or headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            retry_at = datetime.datetime.strptime(value, '%a, %d %b %Y %H:%M:%S GMT')
+            retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+            return max(0.0, (retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+        except ValueError:
+            return None
+
+
+def is_retryable(error):
+    """True for rate limits, server errors and connection problems; False for quota and client errors"""
+    if isinstance(error, (QuotaBudgetExceeded, RateLimitTimeout, OpenAIQuotaExhausted)):
+        return False
+    reason = _error_reason(error)
+    if reason == 'quotaExceeded':
+        return False
+    if reason in RETRYABLE_REASONS:
+        return True
+    status = _error_status(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # OpenAI connection/timeout errors carry no status code
+    return type(error).__name__ in ('APIConnectionError', 'APITimeoutError', 'Timeout', 'ConnectionError', 'TimeoutError')
+
+
+def backoff_delay(attempt, base=1.0, cap=60.0):
+    """Full-jitter exponential backoff"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class RequestScheduler:
+    """Central gate for every YouTube and OpenAI call made by the pipeline"""
+
+    def __init__(self, youtube_daily_quota=10000, openai_rpm=500, openai_tpm=10000,
+                 max_retries=5, backoff_base=1.0, backoff_cap=60.0, max_wait=300.0):
+        self.quota = YouTubeQuota(youtube_daily_quota)
+        self.openai_budget = OpenAIBudget(openai_rpm, openai_tpm, max_wait=max_wait)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+    def _retry(self, request_fn, on_rate_limit=None):
+        attempt = 0
+        while True:
+            try:
+                return request_fn()
+            except Exception as e:
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                retry_after = retry_after_seconds(e)
+                delay = retry_after if retry_after is not None else backoff_delay(
+                    attempt, self.backoff_base, self.backoff_cap
+                )
+                if _error_status(e) == 429 and on_rate_limit:
+                    on_rate_limit(delay)
+                logger.warning("Retrying after %s (attempt %d/%d, sleeping %.1fs)",
+                               type(e).__name__, attempt + 1, self.max_retries, delay)
+                time.sleep(delay)
+                attempt += 1
+
+    def youtube(self, operation, request_fn):
+        """Run a YouTube Data API request, charging its quota cost and retrying transient errors"""
+        def attempt():
+            record_quota(operation, self.quota.reserve(operation))
+            try:
+                with stage(f"youtube.{operation}"):
+                    return request_fn()
+            except Exception as e:
+                if _error_reason(e) == 'quotaExceeded':
+                    self.quota.exhaust()
+                raise
+        return self._retry(attempt)
+
+    def openai(self, request_fn, estimated_tokens, priority=None, usage_tokens=None):
+        """Run an OpenAI request within the RPM/TPM budget, retrying 429s and transient errors
+
+        usage_tokens(response) may return the tokens actually used so unused
+        reservation is handed back to the bucket.
+        """
+        priority = current_priority() if priority is None else priority
+
+        def attempt():
+            self.openai_budget.acquire(estimated_tokens, priority)
+            try:
+                response = request_fn()
+            except Exception as e:
+                # Billing problems come back as 429s too, but waiting does not fix them
+                if getattr(e, 'code', None) == 'insufficient_quota':
+                    raise OpenAIQuotaExhausted(
+                        "The OpenAI account has run out of credit (insufficient_quota). "
+                        "Check the plan and billing details of the API key"
+                    ) from e
+                raise
+            if usage_tokens is not None:
+                self.openai_budget.settle(estimated_tokens, usage_tokens(response))
+            return response
+        return self._retry(attempt, on_rate_limit=self.openai_budget.penalize)
+
+    def settle_openai(self, estimated_tokens, used_tokens):
+        """Hand back the unused part of a reservation once a streamed response has been read"""
+        self.openai_budget.settle(estimated_tokens, used_tokens)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Return the process-wide request scheduler, configured from environment variables"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler(
+                youtube_daily_quota=int(os.getenv('YOUTUBE_DAILY_QUOTA', '10000')),
+                openai_rpm=int(os.getenv('OPENAI_RPM', '500')),
+                # Conservative default (GPT-4 tier 1); set OPENAI_TPM to the account's real limit
+                openai_tpm=int(os.getenv('OPENAI_TPM', '10000')),
+                max_retries=int(os.getenv('SCHEDULER_MAX_RETRIES', '5')),
+                max_wait=float(os.getenv('SCHEDULER_MAX_WAIT_SECONDS', '300'))
+            )
+        return _scheduler
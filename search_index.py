@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Local full-text search over fetched transcripts and summaries
+
+Captions are indexed in windows of a few seconds of cues, so a hit points to
+a moment in the video; summaries are indexed as one document per video. The
+index is a SQLite FTS5 table ranked with BM25, which answers queries in
+milliseconds across tens of thousands of videos. Videos are added as they are
+processed and re-indexed only when their captions or summary change.
+
+    python search_index.py "cache invalidation"
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from metrics import stage
+from stores import ProcessWide, open_sqlite
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'search.sqlite3')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS indexed_videos (
+    video_id TEXT PRIMARY KEY,
+    language TEXT,
+    captions_hash TEXT,
+    summary_hash TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    video_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    start REAL,
+    end REAL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS segments_video ON segments (video_id, kind);
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(
+    text,
+    content = 'segments',
+    content_rowid = 'id',
+    tokenize = 'porter unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS segments_ai AFTER INSERT ON segments BEGIN
+    INSERT INTO segments_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS segments_ad AFTER DELETE ON segments BEGIN
+    INSERT INTO segments_fts (segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+SearchHit = namedtuple('SearchHit', ['video_id', 'kind', 'start', 'end', 'snippet', 'score'])
+
+_QUERY_TERM = re.compile(r'"[^"]+"|[\w\']+', re.UNICODE)
+
+
+def _hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def fts_query(query, operator='AND'):
+    """Turn free text into a safe FTS5 query of quoted words and phrases"""
+    terms = []
+    for term in _QUERY_TERM.findall(query):
+        phrase = term.strip('"').replace('"', ' ').strip()
+        if phrase:
+            terms.append(f'"{phrase}"')
+    if not terms:
+        return None
+    return f" {operator} ".join(terms)
+
+
+def video_url(video_id, start=None):
+    """YouTube link to a video, at a position in seconds when given"""
+    url = f"https://www.youtube.com/watch?v={video_id}"
+    return f"{url}&t={int(start)}s" if start is not None else url
+
+
+class SearchIndex:
+    """SQLite FTS5 index of caption windows and summaries"""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH, window_seconds=30):
+        self.path = path
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+
+        self._conn = open_sqlite(path, _SCHEMA)
+
+    def _indexed_hash(self, video_id, column):
+        row = self._conn.execute(
+            f"SELECT {column} FROM indexed_videos WHERE video_id = ?", (video_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _replace(self, video_id, kind, rows, column, content_hash, language=None):
+        """Swap the rows of one kind for a video in a single transaction"""
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.execute("DELETE FROM segments WHERE video_id = ? AND kind = ?", (video_id, kind))
+            self._conn.executemany(
+                "INSERT INTO segments (text, video_id, kind, start, end) VALUES (?, ?, ?, ?, ?)",
+                ((text, video_id, kind, start, end) for start, end, text in rows)
+            )
+            self._conn.execute(
+                "INSERT INTO indexed_videos (video_id, language, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (video_id) DO UPDATE SET updated_at = excluded.updated_at, "
+                "language = COALESCE(excluded.language, indexed_videos.language)",
+                (video_id, language, time.time())
+            )
+            self._conn.execute(
+                f"UPDATE indexed_videos SET {column} = ? WHERE video_id = ?", (content_hash, video_id)
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def add_captions(self, video_id, cues, language=None):
+        """Index a video's captions (a CueStore); returns False when they were already indexed"""
+        content_hash = _hash(cues.text())
+        with self._lock:
+            if self._indexed_hash(video_id, 'captions_hash') == content_hash:
+                return False
+            self._replace(video_id, 'caption', cues.windows(self.window_seconds),
+                          'captions_hash', content_hash, language)
+        return True
+
+    def add_summary(self, video_id, summary):
+        """Index a video's summary; returns False when it was already indexed"""
+        content_hash = _hash(summary)
+        with self._lock:
+            if self._indexed_hash(video_id, 'summary_hash') == content_hash:
+                return False
+            self._replace(video_id, 'summary', [(None, None, summary)], 'summary_hash', content_hash)
+        return True
+
+    def remove(self, video_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM segments WHERE video_id = ?", (video_id,))
+            self._conn.execute("DELETE FROM indexed_videos WHERE video_id = ?", (video_id,))
+
+    def search(self, query, limit=20, kind=None):
+        """Best-matching caption windows and summaries, most relevant first"""
+        results = []
+        # Every word must match; fall back to any word when that finds nothing
+        for operator in ('AND', 'OR'):
+            match = fts_query(query, operator)
+            if not match:
+                return []
+            sql = (
+                "SELECT s.video_id, s.kind, s.start, s.end, "
+                "snippet(segments_fts, 0, '**', '**', '…', 16), bm25(segments_fts) "
+                "FROM segments_fts JOIN segments s ON s.id = segments_fts.rowid "
+                "WHERE segments_fts MATCH ?"
+            )
+            params = [match]
+            if kind:
+                sql += " AND s.kind = ?"
+                params.append(kind)
+            sql += " ORDER BY bm25(segments_fts) LIMIT ?"
+            params.append(limit)
+            with self._lock, stage('search.query'):
+                try:
+                    rows = self._conn.execute(sql, params).fetchall()
+                except sqlite3.OperationalError as e:
+                    logger.warning("Search query %r failed: %s", match, e)
+                    return []
+            results = [SearchHit(*row[:5], score=-row[5]) for row in rows]
+            if results:
+                break
+        return results
+
+    def stats(self):
+        with self._lock:
+            videos = self._conn.execute("SELECT COUNT(*) FROM indexed_videos").fetchone()[0]
+            segments = self._conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+        return {'videos': videos, 'segments': segments}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def search_index_from_env():
+    """Build a search index configured from environment variables"""
+    return SearchIndex(
+        path=os.getenv('SEARCH_INDEX_PATH', DEFAULT_INDEX_PATH),
+        window_seconds=float(os.getenv('SEARCH_WINDOW_SECONDS', '30'))
+    )
+
+
+_index = ProcessWide(search_index_from_env)
+
+
+def get_search_index():
+    """Return the process-wide search index"""
+    return _index.get()
+
+
+def index_video(video_id, cues=None, summary=None, language=None):
+    """Add a processed video to the search index; indexing problems never fail the pipeline"""
+    try:
+        with stage('search.index'):
+            index = get_search_index()
+            if cues:
+                index.add_captions(video_id, cues, language)
+            if summary:
+                index.add_summary(video_id, summary)
+    except Exception as e:
+        logger.warning("Could not index %s for search: %s", video_id, e)
+
+
+def main():
+    from caption_parser import format_timestamp
+
+    parser = argparse.ArgumentParser(description="Search indexed transcripts and summaries")
+    parser.add_argument('query', help="Words or \"quoted phrases\" to look for")
+    parser.add_argument('-n', '--limit', type=int, default=20)
+    parser.add_argument('--kind', choices=['caption', 'summary'], help="Only search captions or summaries")
+    args = parser.parse_args()
+
+    index = get_search_index()
+    started = time.perf_counter()
+    hits = index.search(args.query, limit=args.limit, kind=args.kind)
+    elapsed = (time.perf_counter() - started) * 1000
+    stats = index.stats()
+    print(f"🔎 {len(hits)} hits in {elapsed:.1f} ms ({stats['videos']} videos, {stats['segments']} segments indexed)")
+    for hit in hits:
+        where = f"[{format_timestamp(hit.start)}]" if hit.start is not None else "[summary]"
+        print(f"\n{hit.video_id} {where} {video_url(hit.video_id, hit.start)}")
+        print(f"   {hit.snippet}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Request coalescing (single-flight) for YouTube Caption Summarizer
+
+When a video is shared, many sessions ask for the same captions and summary
+at nearly the same time. Calls are keyed by what they fetch (video, language,
+caption track, model and transcript); the first caller of a key does the work
+and every concurrent caller with the same key waits for it and gets the same
+result, so a traffic spike costs one caption download and one set of GPT-4
+requests. Failures are not shared: the waiters then try again themselves,
+since another user's API key or a transient error may be what failed.
+
+With SINGLE_FLIGHT_LEASE_PATH set to a SQLite file that several replicas can
+reach, the first caller also takes a lease on the key there. A replica that
+finds the key leased waits until the lease is released (or expires) and then
+reads the result from the shared caption and summary caches.
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from metrics import registry, stage
+from stores import ProcessWide, open_sqlite
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+def flight_key(kind, *parts):
+    """Readable string key for a call, e.g. captions:<video>:<language>:<track>"""
+    return ':'.join([kind] + ['' if part is None else str(part) for part in parts])
+
+
+class Flight:
+    """One in-flight call; waiters block on done and read result when ok"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.ok = False
+        self.waiters = 0
+
+
+class SQLiteLease:
+    """Cross-process lease on a key, kept alive by a heartbeat while it is held"""
+
+    def __init__(self, path, ttl=60, poll_interval=0.5):
+        self.path = path
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+
+        # The lease file is meant to be shared across hosts, where WAL does not work
+        self._conn = open_sqlite(path, _SCHEMA, journal_mode='DELETE')
+
+    def try_acquire(self, key):
+        """Take or renew the lease on key; False while another owner holds it"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT owner, expires_at FROM leases WHERE key = ?", (key,)).fetchone()
+                if row and row[0] != self.owner and row[1] > now:
+                    self._conn.execute("ROLLBACK")
+                    return False
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO leases (key, owner, expires_at) VALUES (?, ?, ?)",
+                    (key, self.owner, now + self.ttl)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return True
+
+    def release(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, self.owner))
+
+    @contextmanager
+    def hold(self, key):
+        """Wait until the lease on key is ours, and keep renewing it until the block exits"""
+        waited = False
+        started = time.monotonic()
+        while not self.try_acquire(key):
+            if not waited:
+                logger.info("Waiting for another replica working on %s", key)
+                waited = True
+            time.sleep(self.poll_interval)
+        if waited:
+            registry.inc('coalesced_requests_total', kind=key.split(':', 1)[0], scope='replica')
+            logger.info("Lease on %s acquired after %.1fs", key, time.monotonic() - started)
+
+        stopped = threading.Event()
+
+        def heartbeat():
+            while not stopped.wait(self.ttl / 3):
+                try:
+                    self.try_acquire(key)
+                except Exception as e:
+                    logger.warning("Could not renew the lease on %s: %s", key, e)
+
+        renewer = threading.Thread(target=heartbeat, name='lease-heartbeat', daemon=True)
+        renewer.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            try:
+                self.release(key)
+            except Exception as e:
+                logger.warning("Could not release the lease on %s: %s", key, e)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SingleFlight:
+    """Process-wide table of in-flight calls, optionally coordinated across replicas"""
+
+    def __init__(self, lease=None):
+        self.lease = lease
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def join(self, key):
+        """Return (flight, leader): the leader runs the call, everyone else waits on the flight"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = Flight()
+                return flight, True
+            flight.waiters += 1
+            return flight, False
+
+    def finish(self, key, flight, result=None, ok=False):
+        """Publish the leader's result and wake the waiters"""
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.result = result
+        flight.ok = ok
+        flight.done.set()
+
+    def wait(self, key, flight):
+        """Block until the leader finishes; returns (ok, result)"""
+        with stage('single_flight.wait'):
+            flight.done.wait()
+        if flight.ok:
+            registry.inc('coalesced_requests_total', kind=key.split(':', 1)[0], scope='process')
+        return flight.ok, flight.result
+
+    @contextmanager
+    def leased(self, key):
+        """Hold the cross-replica lease on key when one is configured"""
+        if self.lease is None:
+            yield
+            return
+        with self.lease.hold(key):
+            yield
+
+    def do(self, key, fn, succeeded=lambda result: result is not None):
+        """Run fn once for all concurrent callers of key and return its result to each of them
+
+        A failed call (an exception, or a result rejected by succeeded) is not
+        shared: waiters then race again and one of them retries.
+        """
+        while True:
+            flight, leader = self.join(key)
+            if not leader:
+                ok, result = self.wait(key, flight)
+                if ok:
+                    return result
+                continue
+            result = None
+            ok = False
+            try:
+                with self.leased(key):
+                    result = fn()
+                ok = succeeded(result)
+                return result
+            finally:
+                self.finish(key, flight, result, ok)
+
+
+def single_flight_from_env():
+    """Build a single-flight table configured from environment variables"""
+    lease = None
+    path = os.getenv('SINGLE_FLIGHT_LEASE_PATH', '').strip()
+    if path:
+        lease = SQLiteLease(path, ttl=float(os.getenv('SINGLE_FLIGHT_LEASE_SECONDS', '60')))
+    return SingleFlight(lease)
+
+
+_single_flight = ProcessWide(single_flight_from_env)
+
+
+def get_single_flight():
+    """Return the process-wide single-flight table"""
+    return _single_flight.get()
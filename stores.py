@@ -0,0 +1,50 @@
+"""
+Shared plumbing of the SQLite-backed stores of YouTube Caption Summarizer
+
+The caption and summary caches, the search index, the job queue, the prefetch
+ledger and the single-flight leases all open their database with
+open_sqlite, so connection settings are the same everywhere, and expose one
+process-wide instance through a ProcessWide.
+"""
+
+import os
+import sqlite3
+import threading
+
+# Seconds a statement waits for another connection's write lock before failing
+SQLITE_TIMEOUT = 30
+
+
+def open_sqlite(path, schema, timeout=SQLITE_TIMEOUT, journal_mode=None):
+    """Connect to the database at path (created if needed) and apply schema
+
+    The journal mode defaults to SQLITE_JOURNAL_MODE (WAL). WAL needs shared
+    memory between the processes using the file, so it does not work on a
+    network file system; use DELETE for databases shared across hosts. The
+    connection is in autocommit mode and shared between threads, so every
+    store guards it with its own lock.
+    """
+    memory = path == ':memory:'
+    if not memory and os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=timeout)
+    if not memory:
+        journal_mode = journal_mode or os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+        conn.execute(f'PRAGMA journal_mode={journal_mode}')
+    conn.executescript(schema)
+    return conn
+
+
+class ProcessWide:
+    """One lazily built instance per process; factory runs on the first get()"""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.instance = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self.instance is None:
+                self.instance = self.factory()
+            return self.instance
@@ -0,0 +1,1057 @@
+"""
+Fetch, parse and summarize pipeline for YouTube Caption Summarizer
+
+Shared by the Streamlit app (app.py) and the batch CLI (batch.py). Status
+messages go to a reporter object: the app passes the ``streamlit`` module,
+headless callers get a LogReporter.
+"""
+
+import contextvars
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from caption_cache import get_caption_cache
+from caption_normalizer import normalization_report, normalize_cues, parse_steps
+from caption_parser import CueTexts, cues_from_transcript, parse_captions
+from clients import get_openai_client, youtube_client
+from metrics import (
+    record_cache,
+    record_caption_tokens,
+    record_chunk_reuse,
+    record_hedge,
+    record_stage,
+    record_tokens,
+    stage,
+)
+from chunking import (
+    CHARS_PER_TOKEN,
+    chunk_anchor,
+    count_tokens,
+    iter_chunks,
+    iter_sentences,
+    mean_chunk_tokens,
+    token_budget,
+)
+from scheduler import OpenAIQuotaExhausted, QuotaBudgetExceeded, RateLimitTimeout, get_scheduler
+from search_index import index_video
+from singleflight import flight_key, get_single_flight
+from summary_cache import fragments_summary_key, get_summary_cache, summary_key
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Summarization settings
+SUMMARY_MODEL = "gpt-4"
+SUMMARY_MAX_TOKENS = 1000
+SUMMARY_TEMPERATURE = 0.7
+SUMMARY_SYSTEM_PROMPT = "You are a helpful assistant that creates concise, well-structured summaries of YouTube video content based on captions. Focus on the main points, key insights, and important details."
+SUMMARY_USER_PROMPT = "Please create a comprehensive summary of this YouTube video based on its captions. Organize the summary with clear sections and bullet points where appropriate:\n\n{chunk}"
+REDUCE_USER_PROMPT = "The following are summaries of consecutive parts of the same YouTube video. Merge them into one coherent, well-structured summary of the whole video. Remove repetition, keep the overall order, and use clear sections and bullet points where appropriate:\n\n{chunk}"
+SUMMARY_CONCURRENCY = int(os.getenv('SUMMARY_CONCURRENCY', '4'))
+SUMMARY_CHUNK_TOKENS = int(os.getenv('SUMMARY_CHUNK_TOKENS', '0')) or token_budget(SUMMARY_MODEL, SUMMARY_MAX_TOKENS)
+SUMMARY_CHUNK_OVERLAP_TOKENS = int(os.getenv('SUMMARY_CHUNK_OVERLAP_TOKENS', '0'))
+# Most partial summaries merged by one reduce request; more are merged level by level
+SUMMARY_REDUCE_FAN_IN = max(2, int(os.getenv('SUMMARY_REDUCE_FAN_IN', '8')))
+
+# Caption clean-up before summarization: 'all', 'off' or a subset of dedupe,annotations,fillers,repeats
+CAPTION_NORMALIZE_STEPS = parse_steps(os.getenv('CAPTION_NORMALIZE', 'all'))
+
+# Caption track metadata is shared by every session for a short time
+CAPTION_TRACKS_TTL = float(os.getenv('CAPTION_TRACKS_TTL_SECONDS', '300'))
+CAPTION_TRACKS_MAX_VIDEOS = 1024
+_caption_tracks = {}
+_caption_tracks_lock = threading.Lock()
+
+# Hedged caption fetching: start youtube-transcript-api this many seconds after the
+# Data API request (0 = race both at once). Unset disables hedging.
+CAPTION_HEDGE_AFTER = os.getenv('CAPTION_HEDGE_AFTER_SECONDS', '').strip()
+CAPTION_HEDGE_AFTER = float(CAPTION_HEDGE_AFTER) if CAPTION_HEDGE_AFTER else None
+ENGLISH_LANGUAGES = ('en', 'en-US', 'en-GB')
+
+# Progress event yielded by stream_summary_with_gpt4:
+#   'plan'       index = number of chunks: an estimate while the transcript is still being cut,
+#                then again with the exact count once the last chunk has been cut
+#   'changes'    index = number of chunks changed since the video's last summary, text = report
+#   'delta'      index = chunk number, text = new tokens for that chunk
+#   'chunk_done' index = chunk number, text = the chunk's full summary
+#   'reduce'     text = new tokens of the merged summary
+#   'waiting'    text = message: another request is summarizing the same transcript
+#   'done'       text = the final summary
+SummaryEvent = namedtuple('SummaryEvent', ['kind', 'index', 'text'])
+
+
+class LogReporter:
+    """Route pipeline status messages to logging instead of the Streamlit UI"""
+
+    def __init__(self, prefix='', log=None):
+        self.prefix = prefix
+        self.log = log or logger
+        self.errors = []
+
+    def _format(self, message):
+        return f"{self.prefix}{message}"
+
+    def info(self, message):
+        self.log.info(self._format(message))
+
+    def success(self, message):
+        self.log.info(self._format(message))
+
+    def write(self, message):
+        self.log.debug(self._format(message))
+
+    def warning(self, message):
+        self.log.warning(self._format(message))
+
+    def error(self, message):
+        self.errors.append(message)
+        self.log.error(self._format(message))
+
+
+class BufferedReporter(LogReporter):
+    """LogReporter that also keeps the messages, so a worker thread's output can be
+    replayed into the Streamlit UI from the script thread"""
+
+    def __init__(self, prefix='', log=None):
+        super().__init__(prefix, log)
+        self.messages = []
+
+    def info(self, message):
+        self.messages.append(('info', message))
+        super().info(message)
+
+    def success(self, message):
+        self.messages.append(('success', message))
+        super().success(message)
+
+    def write(self, message):
+        self.messages.append(('write', message))
+        super().write(message)
+
+    def warning(self, message):
+        self.messages.append(('warning', message))
+        super().warning(message)
+
+    def error(self, message):
+        self.messages.append(('error', message))
+        super().error(message)
+
+    def replay(self, ui):
+        for method, message in self.messages:
+            getattr(ui, method)(message)
+
+
+def extract_video_id(url):
+    """Extract YouTube video ID from various URL formats"""
+    patterns = [
+        r'(?:youtube\.com\/watch\?v=|youtu\.be\/|youtube\.com\/embed\/)([^&\n?#]+)',
+        r'youtube\.com\/watch\?.*v=([^&\n?#]+)'
+    ]
+    
+    for pattern in patterns:
+        match = re.search(pattern, url)
+        if match:
+            return match.group(1)
+    return None
+
+def list_caption_tracks(video_id, youtube_api_key):
+    """Return the caption tracks of a video, memoized process-wide for CAPTION_TRACKS_TTL seconds"""
+    now = time.monotonic()
+    with _caption_tracks_lock:
+        entry = _caption_tracks.get(video_id)
+    if entry and now - entry[0] < CAPTION_TRACKS_TTL:
+        record_cache('caption_tracks', True)
+        return entry[1]
+    record_cache('caption_tracks', False)
+    
+    with youtube_client(youtube_api_key) as youtube:
+        captions_response = get_scheduler().youtube('captions.list', lambda: youtube.captions().list(
+            part='snippet',
+            videoId=video_id
+        ).execute())
+    
+    tracks = []
+    for caption in captions_response.get('items', []):
+        track_kind = caption['snippet'].get('trackKind', 'standard')
+        is_auto = track_kind == 'ASR'
+        tracks.append({
+            'id': caption['id'],
+            'language': caption['snippet']['language'],
+            'track_kind': track_kind,
+            'etag': caption.get('etag'),
+            'is_auto': is_auto,
+            'type': "Auto-generated" if is_auto else "Manual"
+        })
+    
+    with _caption_tracks_lock:
+        if len(_caption_tracks) >= CAPTION_TRACKS_MAX_VIDEOS:
+            for key in [key for key, (fetched, _) in _caption_tracks.items() if now - fetched >= CAPTION_TRACKS_TTL]:
+                del _caption_tracks[key]
+            if len(_caption_tracks) >= CAPTION_TRACKS_MAX_VIDEOS:
+                _caption_tracks.pop(next(iter(_caption_tracks)))
+        _caption_tracks[video_id] = (now, tracks)
+    return tracks
+
+def parse_caption_payload(content, language=None, track_kind=None):
+    """Parse a downloaded or cached caption payload, timing the parse stage"""
+    with stage('captions.parse'):
+        cues = parse_captions(content)
+    cues.language = language
+    cues.track_kind = track_kind
+    return cues
+
+def timestamped_captions(cues, seconds=60):
+    """Caption fragments with [mm:ss] markers so the summary can point to moments in the video"""
+    return CueTexts(
+        cues, seconds,
+        header="(The captions below include [mm:ss] timestamps. Cite the timestamp next to each key point.)"
+    )
+
+def caption_fragments(cues, timestamps=False):
+    """What to summarize for a CueStore: its cue texts as fragments, optionally timestamped"""
+    return timestamped_captions(cues) if timestamps else CueTexts(cues)
+
+def choose_caption_track(tracks, preferred_language=None, caption_id=None):
+    """Pick the track to download: the one chosen in the UI, the preferred language,
+    English, or else the first available"""
+    # A track chosen in the UI wins over any language preference
+    if caption_id:
+        for track in tracks:
+            if track['id'] == caption_id:
+                return track
+    
+    # If preferred language is specified, try to find it
+    if preferred_language:
+        for track in tracks:
+            if track['language'] == preferred_language:
+                return track
+    
+    # If no preferred language or not found, try English variants
+    for lang in ENGLISH_LANGUAGES:
+        for track in tracks:
+            if track['language'] == lang:
+                return track
+    
+    # If still no caption found, use the first available
+    return tracks[0] if tracks else None
+
+def get_video_cues(video_id, youtube_api_key=None, preferred_language=None, ui=None, caption_id=None):
+    """Download captions for a YouTube video using YouTube Data API v3 or fallback to youtube-transcript-api
+
+    Returns a CueStore with the timed caption cues, or None on failure.
+    """
+    ui = ui or LogReporter()
+    
+    # Serve recently validated captions straight from the cache (no quota cost)
+    cues = cached_video_cues(video_id, preferred_language, ui, caption_id)
+    if cues is not None:
+        return cues
+    record_cache('captions', False)
+    
+    # Concurrent requests for the same captions share one download
+    def fetch():
+        reporter = BufferedReporter(prefix=f"[{video_id}] ")
+        # Another replica may have just finished the download we waited for
+        cues = cached_video_cues(video_id, preferred_language, reporter, caption_id)
+        if cues is None:
+            cues = fetch_video_cues(video_id, youtube_api_key, preferred_language, reporter, caption_id)
+        return cues, reporter
+    
+    key = flight_key('captions', video_id, preferred_language, caption_id, 'api' if youtube_api_key else 'fallback')
+    cues, reporter = get_single_flight().do(key, fetch, succeeded=lambda result: result[0] is not None)
+    reporter.replay(ui)
+    return cues
+
+def cached_video_cues(video_id, preferred_language=None, ui=None, caption_id=None):
+    """Captions validated recently enough to skip the YouTube API, or None"""
+    cache = get_caption_cache()
+    cached = cache.find(video_id, preferred_language, track_id=caption_id)
+    if not (cached and cache.is_fresh(cached)):
+        return None
+    record_cache('captions', True)
+    caption_type = "Auto-generated" if cached['track_kind'] == 'ASR' else "Manual"
+    ui.success(f"⚡ Using cached captions: {cached['language']} ({caption_type})")
+    return parse_caption_payload(cached['content'], cached['language'], cached['track_kind'])
+
+def fetch_video_cues(video_id, youtube_api_key=None, preferred_language=None, ui=None, caption_id=None):
+    """Download captions from YouTube, bypassing the fresh-cache shortcut"""
+    ui = ui or LogReporter()
+    
+    # If no YouTube API key provided, use fallback method
+    if not youtube_api_key:
+        ui.info("ℹ️ Using fallback method (youtube-transcript-api) - for better results, add YouTube Data API key")
+        return get_video_captions_fallback(video_id, preferred_language, ui=ui)
+    
+    if CAPTION_HEDGE_AFTER is not None:
+        return hedged_video_cues(video_id, youtube_api_key, preferred_language, ui, caption_id)
+    return download_video_cues(video_id, youtube_api_key, preferred_language, ui, caption_id)
+
+def download_video_cues(video_id, youtube_api_key, preferred_language=None, ui=None, caption_id=None):
+    """Fetch captions through the YouTube Data API (list, ETag revalidation, download)"""
+    ui = ui or LogReporter()
+    cache = get_caption_cache()
+    
+    # Imported here rather than at module load: googleapiclient is slow to import
+    from googleapiclient.errors import HttpError
+    
+    try:
+        # First, get available caption tracks (memoized across reruns and sessions)
+        available_captions = list_caption_tracks(video_id, youtube_api_key)
+        
+        if not available_captions:
+            ui.error("❌ No captions found for this video.")
+            return None
+        
+        # Display available captions
+        ui.info("ℹ️ Available captions:")
+        for caption in available_captions:
+            ui.write(f"• {caption['language']} - {caption['type']}")
+        
+        # Find the best caption to use
+        caption_to_use = choose_caption_track(available_captions, preferred_language, caption_id)
+        
+        if not caption_to_use:
+            ui.error("❌ No suitable captions found.")
+            return None
+        
+        ui.success(f"✅ Using captions: {caption_to_use['language']} ({caption_to_use['type']})")
+        
+        # Revalidate the cached copy against the track ETag before downloading again
+        cached = cache.get(video_id, caption_to_use['language'], caption_to_use['track_kind'])
+        if cached and cached['etag'] and cached['etag'] == caption_to_use['etag']:
+            record_cache('captions_etag', True)
+            cache.mark_validated(cached)
+            return parse_caption_payload(cached['content'], cached['language'], cached['track_kind'])
+        record_cache('captions_etag', False)
+        
+        # Download the caption content
+        with youtube_client(youtube_api_key) as youtube:
+            caption_response = get_scheduler().youtube('captions.download', lambda: youtube.captions().download(
+                id=caption_to_use['id'],
+                tfmt='srt'  # SubRip format
+            ).execute())
+        
+        srt_content = caption_response.decode('utf-8')
+        cache.put(
+            video_id,
+            caption_to_use['language'],
+            caption_to_use['track_kind'],
+            srt_content,
+            track_id=caption_to_use['id'],
+            etag=caption_to_use['etag']
+        )
+        
+        # Parse the SRT content
+        return parse_caption_payload(srt_content, caption_to_use['language'], caption_to_use['track_kind'])
+        
+    except HttpError as e:
+        error_details = e.error_details[0] if e.error_details else {}
+        reason = error_details.get('reason', 'Unknown error')
+        
+        if reason == 'quotaExceeded':
+            ui.error("❌ YouTube API quota exceeded. Please try again later or use a different API key.")
+        elif reason == 'forbidden':
+            ui.error("❌ Access denied. The video might be private or restricted.")
+        elif reason == 'notFound':
+            ui.error("❌ Video not found or captions not available.")
+        else:
+            ui.error(f"❌ YouTube API error: {reason}")
+        
+        return None
+        
+    except QuotaBudgetExceeded as e:
+        ui.error(f"❌ {str(e)}. Cached captions are still available; new videos can be fetched after the daily reset.")
+        return None
+        
+    except Exception as e:
+        ui.error(f"❌ Error downloading captions: {str(e)}")
+        return None
+
+def get_video_captions_fallback(video_id, preferred_language=None, ui=None):
+    """Fetch captions through youtube-transcript-api (no API key or quota needed)
+
+    Returns a CueStore, or None on failure.
+    """
+    ui = ui or LogReporter()
+    try:
+        # Imported on first use, like the other client libraries
+        from youtube_transcript_api import NoTranscriptFound, TranscriptsDisabled, VideoUnavailable, YouTubeTranscriptApi
+    except ImportError:
+        ui.error("❌ youtube-transcript-api is not installed. Install it or enter a YouTube Data API key.")
+        return None
+    
+    try:
+        with stage('transcript_api.fetch'):
+            transcripts = list(YouTubeTranscriptApi.list_transcripts(video_id))
+            tracks = [
+                {
+                    'id': None,
+                    'language': transcript.language_code,
+                    'track_kind': 'ASR' if transcript.is_generated else 'standard',
+                    'type': "Auto-generated" if transcript.is_generated else "Manual",
+                    'transcript': transcript,
+                }
+                for transcript in transcripts
+            ]
+            track = choose_caption_track(tracks, preferred_language)
+            if not track:
+                ui.error("❌ No captions found for this video.")
+                return None
+            items = track['transcript'].fetch()
+        
+        cues = cues_from_transcript(items)
+        cues.language = track['language']
+        cues.track_kind = track['track_kind']
+        if not len(cues):
+            ui.error("❌ The transcript for this video is empty.")
+            return None
+        ui.success(f"✅ Using captions: {track['language']} ({track['type']})")
+        
+        # Cache it like a Data API download, without overwriting an entry that has a track ETag
+        cache = get_caption_cache()
+        if cache.get(video_id, track['language'], track['track_kind']) is None:
+            cache.put(video_id, track['language'], track['track_kind'], cues.to_srt())
+        return cues
+    
+    except TranscriptsDisabled:
+        ui.error("❌ Subtitles are disabled for this video.")
+        return None
+    
+    except (NoTranscriptFound, VideoUnavailable):
+        ui.error("❌ Video not found or captions not available.")
+        return None
+    
+    except Exception as e:
+        ui.error(f"❌ Error fetching transcript: {str(e)}")
+        return None
+
+def hedged_video_cues(video_id, youtube_api_key, preferred_language=None, ui=None, caption_id=None):
+    """Race the Data API against youtube-transcript-api and return the first valid transcript
+
+    The transcript API is started CAPTION_HEDGE_AFTER seconds after the Data API
+    request, or straight away if the Data API fails first. The slower source is
+    left to finish in the background.
+    """
+    ui = ui or LogReporter()
+    sources = {
+        'YouTube Data API': lambda reporter: download_video_cues(
+            video_id, youtube_api_key, preferred_language, reporter, caption_id
+        ),
+        'youtube-transcript-api': lambda reporter: get_video_captions_fallback(
+            video_id, preferred_language, reporter
+        ),
+    }
+    primary, hedge = list(sources)
+    reporters = {source: BufferedReporter(prefix=f"[{video_id} {source}] ") for source in sources}
+    results = queue.Queue()
+    
+    def fetch(source):
+        started = time.monotonic()
+        try:
+            cues = sources[source](reporters[source])
+        except Exception as e:
+            reporters[source].error(f"❌ Error downloading captions: {str(e)}")
+            cues = None
+        results.put((source, cues, time.monotonic() - started))
+    
+    # Not a with-block: the losing fetch must not delay the answer
+    executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='caption-hedge')
+    try:
+        submit_in_context(executor, fetch, primary)
+        hedge_at = time.monotonic() + CAPTION_HEDGE_AFTER
+        running = 1
+        hedge_started = False
+        while running:
+            timeout = None if hedge_started else max(0.0, hedge_at - time.monotonic())
+            try:
+                source, cues, elapsed = results.get(timeout=timeout)
+            except queue.Empty:
+                source = None
+            else:
+                running -= 1
+                if cues:
+                    reporters[source].replay(ui)
+                    record_hedge(source)
+                    if hedge_started:
+                        ui.info(f"🏁 Captions from {source} arrived first ({elapsed:.1f}s)")
+                    return cues
+            if not hedge_started:
+                # Hedge delay elapsed, or the primary source failed
+                hedge_started = True
+                running += 1
+                submit_in_context(executor, fetch, hedge)
+    finally:
+        executor.shutdown(wait=False)
+    
+    # Both sources failed: show why the primary one did
+    record_hedge(None)
+    reporters[primary].replay(ui)
+    return None
+
+def normalize_captions(cues, ui=None, language=None, track_kind=None):
+    """Clean up caption cues before summarization and report the tokens saved
+
+    language and track_kind ('ASR' or 'standard') default to the track the
+    cues were fetched from; filler words are only removed for English tracks.
+    """
+    ui = ui or LogReporter()
+    if not CAPTION_NORMALIZE_STEPS or not cues:
+        return cues
+    started = time.monotonic()
+    normalized = normalize_cues(cues, CAPTION_NORMALIZE_STEPS, language, track_kind)
+    report = normalization_report(cues, normalized, SUMMARY_MODEL)
+    saved = report.tokens_before - report.tokens_after
+    record_stage('captions.normalize', started, time.monotonic() - started, detail=f"{saved} tokens saved")
+    record_caption_tokens(report.tokens_before, report.tokens_after)
+    if not len(normalized):
+        # Nothing but annotations and fillers; summarize the original rather than nothing
+        return cues
+    ui.info(
+        f"🧹 Cleaned up captions: {report.tokens_before} → {report.tokens_after} tokens "
+        f"({saved / max(1, report.tokens_before):.0%} saved)"
+    )
+    return normalized
+
+def summary_messages(chunk, prompt=SUMMARY_USER_PROMPT):
+    """Build the chat messages used to summarize one chunk of captions"""
+    return [
+        {
+            "role": "system",
+            "content": SUMMARY_SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": prompt.format(chunk=chunk)
+        }
+    ]
+
+def estimate_request_tokens(messages):
+    """Upper bound of the tokens a chat request can consume: the prompt plus max_tokens"""
+    return sum(count_tokens(message['content'], SUMMARY_MODEL) + 4 for message in messages) + SUMMARY_MAX_TOKENS
+
+def submit_in_context(executor, fn, *args):
+    """Submit to a thread pool carrying over context variables such as the request priority"""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+def openai_stage_name(prompt):
+    """Metrics stage name of a chat request"""
+    return 'openai.reduce' if prompt == REDUCE_USER_PROMPT else 'openai.chunk'
+
+def chunk_summary_key(chunk, prompt=SUMMARY_USER_PROMPT):
+    """Cache key of one chunk summary"""
+    return summary_key(
+        chunk, SUMMARY_MODEL, summary_messages('', prompt),
+        max_tokens=SUMMARY_MAX_TOKENS, temperature=SUMMARY_TEMPERATURE
+    )
+
+def final_summary_key(captions):
+    """Cache key of the final summary of a whole transcript
+
+    captions is the text or re-iterable fragments of it (such as CueTexts);
+    both give the same key. A one-shot iterator has no key (None).
+    """
+    if not isinstance(captions, str) and iter(captions) is captions:
+        return None
+    key = summary_key if isinstance(captions, str) else fragments_summary_key
+    return key(
+        captions, SUMMARY_MODEL, summary_messages(''),
+        max_tokens=SUMMARY_MAX_TOKENS, temperature=SUMMARY_TEMPERATURE, level='summary',
+        reduce_prompt=REDUCE_USER_PROMPT, chunk_tokens=SUMMARY_CHUNK_TOKENS,
+        overlap_tokens=SUMMARY_CHUNK_OVERLAP_TOKENS, reduce_fan_in=SUMMARY_REDUCE_FAN_IN
+    )
+
+def estimate_chunk_count(captions):
+    """Rough number of chunks a transcript makes, from its length; 0 for a one-shot iterator"""
+    if isinstance(captions, str):
+        chars = len(captions)
+    elif iter(captions) is captions:
+        return 0
+    else:
+        chars = sum(len(fragment) + 1 for fragment in captions)
+    return max(1, -(-chars // (CHARS_PER_TOKEN * mean_chunk_tokens(SUMMARY_CHUNK_TOKENS))))
+
+class SummaryManifest:
+    """The summaries of a video's previous run, and the ones this run uses
+
+    Entries are keyed by content hash, so a chunk whose text did not change
+    since the last run is found again wherever it moved in the transcript.
+    The anchors of the previous chunks make the new transcript be cut at the
+    same places. Without a video ID nothing is looked up or stored.
+    """
+
+    def __init__(self, cache, video_id=None):
+        self.cache = cache
+        self.video_id = video_id
+        previous = cache.get_manifest(video_id) if video_id else []
+        self.previous = {key: summary for key, _, summary, _ in previous}
+        self.anchors = {anchor for _, level, _, anchor in previous if level == 'chunk' and anchor is not None}
+        self.had_previous = bool(previous)
+        self.entries = {}  # key -> (level, summary, anchor) of this run
+        self.reused = 0
+        self.changed = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, key):
+        return self.previous.get(key)
+
+    def plan(self, chunk_keys):
+        """Count chunks of this run that the previous run already summarized"""
+        reused = sum(1 for key in chunk_keys if key in self.previous)
+        with self._lock:
+            self.reused += reused
+            self.changed += len(chunk_keys) - reused
+        record_chunk_reuse(reused, len(chunk_keys) - reused)
+
+    def record(self, key, prompt, chunk, summary):
+        if prompt == REDUCE_USER_PROMPT:
+            entry = ('merge', summary, None)
+        else:
+            entry = ('chunk', summary, chunk_anchor(chunk))
+        with self._lock:
+            self.entries[key] = entry
+
+    def report(self):
+        """Status message comparing this run with the previous one, or None for a first run"""
+        if not self.had_previous:
+            return None
+        total = self.reused + self.changed
+        return (f"♻️ {self.changed} of {total} chunks changed since the last summary; "
+                f"reused {self.reused} chunk summaries")
+
+    def save(self, final_key, summary):
+        """Store this run's summaries as the video's new manifest"""
+        if not self.video_id:
+            return
+        entries = [(key, *entry) for key, entry in self.entries.items()]
+        if final_key:
+            entries.append((final_key, 'summary', summary, None))
+        self.cache.put_manifest(self.video_id, entries)
+
+def _summarize_cached(chunk, cache, prompt, manifest, request):
+    """Yield the summary of a chunk as it arrives, from the cache or from request(messages)
+
+    Cache lookup and cache and manifest bookkeeping shared by summarize_chunk
+    and stream_chunk; request yields the text of a new summary.
+    """
+    key = chunk_summary_key(chunk, prompt)
+    cached = manifest.lookup(key) if manifest else None
+    if cached is None:
+        cached = cache.get(key)
+    record_cache('summary_chunk', cached is not None)
+    if cached is not None:
+        if manifest:
+            manifest.record(key, prompt, chunk, cached)
+        yield cached
+        return
+    
+    parts = []
+    for delta in request(summary_messages(chunk, prompt)):
+        parts.append(delta)
+        yield delta
+    summary = ''.join(parts)
+    cache.put(key, summary, level='chunk')
+    if manifest:
+        manifest.record(key, prompt, chunk, summary)
+
+def summarize_chunk(client, chunk, cache, prompt=SUMMARY_USER_PROMPT, manifest=None):
+    """Summarize a single chunk, reusing a cached result for identical input"""
+    def request(messages):
+        with stage(openai_stage_name(prompt)):
+            response = get_scheduler().openai(
+                lambda: client.chat.completions.create(
+                    model=SUMMARY_MODEL,
+                    messages=messages,
+                    max_tokens=SUMMARY_MAX_TOKENS,
+                    temperature=SUMMARY_TEMPERATURE
+                ),
+                estimated_tokens=estimate_request_tokens(messages),
+                usage_tokens=lambda response: response.usage.total_tokens if getattr(response, 'usage', None) else None
+            )
+        if getattr(response, 'usage', None):
+            record_tokens(response.usage.prompt_tokens, response.usage.completion_tokens)
+        yield response.choices[0].message.content or ''
+    
+    return ''.join(_summarize_cached(chunk, cache, prompt, manifest, request))
+
+def stream_chunk(client, chunk, cache, prompt=SUMMARY_USER_PROMPT, manifest=None):
+    """Summarize a single chunk with the streaming API, yielding text as it arrives"""
+    def request(messages):
+        estimated_tokens = estimate_request_tokens(messages)
+        # Streaming responses carry no usage block, so count the tokens locally
+        prompt_tokens = sum(count_tokens(message['content'], SUMMARY_MODEL) for message in messages)
+        scheduler = get_scheduler()
+        parts = []
+        with stage(openai_stage_name(prompt), detail='streamed'):
+            stream = scheduler.openai(
+                lambda: client.chat.completions.create(
+                    model=SUMMARY_MODEL,
+                    messages=messages,
+                    max_tokens=SUMMARY_MAX_TOKENS,
+                    temperature=SUMMARY_TEMPERATURE,
+                    stream=True
+                ),
+                estimated_tokens=estimated_tokens
+            )
+            try:
+                for part in stream:
+                    delta = part.choices[0].delta.content if part.choices else None
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+            finally:
+                # Also settle a stream that failed or was abandoned part-way
+                completion_tokens = count_tokens(''.join(parts), SUMMARY_MODEL)
+                scheduler.settle_openai(estimated_tokens, prompt_tokens + completion_tokens)
+        record_tokens(prompt_tokens, completion_tokens)
+    
+    return _summarize_cached(chunk, cache, prompt, manifest, request)
+
+def reduce_summaries(client, summaries, cache, manifest=None):
+    """Merge partial chunk summaries into one coherent summary"""
+    if len(summaries) == 1:
+        return summaries[0]
+    return summarize_chunk(client, '\n\n'.join(summaries), cache, prompt=REDUCE_USER_PROMPT, manifest=manifest)
+
+class TreeReducer:
+    """Fold an ordered stream of summaries into one, merging groups level by level
+
+    Each level holds at most fan_in summaries that together fit max_tokens. A
+    full group is merged into a single summary on the next level, so memory
+    stays at O(fan_in * depth) summaries however long the video is.
+    """
+
+    def __init__(self, merge, fan_in=SUMMARY_REDUCE_FAN_IN, max_tokens=SUMMARY_CHUNK_TOKENS):
+        self.merge = merge
+        self.fan_in = fan_in
+        self.max_tokens = max_tokens
+        self.levels = []  # levels[k] = [(summary, tokens), ...] in transcript order
+        self.merges = 0
+
+    def add(self, summary, level=0):
+        while len(self.levels) <= level:
+            self.levels.append([])
+        tokens = count_tokens(summary, SUMMARY_MODEL)
+        group = self.levels[level]
+        if group and (len(group) >= self.fan_in or sum(t for _, t in group) + tokens > self.max_tokens):
+            self.levels[level] = []
+            self._merge_up(group, level)
+        self.levels[level].append((summary, tokens))
+
+    def _merge_up(self, group, level):
+        if len(group) > 1:
+            self.merges += 1
+            self.add(self.merge([summary for summary, _ in group]), level + 1)
+        else:
+            self.add(group[0][0], level + 1)
+
+    def finish(self, merge_last=True):
+        """Merge what is left; returns the summary, or the last group when merge_last is False"""
+        level = 0
+        while level < len(self.levels):
+            group = self.levels[level]
+            # Higher levels hold earlier parts of the video, so the remainder goes after them
+            if any(self.levels[level + 1:]):
+                if group:
+                    self.levels[level] = []
+                    self._merge_up(group, level)
+                level += 1
+                continue
+            summaries = [summary for summary, _ in group]
+            if not merge_last:
+                return summaries
+            if len(summaries) > 1:
+                self.merges += 1
+                return self.merge(summaries)
+            return summaries[0] if summaries else None
+        return None if merge_last else []
+
+def _summary_events(client, captions, cache, manifest, final_key, concurrency=None, streamed=True):
+    """The map and reduce pipeline of generate_summary_with_gpt4 and stream_summary_with_gpt4
+
+    Chunks are cut lazily, at most `concurrency` of them are in flight, and
+    finished summaries are folded into a TreeReducer in transcript order.
+    Yields SummaryEvents ending with 'done'; with streamed, chunk and final
+    merge requests use the streaming API so their deltas arrive as events.
+    """
+    concurrency = max(1, concurrency or SUMMARY_CONCURRENCY)
+    reducer = TreeReducer(lambda group: reduce_summaries(client, group, cache, manifest))
+    
+    def summarize(chunk, prompt=SUMMARY_USER_PROMPT):
+        if streamed:
+            return stream_chunk(client, chunk, cache, prompt, manifest)
+        return [summarize_chunk(client, chunk, cache, prompt, manifest)]
+    
+    chunks = iter_chunks(
+        iter_sentences(captions),
+        model=SUMMARY_MODEL,
+        max_tokens=SUMMARY_CHUNK_TOKENS,
+        overlap_tokens=SUMMARY_CHUNK_OVERLAP_TOKENS,
+        anchors=manifest.anchors
+    )
+    chunking_seconds = 0.0
+    started = time.monotonic()
+    
+    def cut():
+        nonlocal chunking_seconds
+        cut_started = time.monotonic()
+        chunk = next(chunks, None)
+        chunking_seconds += time.monotonic() - cut_started
+        return chunk
+    
+    # Map: worker threads push their deltas onto a queue that this generator drains
+    events = queue.Queue()
+    
+    def work(index, chunk):
+        try:
+            parts = []
+            for delta in summarize(chunk):
+                parts.append(delta)
+                events.put(SummaryEvent('delta', index, delta))
+            events.put(SummaryEvent('chunk_done', index, ''.join(parts)))
+        except Exception as e:
+            events.put(SummaryEvent('error', index, e))
+    
+    in_flight = deque()  # indexes of chunks submitted but not folded into the reducer yet
+    finished = {}  # index -> summary of chunks that finished ahead of an earlier one
+    chunk_count = 0
+    upcoming = cut()  # One chunk of lookahead tells whether the transcript is used up
+    if upcoming is None:
+        raise ValueError("The captions contain no text to summarize")
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        planned = False
+        while True:
+            # Keep the window full; the oldest chunk must be folded before another starts
+            while upcoming is not None and len(in_flight) < concurrency:
+                manifest.plan([chunk_summary_key(upcoming)])
+                submit_in_context(executor, work, chunk_count, upcoming)
+                in_flight.append(chunk_count)
+                chunk_count += 1
+                upcoming = cut()
+                if upcoming is None:
+                    planned = False  # Announce the exact count
+            if not planned:
+                total = chunk_count if upcoming is None else max(chunk_count + 1, estimate_chunk_count(captions))
+                yield SummaryEvent('plan', total, '')
+                planned = True
+            if not in_flight:
+                break
+            event = events.get()
+            if event.kind == 'error':
+                raise event.text
+            if event.kind == 'chunk_done':
+                finished[event.index] = event.text
+                while in_flight and in_flight[0] in finished:
+                    reducer.add(finished.pop(in_flight.popleft()))
+            yield event
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        record_stage('chunking', started, chunking_seconds, detail=f"{chunk_count} chunks")
+    
+    if manifest.report():
+        yield SummaryEvent('changes', manifest.changed, manifest.report())
+    
+    # Reduce: intermediate levels were merged along the way; the final merge comes as 'reduce' deltas
+    final_group = reducer.finish(merge_last=False)
+    if len(final_group) == 1:
+        summary = final_group[0]
+    else:
+        parts = []
+        for delta in summarize('\n\n'.join(final_group), REDUCE_USER_PROMPT):
+            parts.append(delta)
+            yield SummaryEvent('reduce', None, delta)
+        summary = ''.join(parts)
+    logger.info("Summarized %d chunks with %d merge requests", chunk_count, reducer.merges + (len(final_group) > 1))
+    
+    if final_key:
+        cache.put(final_key, summary, level='summary')
+    manifest.save(final_key, summary)
+    yield SummaryEvent('done', None, summary)
+
+def cached_final_summary(cache, manifest, final_key):
+    """Final summary of an unchanged transcript, from the video's manifest or the cache"""
+    if not final_key:
+        return None
+    cached = manifest.lookup(final_key)
+    if cached is None:
+        cached = cache.get(final_key)
+    record_cache('summary_final', cached is not None)
+    return cached
+
+def summary_flight_key(video_id, final_key):
+    """Single-flight key of a summary: the video, the model and the exact transcript sent"""
+    return flight_key('summary', video_id, SUMMARY_MODEL, final_key)
+
+def generate_summary_with_gpt4(captions, api_key, concurrency=None, ui=None, video_id=None):
+    """Generate summary using OpenAI GPT-4: chunks are summarized in parallel and merged hierarchically
+
+    captions is the transcript text, or an iterable of text fragments such as cue texts.
+    With a video_id, only chunks that changed since the video's last summary are sent.
+    """
+    ui = ui or LogReporter()
+    try:
+        cache = get_summary_cache()
+        manifest = SummaryManifest(cache, video_id)
+        
+        # A cached final summary skips the OpenAI round trip entirely
+        final_key = final_summary_key(captions)
+        cached = cached_final_summary(cache, manifest, final_key)
+        if cached is not None:
+            return cached
+        
+        def summarize():
+            # Another replica may have just written the summary we waited for
+            cached = cache.get(final_key) if final_key else None
+            if cached is not None:
+                return cached
+            summary = None
+            for event in _summary_events(get_openai_client(api_key), captions, cache, manifest, final_key,
+                                         concurrency, streamed=False):
+                if event.kind == 'changes':
+                    ui.info(event.text)
+                elif event.kind == 'done':
+                    summary = event.text
+            return summary
+        
+        # Concurrent requests for the same transcript share one set of OpenAI requests;
+        # a one-shot iterator has no key until it is read, so it is not coalesced
+        if not final_key:
+            return summarize()
+        return get_single_flight().do(summary_flight_key(video_id, final_key), summarize)
+    
+    except RateLimitTimeout as e:
+        ui.error(f"⏳ {str(e)}. The OpenAI budget is saturated, please try again shortly.")
+        return None
+    
+    except OpenAIQuotaExhausted as e:
+        ui.error(f"💳 {str(e)}.")
+        return None
+    
+    except Exception as e:
+        ui.error(f"Error generating summary: {str(e)}")
+        return None
+
+def stream_summary_with_gpt4(captions, api_key, concurrency=None, video_id=None):
+    """Yield SummaryEvents while chunks are summarized in parallel and then merged
+
+    captions is the transcript text, or text fragments such as CueTexts; chunks
+    are cut as they are needed. Deltas of different chunks arrive interleaved
+    while they are in flight. With a video_id, only chunks that changed since
+    the video's last summary are sent. Errors are raised to the caller.
+    """
+    cache = get_summary_cache()
+    manifest = SummaryManifest(cache, video_id)
+    
+    final_key = final_summary_key(captions)
+    cached = cached_final_summary(cache, manifest, final_key)
+    if cached is not None:
+        yield SummaryEvent('done', None, cached)
+        return
+    if final_key is None:
+        yield from _summary_events(get_openai_client(api_key), captions, cache, manifest, final_key, concurrency)
+        return
+    
+    # Concurrent requests for the same transcript share one set of OpenAI requests:
+    # later callers wait for the first one's summary instead of streaming their own
+    flights = get_single_flight()
+    key = summary_flight_key(video_id, final_key)
+    while True:
+        flight, leader = flights.join(key)
+        if leader:
+            break
+        yield SummaryEvent('waiting', None, "⏳ This video is already being summarized for another request, sharing its result...")
+        ok, summary = flights.wait(key, flight)
+        if ok:
+            yield SummaryEvent('done', None, summary)
+            return
+    
+    summary = None
+    try:
+        with flights.leased(key):
+            # Another replica may have just written the summary we waited for
+            cached = cache.get(final_key)
+            if cached is not None:
+                summary = cached
+                yield SummaryEvent('done', None, cached)
+                return
+            for event in _summary_events(get_openai_client(api_key), captions, cache, manifest, final_key,
+                                         concurrency):
+                if event.kind == 'done':
+                    summary = event.text
+                yield event
+    finally:
+        flights.finish(key, flight, summary, summary is not None)
+
+def extract_playlist_id(value):
+    """Extract a playlist ID from a playlist URL, or return the value if it already is one"""
+    match = re.search(r'[?&]list=([^&\n#]+)', value)
+    return match.group(1) if match else value.strip()
+
+def extract_channel_id(value):
+    """Extract a channel ID from a /channel/ URL, or return the value if it already is one"""
+    match = re.search(r'youtube\.com\/channel\/([^\/?&\n#]+)', value)
+    return match.group(1) if match else value.strip()
+
+def list_playlist_video_ids(youtube_api_key, playlist_id, known=None):
+    """Return the video IDs of a playlist, following pagination
+
+    With a set of already known IDs, paging of a channel's uploads playlist
+    (UU...) stops after the first page that holds only known videos, since
+    uploads are listed newest first. Other playlists add new videos at the
+    end or anywhere else, so they are always read in full.
+    """
+    if not playlist_id.startswith('UU'):
+        known = None
+    video_ids = []
+    page_token = None
+    while True:
+        with youtube_client(youtube_api_key) as youtube:
+            response = get_scheduler().youtube('playlistItems.list', lambda: youtube.playlistItems().list(
+                part='contentDetails',
+                playlistId=playlist_id,
+                maxResults=50,
+                pageToken=page_token
+            ).execute())
+        page = [item['contentDetails']['videoId'] for item in response.get('items', [])]
+        video_ids += page
+        page_token = response.get('nextPageToken')
+        if not page_token or (known is not None and page and known.issuperset(page)):
+            return video_ids
+
+def list_channel_video_ids(youtube_api_key, channel_id, known=None):
+    """Return the video IDs of a channel's uploads playlist"""
+    with youtube_client(youtube_api_key) as youtube:
+        response = get_scheduler().youtube('channels.list', lambda: youtube.channels().list(
+            part='contentDetails',
+            id=channel_id
+        ).execute())
+    if not response.get('items'):
+        return []
+    uploads = response['items'][0]['contentDetails']['relatedPlaylists']['uploads']
+    return list_playlist_video_ids(youtube_api_key, uploads, known)
+
+def summarize_video(video_id, youtube_api_key, openai_api_key, preferred_language=None, concurrency=None,
+                    timestamps=False, ui=None):
+    """Run the full fetch -> parse -> summarize pipeline for one video"""
+    ui = ui or LogReporter()
+    cues = get_video_cues(video_id, youtube_api_key, preferred_language, ui=ui)
+    if not cues:
+        return {'video_id': video_id, 'captions': None, 'summary': None}
+    cues = normalize_captions(cues, ui=ui)
+    index_video(video_id, cues, language=preferred_language)
+    summary = generate_summary_with_gpt4(
+        caption_fragments(cues, timestamps), openai_api_key, concurrency=concurrency, ui=ui, video_id=video_id
+    )
+    if summary:
+        index_video(video_id, summary=summary)
+    return {'video_id': video_id, 'captions': cues.text(), 'summary': summary}
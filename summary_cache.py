@@ -0,0 +1,158 @@
+"""
+Content-addressed summary cache for YouTube Caption Summarizer
+
+Besides the shared cache, every video keeps a manifest: the chunk, merge and
+final summaries of its last successful run, keyed by the same content hashes,
+and where each chunk ended. Manifests are not evicted, so refreshing a video
+whose captions barely changed can reuse its unchanged parts however old they are.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from stores import ProcessWide, open_sqlite
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'summaries.sqlite3')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS summaries (
+    key TEXT PRIMARY KEY,
+    level TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS summaries_last_access ON summaries (last_access);
+CREATE TABLE IF NOT EXISTS manifests (
+    video_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    level TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    anchor INTEGER,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (video_id, position)
+);
+"""
+
+
+def summary_key(text, model, messages, **params):
+    """Hash the input text together with everything that influences the completion"""
+    payload = json.dumps(
+        {'text': text, 'model': model, 'messages': messages, 'params': params},
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def fragments_summary_key(fragments, model, messages, **params):
+    """summary_key of ' '.join(fragments), hashed without building the joined text"""
+    # 'text' sorts last, so the payload is this prefix, the escaped text and '"}'
+    prefix = json.dumps({'messages': messages, 'model': model, 'params': params}, sort_keys=True, ensure_ascii=False)
+    digest = hashlib.sha256(prefix[:-1].encode('utf-8') + b', "text": "')
+    for i, fragment in enumerate(fragments):
+        escaped = json.dumps(fragment, ensure_ascii=False)[1:-1]
+        digest.update(((' ' if i else '') + escaped).encode('utf-8'))
+    digest.update(b'"}')
+    return digest.hexdigest()
+
+
+class SummaryCache:
+    """SQLite-backed store of chunk-level and final summaries with TTL and LRU eviction"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=30 * 24 * 3600, max_entries=10000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        self._conn = open_sqlite(path, _SCHEMA)
+
+    def get(self, key):
+        """Return the cached summary for a key, or None if missing or expired"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, created_at FROM summaries WHERE key = ?", (key,)
+            ).fetchone()
+            if not row:
+                return None
+            summary, created_at = row
+            if now - created_at >= self.ttl:
+                self._conn.execute("DELETE FROM summaries WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE summaries SET last_access = ? WHERE key = ?", (now, key))
+        return summary
+
+    def put(self, key, summary, level='chunk'):
+        """Store a summary; level is 'chunk' or 'summary'"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (key, level, summary, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, level, summary, now, now)
+            )
+        self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used entries above max_entries"""
+        with self._lock:
+            self._conn.execute("DELETE FROM summaries WHERE created_at < ?", (time.time() - self.ttl,))
+            count = self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM summaries WHERE key IN "
+                    "(SELECT key FROM summaries ORDER BY last_access LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+
+    def get_manifest(self, video_id):
+        """Return the (key, level, summary, anchor) entries of a video's last run, in order"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT key, level, summary, anchor FROM manifests WHERE video_id = ? ORDER BY position", (video_id,)
+            ).fetchall()
+
+    def put_manifest(self, video_id, entries):
+        """Replace a video's manifest with (key, level, summary, anchor) entries"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute("DELETE FROM manifests WHERE video_id = ?", (video_id,))
+                self._conn.executemany(
+                    "INSERT INTO manifests (video_id, position, key, level, summary, anchor, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    ((video_id, position, key, level, summary, anchor, now)
+                     for position, (key, level, summary, anchor) in enumerate(entries))
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def summary_cache_from_env():
+    """Build a summary cache configured from environment variables"""
+    return SummaryCache(
+        path=os.getenv('SUMMARY_CACHE_PATH', DEFAULT_CACHE_PATH),
+        ttl=float(os.getenv('SUMMARY_CACHE_TTL_HOURS', '720')) * 3600,
+        max_entries=int(os.getenv('SUMMARY_CACHE_MAX_ENTRIES', '10000'))
+    )
+
+
+_cache = ProcessWide(summary_cache_from_env)
+
+
+def get_summary_cache():
+    """Return the process-wide summary cache"""
+    return _cache.get()
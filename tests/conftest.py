@@ -0,0 +1,30 @@
+"""
+Shared test set-up: the app modules live at the repository root, and every
+on-disk store is pointed at a temporary directory before they are imported.
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_CACHE_DIR = tempfile.mkdtemp(prefix='yt-summarizer-tests-')
+for name, filename in [
+    ('CAPTION_CACHE_PATH', 'captions.sqlite3'),
+    ('SUMMARY_CACHE_PATH', 'summaries.sqlite3'),
+    ('SEARCH_INDEX_PATH', 'search.sqlite3'),
+    ('JOBS_PATH', 'jobs.sqlite3'),
+    ('PREFETCH_PATH', 'prefetch.sqlite3'),
+]:
+    os.environ.setdefault(name, os.path.join(_CACHE_DIR, filename))
+
+
+@pytest.fixture(autouse=True)
+def estimated_token_counts(monkeypatch):
+    """Count tokens with the character estimate; tiktoken would download its encodings"""
+    import chunking
+    monkeypatch.setattr(chunking, '_tiktoken', False)
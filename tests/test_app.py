@@ -0,0 +1,41 @@
+import json
+import time
+
+from streamlit.testing.v1 import AppTest
+
+import jobs
+from jobs import DONE, JobQueue
+
+
+def _jobs_page():
+    import app
+    app.render_jobs('alice', show_trace=True)
+
+
+def test_finished_job_renders_inside_its_expander(monkeypatch):
+    queue = JobQueue(':memory:', workers=1)
+    result = {
+        'captions': "hello and welcome to the channel",
+        'summary': "## Summary\n- A greeting",
+        'trace': {
+            'summary': {'total_seconds': 1.5, 'prompt_tokens': 120, 'completion_tokens': 30,
+                        'cache_hits': 1, 'cache_misses': 2, 'youtube_quota_units': 250},
+            'rows': [{'stage': 'openai.chunk', 'seconds': 1.2}],
+        },
+    }
+    now = time.time()
+    queue._conn.execute(
+        "INSERT INTO jobs (id, owner, video_id, params, status, progress, message, result, created_at, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        ('job-1', 'alice', 'dQw4w9WgXcQ', '{}', DONE, 1.0, "Summary generated", json.dumps(result), now, now)
+    )
+    monkeypatch.setattr(jobs._queue, 'instance', queue)
+
+    at = AppTest.from_function(_jobs_page).run(timeout=30)
+
+    assert not at.exception
+    assert len(at.get('expandable')) == 1
+    assert [tab.label for tab in at.tabs] == ["📝 Summary", "📄 Captions", "🔍 Request trace"]
+    assert at.text_area[0].value == result['captions']
+    assert "A greeting" in at.markdown[0].value
+    queue.close()
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+import batch
+import summarizer
+from caption_parser import CueStore
+
+
+@pytest.fixture
+def url_file(tmp_path):
+    path = tmp_path / 'videos.txt'
+    path.write_text("https://www.youtube.com/watch?v=dQw4w9WgXcQ\n", encoding='utf-8')
+    return str(path)
+
+
+def test_urls_do_not_need_a_youtube_key(url_file, monkeypatch):
+    monkeypatch.delenv('YOUTUBE_API_KEY', raising=False)
+    args = batch.parse_args(['--urls', url_file, '--openai-api-key', 'sk-test'])
+    assert args.youtube_api_key is None
+
+
+@pytest.mark.parametrize('source', [['--playlist', 'PL123'], ['--channel', 'UC123']])
+def test_playlists_and_channels_need_a_youtube_key(source, monkeypatch, capsys):
+    monkeypatch.delenv('YOUTUBE_API_KEY', raising=False)
+    with pytest.raises(SystemExit):
+        batch.parse_args(source + ['--openai-api-key', 'sk-test'])
+    assert "YouTube Data API key" in capsys.readouterr().err
+
+
+def test_urls_without_a_key_use_the_transcript_fallback(url_file, tmp_path, monkeypatch):
+    monkeypatch.delenv('YOUTUBE_API_KEY', raising=False)
+    fetched = []
+
+    def fallback(video_id, preferred_language=None, ui=None):
+        fetched.append(video_id)
+        cues = CueStore()
+        cues.append(0, 4, "Welcome to the channel.")
+        return cues
+
+    monkeypatch.setattr(summarizer, 'get_video_captions_fallback', fallback)
+    monkeypatch.setattr(summarizer, 'generate_summary_with_gpt4', lambda *args, **kwargs: "A short greeting.")
+    output = tmp_path / 'out.jsonl'
+
+    assert batch.main(['--urls', url_file, '--openai-api-key', 'sk-test', '-o', str(output)]) == 0
+
+    assert fetched == ['dQw4w9WgXcQ']
+    record = json.loads(output.read_text(encoding='utf-8'))
+    assert record['status'] == 'ok'
+    assert record['summary'] == "A short greeting."
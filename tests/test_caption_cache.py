@@ -0,0 +1,77 @@
+import itertools
+
+import pytest
+
+import caption_cache
+import scheduler
+import summarizer
+from benchmarks.fake_servers import FakeYouTubeServer, FaultProfile
+from caption_cache import CaptionCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A clock that moves one second per reading, so access order is unambiguous"""
+    class Clock:
+        ticks = itertools.count(1000)
+
+        @classmethod
+        def time(cls):
+            return float(next(cls.ticks))
+
+    monkeypatch.setattr(caption_cache, 'time', Clock)
+    return Clock
+
+
+def test_least_recently_used_entries_are_evicted_first(clock):
+    cache = CaptionCache(':memory:', max_bytes=25)
+    cache.put('a', 'en', 'standard', 'x' * 10)
+    cache.put('b', 'en', 'standard', 'x' * 10)
+    assert cache.get('a', 'en', 'standard')  # a is now more recent than b
+    cache.put('c', 'en', 'standard', 'x' * 10)
+
+    assert cache.get('a', 'en', 'standard') is not None
+    assert cache.get('b', 'en', 'standard') is None
+    assert cache.get('c', 'en', 'standard') is not None
+
+
+def test_entries_past_max_age_are_evicted(clock):
+    cache = CaptionCache(':memory:', max_age=5)
+    cache.put('old', 'en', 'standard', 'old captions')
+    for _ in range(10):
+        clock.time()
+    cache.put('new', 'en', 'standard', 'new captions')
+    assert cache.get('old', 'en', 'standard') is None
+    assert cache.get('new', 'en', 'standard') is not None
+
+
+@pytest.fixture
+def fake_youtube(monkeypatch):
+    server = FakeYouTubeServer(FaultProfile(latency=0, jitter=0, seed=1)).start()
+    monkeypatch.setenv('YOUTUBE_API_ENDPOINT', server.url)
+    monkeypatch.setattr(summarizer, '_caption_tracks', {})
+    monkeypatch.setattr(scheduler, '_scheduler', scheduler.RequestScheduler(backoff_base=0))
+    yield server
+    server.stop()
+
+
+def test_stale_captions_are_revalidated_by_etag(fake_youtube, monkeypatch):
+    cache = CaptionCache(':memory:', revalidate_after=0)
+    monkeypatch.setattr(summarizer, 'get_caption_cache', lambda: cache)
+
+    def fetch():
+        summarizer._caption_tracks.clear()
+        return summarizer.get_video_cues('short-etag', 'etag-test-key')
+
+    first = fetch()
+    assert fake_youtube.stats['captions.download'] == 1
+
+    # Same ETag upstream: the cached copy is served after one captions.list call
+    assert fetch().text() == first.text()
+    assert fake_youtube.stats['captions.list'] == 2
+    assert fake_youtube.stats['captions.download'] == 1
+
+    # The track changed upstream: it is downloaded again
+    cache._conn.execute("UPDATE captions SET etag = 'outdated'")
+    fetch()
+    assert fake_youtube.stats['captions.download'] == 2
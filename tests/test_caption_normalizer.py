@@ -0,0 +1,51 @@
+from caption_normalizer import normalize_cues, track_steps
+from caption_parser import CueStore, parse_captions
+from summarizer import normalize_captions, parse_caption_payload
+
+GERMAN_SRT = """1
+00:00:01,000 --> 00:00:03,000
+Er sagt, er kommt morgen.
+
+2
+00:00:03,000 --> 00:00:05,000
+Ah, das ist gut, hmm.
+"""
+
+
+def _cues(*texts, language=None, track_kind=None):
+    cues = CueStore(language, track_kind)
+    for i, text in enumerate(texts):
+        cues.append(i * 2.0, i * 2.0 + 2.0, text)
+    return cues
+
+
+def test_fillers_are_removed_from_english_tracks():
+    cues = _cues("So um we er start here, uh, today", language='en-US', track_kind='ASR')
+    assert normalize_cues(cues).text() == "So we start here, today"
+
+
+def test_non_english_track_keeps_its_words():
+    cues = parse_caption_payload(GERMAN_SRT, 'de', 'ASR')
+    normalized = normalize_captions(cues)
+    assert normalized.text() == "Er sagt, er kommt morgen. Ah, das ist gut, hmm."
+    assert normalized.language == 'de'
+
+
+def test_unknown_language_skips_fillers():
+    assert 'fillers' not in track_steps(('dedupe', 'fillers'), None)
+    assert normalize_cues(_cues("er sagt nein")).text() == "er sagt nein"
+
+
+def test_rolling_dedupe_only_applies_to_auto_generated_tracks():
+    texts = ("we are going to look at", "going to look at caching")
+    assert normalize_cues(_cues(*texts, language='en', track_kind='ASR')).text() == \
+        "we are going to look at caching"
+    assert normalize_cues(_cues(*texts, language='en', track_kind='standard')).text() == \
+        "we are going to look at going to look at caching"
+
+
+def test_fetched_tracks_carry_their_language():
+    assert parse_captions(GERMAN_SRT).language is None
+    cues = parse_caption_payload(GERMAN_SRT, 'de', 'standard')
+    part = cues.take(0, 1)
+    assert (part.language, part.track_kind) == ('de', 'standard')
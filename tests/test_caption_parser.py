@@ -0,0 +1,66 @@
+from caption_parser import CueStore, CueTexts, parse_captions, parse_timestamp
+
+
+def test_srt_with_bom_crlf_markup_and_no_trailing_blank_line():
+    payload = (
+        "\ufeff1\r\n00:00:01,000 --> 00:00:02,500\r\nHello <i>there</i>,\r\nsecond line\r\n\r\n"
+        "2\r\n00:00:03,000 --> 00:00:04,000\r\nTom &amp; Jerry"
+    )
+    cues = parse_captions(payload.encode('utf-8'))
+    assert list(cues) == [(1.0, 2.5, "Hello there, second line"), (3.0, 4.0, "Tom & Jerry")]
+
+
+def test_webvtt_header_notes_styles_identifiers_and_cue_settings():
+    payload = """WEBVTT - Some title
+Kind: captions
+Language: en
+
+STYLE
+::cue { color: yellow; }
+
+NOTE This comment
+spans two lines
+
+intro
+00:01.000 --> 00:02.000 align:start position:0%
+<c.colorE5E5E5>first</c><00:00:01.500><c> words</c>
+
+01:00:00.250 --> 01:00:01.000
+late cue
+"""
+    cues = parse_captions(payload)
+    assert list(cues) == [(1.0, 2.0, "first words"), (3600.25, 3601.0, "late cue")]
+
+
+def test_malformed_and_empty_cues_are_skipped():
+    payload = """1
+00:00:01,000 --> not a time
+lost text
+
+2
+00:00:02,000 --> 00:00:03,000
+<b></b>
+
+3
+00:00:04,000 --> 00:00:05,000
+kept
+"""
+    assert [cue.text for cue in parse_captions(payload)] == ["kept"]
+
+
+def test_timestamp_forms():
+    assert parse_timestamp("00:01:02,5") == 62.5
+    assert parse_timestamp("01:02.050") == 62.05
+    assert parse_timestamp("10:00:00.000") == 36000.0
+
+
+def test_windows_slices_and_fragments_agree_with_text():
+    cues = CueStore('en', 'ASR')
+    for i in range(10):
+        cues.append(i * 10.0, i * 10.0 + 9.0, f"cue {i}")
+    assert cues.text() == ' '.join(f"cue {i}" for i in range(10))
+    assert [cue.text for cue in cues.slice(25, 45)] == ["cue 2", "cue 3", "cue 4"]
+    assert [start for start, _, _ in cues.windows(30)] == [0, 30, 60, 90]
+    assert CueTexts(cues).text() == cues.text()
+    assert next(iter(CueTexts(cues, seconds=30))) == "[00:00] cue 0 cue 1 cue 2"
+    assert cues.take(0, 3).language == 'en'
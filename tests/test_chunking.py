@@ -0,0 +1,59 @@
+import chunking
+
+
+class _OfflineTiktoken:
+    """tiktoken whose encodings cannot be downloaded"""
+
+    @staticmethod
+    def encoding_for_model(model):
+        raise ConnectionError("cannot reach openaipublic.blob.core.windows.net")
+
+    get_encoding = encoding_for_model
+
+
+def test_count_tokens_estimates_when_the_encoding_cannot_be_loaded(monkeypatch):
+    monkeypatch.setattr(chunking, '_tiktoken', _OfflineTiktoken)
+    monkeypatch.setattr(chunking, '_encoders', {})
+    assert chunking.count_tokens('x' * 40) == 40 // chunking.CHARS_PER_TOKEN
+    assert chunking._tiktoken is False
+
+
+def _transcript(count, start=0):
+    return [f"Sentence {i} covers topic {i * 7919 % 1000} in some depth." for i in range(start, start + count)]
+
+
+def _changed(old, new):
+    """Chunks of new that were not in old, when new is cut along old's anchors"""
+    old_chunks = chunking.chunk_segments(old, max_tokens=400)
+    new_chunks = chunking.chunk_segments(new, max_tokens=400,
+                                         anchors={chunking.chunk_anchor(chunk) for chunk in old_chunks})
+    assert len(old_chunks) > 10
+    return [chunk for chunk in new_chunks if chunk not in set(old_chunks)]
+
+
+def test_inserting_a_sentence_only_changes_the_chunk_around_it():
+    old = _transcript(600)
+    assert len(_changed(old, ["A new introduction."] + old)) <= 2
+    assert len(_changed(old, old[:300] + ["An aside in the middle of the talk."] + old[300:])) <= 2
+
+
+def test_deleting_a_sentence_only_changes_the_chunk_around_it():
+    old = _transcript(600)
+    assert len(_changed(old, old[1:])) <= 2
+    assert len(_changed(old, old[:250] + old[251:])) <= 2
+
+
+def test_lengthening_a_sentence_only_changes_the_chunk_around_it():
+    old = _transcript(600)
+    for position in (0, 170, 599):
+        new = list(old)
+        new[position] += " It also goes into the history of the idea and several well known counterexamples."
+        assert len(_changed(old, new)) <= 2
+
+
+def test_boundaries_do_not_depend_on_earlier_text():
+    # Without anchors from a previous run the chunks still line up after an insertion
+    old = chunking.chunk_segments(_transcript(600), max_tokens=400)
+    new = chunking.chunk_segments(["A new introduction."] + _transcript(600), max_tokens=400)
+    assert len(set(new) - set(old)) <= 2
+    assert all(chunking.count_tokens(chunk) <= 400 for chunk in new)
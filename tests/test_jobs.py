@@ -0,0 +1,44 @@
+import threading
+import time
+
+import pytest
+
+import jobs
+
+
+@pytest.fixture
+def blocked_runs(monkeypatch):
+    """Jobs stay queued or running until the test releases them"""
+    release = threading.Event()
+    monkeypatch.setattr(jobs.JobQueue, '_run', lambda self, job_id, *args: release.wait(5))
+    yield
+    release.set()
+
+
+def test_starting_another_queue_leaves_running_jobs_alone(tmp_path, blocked_runs):
+    path = str(tmp_path / 'jobs.sqlite3')
+    first = jobs.JobQueue(path, workers=1, stale_after=60)
+    job_id = first.submit('alice', 'dQw4w9WgXcQ', None, 'sk-test')
+    first.update(job_id, status=jobs.RUNNING)
+
+    second = jobs.JobQueue(path, workers=1, stale_after=60)
+    assert second.get(job_id)['status'] == jobs.RUNNING
+
+    # The first process stops sending heartbeats
+    first.update(job_id, heartbeat_at=time.time() - 120)
+    second._recover()
+    job = second.get(job_id)
+    assert job['status'] == jobs.FAILED
+    assert 'restart' in job['error']
+    first.close()
+    second.close()
+
+
+def test_heartbeat_keeps_own_jobs_alive(tmp_path, blocked_runs):
+    queue = jobs.JobQueue(str(tmp_path / 'jobs.sqlite3'), workers=1, stale_after=0.2)
+    job_id = queue.submit('alice', 'dQw4w9WgXcQ', None, 'sk-test')
+    time.sleep(0.5)
+    other = jobs.JobQueue(queue.path, workers=1, stale_after=0.2)
+    assert other.get(job_id)['status'] == jobs.QUEUED
+    queue.close()
+    other.close()
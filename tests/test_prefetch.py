@@ -0,0 +1,140 @@
+import datetime
+from contextlib import contextmanager
+
+import prefetch
+import summarizer
+from caption_parser import CueStore
+
+
+class _FakePlaylists:
+    """playlistItems().list(...).execute() over fixed pages of video IDs"""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.requests = 0
+
+    def playlistItems(self):
+        return self
+
+    def list(self, part, playlistId, maxResults, pageToken=None):
+        index = int(pageToken or 0)
+        self.requests += 1
+        response = {'items': [{'contentDetails': {'videoId': video_id}} for video_id in self.pages[index]]}
+        if index + 1 < len(self.pages):
+            response['nextPageToken'] = str(index + 1)
+        return _Request(response)
+
+
+class _Request:
+    def __init__(self, response):
+        self.response = response
+
+    def execute(self):
+        return self.response
+
+
+def _use_fake_youtube(monkeypatch, fake):
+    @contextmanager
+    def youtube_client(api_key):
+        yield fake
+
+    monkeypatch.setattr(summarizer, 'youtube_client', youtube_client)
+
+
+def test_new_video_at_the_end_of_a_playlist_is_discovered(monkeypatch, tmp_path):
+    fake = _FakePlaylists([['a', 'b'], ['c', 'new']])
+    _use_fake_youtube(monkeypatch, fake)
+    scheduler = prefetch.PrefetchScheduler('yt-key', playlists=['PLlist'], path=str(tmp_path / 'prefetch.sqlite3'))
+    scheduler._conn.executemany(
+        "INSERT INTO prefetch_videos (video_id, source, status, discovered_at, updated_at) VALUES (?, '', ?, 0, 0)",
+        [(video_id, prefetch.NEW) for video_id in 'abc']
+    )
+
+    assert scheduler.discover() == 1
+    assert fake.requests == 2
+
+
+def test_uploads_playlist_stops_at_a_page_of_known_videos(monkeypatch):
+    fake = _FakePlaylists([['new', 'a'], ['b', 'c'], ['d', 'e']])
+    _use_fake_youtube(monkeypatch, fake)
+
+    video_ids = summarizer.list_playlist_video_ids('yt-key', 'UUchannel', known={'a', 'b', 'c'})
+    assert video_ids == ['new', 'a', 'b', 'c']
+    assert fake.requests == 2
+
+
+def _scheduler(tmp_path, **kwargs):
+    return prefetch.PrefetchScheduler('yt-key', path=str(tmp_path / 'prefetch.sqlite3'), **kwargs)
+
+
+def _add_videos(scheduler, video_ids, status=prefetch.NEW):
+    scheduler._conn.executemany(
+        "INSERT INTO prefetch_videos (video_id, source, status, discovered_at, updated_at) VALUES (?, '', ?, ?, 0)",
+        [(video_id, status, -i) for i, video_id in enumerate(video_ids)]
+    )
+
+
+def test_spend_ledger_survives_restarts_and_resets_daily(monkeypatch, tmp_path):
+    monkeypatch.setattr(prefetch, 'quota_day', lambda: datetime.date(2026, 10, 16))
+    scheduler = _scheduler(tmp_path, youtube_budget=300, openai_budget=1.0)
+    scheduler.charge(units=250)
+    scheduler.charge(units=100, usd=0.4)
+    scheduler.close()
+
+    scheduler = _scheduler(tmp_path, youtube_budget=300, openai_budget=1.0)
+    assert scheduler.spent_today() == (350, 0.4)
+    assert scheduler.remaining() == (0, 0.6)
+
+    monkeypatch.setattr(prefetch, 'quota_day', lambda: datetime.date(2026, 10, 17))
+    assert scheduler.spent_today() == (0, 0.0)
+    assert scheduler.remaining() == (300, 1.0)
+
+
+def test_pass_stops_when_the_youtube_budget_is_spent(monkeypatch, tmp_path):
+    fake = _FakePlaylists([[]])
+    _use_fake_youtube(monkeypatch, fake)
+    budget = 2 * prefetch.CAPTION_FETCH_UNITS + prefetch.CAPTION_FETCH_UNITS // 2
+    scheduler = _scheduler(tmp_path, playlists=['PLlist'], youtube_budget=budget)
+    _add_videos(scheduler, ['v1', 'v2', 'v3', 'v4'])
+    warmed = []
+
+    def prefetch_video(video_id):
+        warmed.append(video_id)
+        scheduler.charge(units=prefetch.CAPTION_FETCH_UNITS)
+        return prefetch.CAPTIONS
+
+    monkeypatch.setattr(scheduler, 'prefetch_video', prefetch_video)
+
+    assert scheduler.run_once(ignore_windows=True) == {'discovered': 0, prefetch.CAPTIONS: 2}
+    assert warmed == ['v1', 'v2']
+
+    # Too little left for another caption fetch: listing is still affordable
+    assert scheduler.run_once(ignore_windows=True) == {'discovered': 0}
+    assert warmed == ['v1', 'v2']
+
+    # Nothing left: the playlist is not even listed
+    scheduler.charge(units=scheduler.remaining()[0])
+    requests = fake.requests
+    assert scheduler.run_once(ignore_windows=True) == {'discovered': 0}
+    assert fake.requests == requests
+
+
+def test_summary_waits_for_openai_budget(monkeypatch, tmp_path):
+    cues = CueStore('en', 'standard')
+    for i in range(400):
+        cues.append(i * 5, i * 5 + 5, f"Sentence number {i} of a long talk about caching and budgets.")
+    monkeypatch.setattr(prefetch, 'get_video_cues', lambda *args, **kwargs: cues)
+    monkeypatch.setattr(prefetch, 'index_video', lambda *args, **kwargs: None)
+
+    def generate_summary(*args, **kwargs):
+        raise AssertionError("summarized over budget")
+
+    monkeypatch.setattr(prefetch, 'generate_summary_with_gpt4', generate_summary)
+    scheduler = _scheduler(tmp_path, openai_api_key='sk-test', summarize=True, openai_budget=0.05)
+    _add_videos(scheduler, ['long'])
+
+    assert scheduler.prefetch_video('long') == prefetch.CAPTIONS
+    assert scheduler.pending() == ['long']  # retried once more budget is left today
+
+    scheduler.charge(usd=0.05)
+    assert scheduler.pending() == []
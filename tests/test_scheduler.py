@@ -0,0 +1,71 @@
+import httpx
+import openai
+import pytest
+
+import scheduler
+import summarizer
+from benchmarks.fake_servers import FakeOpenAIServer, FaultProfile
+from clients import ClientRegistry
+from summary_cache import SummaryCache
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    def start(**faults):
+        server = FakeOpenAIServer(FaultProfile(latency=0, jitter=0, retry_after=0, seed=1, **faults),
+                                  completion_tokens=20, tokens_per_second=10000).start()
+        monkeypatch.setenv('OPENAI_BASE_URL', server.url)
+        return server
+
+    servers = []
+    yield lambda **faults: servers.append(start(**faults)) or servers[-1]
+    for server in servers:
+        server.stop()
+
+
+def test_429_is_retried_exactly_max_retries_times(fake_openai):
+    server = fake_openai(rate_limit_rate=1.0)
+    client = ClientRegistry().openai('test-key')
+    requests = scheduler.RequestScheduler(openai_rpm=10 ** 6, openai_tpm=10 ** 9, max_retries=2, backoff_base=0)
+
+    with pytest.raises(openai.RateLimitError):
+        requests.openai(
+            lambda: client.chat.completions.create(model='gpt-4', messages=[{'role': 'user', 'content': 'hi'}]),
+            estimated_tokens=10
+        )
+
+    # One attempt plus max_retries retries, and no extra attempts inside the SDK
+    assert server.stats['chat.completions'] == 3
+    assert server.stats['http_429'] == 3
+
+
+def test_streamed_request_hands_back_unused_reservation(fake_openai, monkeypatch):
+    fake_openai()
+    requests = scheduler.RequestScheduler(openai_rpm=10 ** 6, openai_tpm=100000)
+    monkeypatch.setattr(scheduler, '_scheduler', requests)
+    client = ClientRegistry().openai('test-key')
+
+    chunk = "Caching keeps repeat requests cheap. " * 20
+    summary = ''.join(summarizer.stream_chunk(client, chunk, SummaryCache(':memory:')))
+
+    messages = summarizer.summary_messages(chunk)
+    used = sum(summarizer.count_tokens(message['content']) for message in messages)
+    used += summarizer.count_tokens(summary)
+    # Only the tokens actually used stay taken, not the prompt plus max_tokens reservation
+    assert used < summarizer.estimate_request_tokens(messages) - 500
+    assert requests.openai_budget.tokens.tokens == pytest.approx(100000 - used, abs=50)
+
+
+def test_insufficient_quota_fails_without_retrying():
+    attempts = []
+    response = httpx.Response(429, request=httpx.Request('POST', 'http://127.0.0.1/v1/chat/completions'))
+
+    def request():
+        attempts.append(1)
+        raise openai.RateLimitError("You exceeded your current quota", response=response,
+                                    body={'code': 'insufficient_quota', 'type': 'insufficient_quota'})
+
+    requests = scheduler.RequestScheduler(openai_rpm=10 ** 6, openai_tpm=10 ** 9, max_retries=5, backoff_base=0)
+    with pytest.raises(scheduler.OpenAIQuotaExhausted, match='billing'):
+        requests.openai(request, estimated_tokens=10)
+    assert len(attempts) == 1
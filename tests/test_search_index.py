@@ -0,0 +1,59 @@
+from caption_parser import CueStore
+from search_index import SearchIndex, fts_query, video_url
+
+
+def _cues(*texts, seconds=30):
+    cues = CueStore('en', 'standard')
+    for i, text in enumerate(texts):
+        cues.append(i * seconds, i * seconds + seconds - 1, text)
+    return cues
+
+
+def _index():
+    index = SearchIndex(':memory:', window_seconds=30)
+    index.add_captions('caching', _cues(
+        "Today we talk about caching.",
+        "A cache keeps caching results close, and caching is cheap.",
+        "Eviction of caching entries uses least recently used order.",
+    ))
+    index.add_captions('cooking', _cues(
+        "Today we bake bread.",
+        "Caching is mentioned once in passing.",
+    ))
+    return index
+
+
+def test_bm25_ranks_the_denser_match_first():
+    hits = _index().search("caching")
+    assert hits[0].video_id == 'caching'
+    assert hits[0].start == 30.0
+    assert hits == sorted(hits, key=lambda hit: -hit.score)
+    assert {hit.video_id for hit in hits} == {'caching', 'cooking'}
+
+
+def test_snippets_highlight_stemmed_terms_with_positions():
+    hit = _index().search("evicting entries")[0]
+    assert (hit.video_id, hit.kind, hit.start) == ('caching', 'caption', 60.0)
+    assert '**Eviction**' in hit.snippet and '**entries**' in hit.snippet
+    assert video_url(hit.video_id, hit.start) == "https://www.youtube.com/watch?v=caching&t=60s"
+
+
+def test_all_words_first_then_any_word():
+    index = _index()
+    assert [hit.video_id for hit in index.search("bread today")] == ['cooking']
+    # No window has both words: fall back to windows with either of them
+    assert {hit.video_id for hit in index.search("bread eviction")} == {'caching', 'cooking'}
+
+
+def test_summaries_are_searchable_and_reindexing_is_skipped_when_unchanged():
+    index = _index()
+    assert index.add_summary('caching', "Key points: LRU eviction and TTLs.")
+    assert not index.add_summary('caching', "Key points: LRU eviction and TTLs.")
+    assert [hit.kind for hit in index.search("TTLs", kind='summary')] == ['summary']
+    assert not index.add_captions('cooking', _cues("Today we bake bread.", "Caching is mentioned once in passing."))
+
+
+def test_query_syntax_is_escaped():
+    assert fts_query('cache AND "hit rate" OR') == '"cache" AND "AND" AND "hit rate" AND "OR"'
+    assert _index().search('NEAR( "unbalanced') == []
+    assert fts_query('  ') is None
@@ -0,0 +1,134 @@
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+from singleflight import SingleFlight, SQLiteLease, flight_key
+
+ROOT = Path(__file__).resolve().parent.parent
+
+_HOLDER = """
+import sys
+from singleflight import SQLiteLease
+lease = SQLiteLease(sys.argv[1], ttl=30)
+with lease.hold('captions:abc:en:'):
+    print('held', flush=True)
+    sys.stdin.readline()
+"""
+
+
+def _run_concurrently(flight, key, fn, callers):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do(key, fn))) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return "captions"
+
+    threads, results = _run_concurrently(flight, flight_key('captions', 'abc', 'en', None), fetch, 5)
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        flights = list(flight._flights.values())
+        if flights and flights[0].waiters == 4:
+            break
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == ["captions"] * 5
+    assert flight._flights == {}
+
+
+def test_failures_are_not_shared():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            started.set()
+            release.wait(5)
+            raise RuntimeError("quota")
+        return "summary"
+
+    errors = []
+
+    def leader():
+        try:
+            flight.do('summary:abc', flaky)
+        except RuntimeError as e:
+            errors.append(e)
+
+    first = threading.Thread(target=leader)
+    first.start()
+    started.wait(5)
+    threads, results = _run_concurrently(flight, 'summary:abc', flaky, 1)
+    release.set()
+    for thread in [first] + threads:
+        thread.join(5)
+
+    assert len(errors) == 1
+    assert results == ["summary"]
+    assert len(calls) == 2
+
+
+def test_lease_excludes_other_owners_until_released_or_expired(tmp_path):
+    path = str(tmp_path / 'leases.sqlite3')
+    first = SQLiteLease(path, ttl=0.2)
+    second = SQLiteLease(path, ttl=0.2)
+
+    assert first.try_acquire('k')
+    assert first.try_acquire('k')  # renewing our own lease
+    assert not second.try_acquire('k')
+    first.release('k')
+    assert second.try_acquire('k')
+
+    time.sleep(0.3)
+    assert first.try_acquire('k')  # the second owner's lease expired
+    first.close()
+    second.close()
+
+
+def test_lease_is_held_across_processes(tmp_path):
+    path = str(tmp_path / 'leases.sqlite3')
+    holder = subprocess.Popen(
+        [sys.executable, '-c', _HOLDER, path],
+        cwd=ROOT, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+    )
+    try:
+        assert holder.stdout.readline().strip() == 'held'
+        lease = SQLiteLease(path, ttl=30, poll_interval=0.05)
+        assert not lease.try_acquire('captions:abc:en:')
+
+        acquired = threading.Event()
+
+        def wait_for_lease():
+            with lease.hold('captions:abc:en:'):
+                acquired.set()
+
+        waiter = threading.Thread(target=wait_for_lease)
+        waiter.start()
+        assert not acquired.wait(0.3)
+        holder.stdin.write('\n')
+        holder.stdin.flush()
+        assert acquired.wait(10)
+        waiter.join(5)
+        lease.close()
+    finally:
+        holder.stdin.close()
+        holder.wait(10)
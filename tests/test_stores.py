@@ -0,0 +1,36 @@
+import threading
+
+from stores import ProcessWide, open_sqlite
+
+_SCHEMA = "CREATE TABLE IF NOT EXISTS items (key TEXT PRIMARY KEY);"
+
+
+def test_open_sqlite_creates_the_directory_and_uses_wal(tmp_path):
+    conn = open_sqlite(str(tmp_path / 'nested' / 'store.sqlite3'), _SCHEMA)
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    conn.execute("INSERT INTO items VALUES ('a')")
+    assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 1
+    conn.close()
+
+
+def test_process_wide_builds_one_instance():
+    built = []
+    store = ProcessWide(lambda: built.append(object()) or built[-1])
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(store.get())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(built) == 1
+    assert all(result is built[0] for result in results)
+
+
+def test_journal_mode_can_be_chosen_per_store(tmp_path, monkeypatch):
+    conn = open_sqlite(str(tmp_path / 'lease.sqlite3'), _SCHEMA, journal_mode='DELETE')
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'delete'
+    conn.close()
+    monkeypatch.setenv('SQLITE_JOURNAL_MODE', 'DELETE')
+    conn = open_sqlite(str(tmp_path / 'cache.sqlite3'), _SCHEMA)
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'delete'
+    conn.close()
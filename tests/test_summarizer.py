@@ -0,0 +1,94 @@
+import random
+import threading
+import time
+
+import pytest
+
+import summarizer
+from caption_parser import CueStore, CueTexts
+from summary_cache import SummaryCache
+
+
+def _cues(sentences):
+    cues = CueStore('en', 'standard')
+    for i in range(sentences):
+        cues.append(i * 4.0, i * 4.0 + 4.0, f"Part{i:03d} talks about caching and latency budgets in detail.")
+    return cues
+
+
+def test_fragments_have_the_same_final_key_as_the_joined_text():
+    cues = _cues(30)
+    assert summarizer.final_summary_key(CueTexts(cues)) == summarizer.final_summary_key(cues.text())
+    assert summarizer.final_summary_key(iter(CueTexts(cues))) is None
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    """Chunk summaries name the first part of their chunk; merges concatenate their inputs"""
+    state = {'running': 0, 'max_running': 0, 'chunks': 0}
+    lock = threading.Lock()
+
+    def stream_chunk(client, chunk, cache, prompt=summarizer.SUMMARY_USER_PROMPT, manifest=None):
+        if prompt == summarizer.REDUCE_USER_PROMPT:
+            yield ' '.join(chunk.split('\n\n'))
+            return
+        with lock:
+            state['running'] += 1
+            state['chunks'] += 1
+            state['max_running'] = max(state['max_running'], state['running'])
+        try:
+            time.sleep(random.uniform(0, 0.01))
+            yield chunk.split()[0]
+        finally:
+            with lock:
+                state['running'] -= 1
+
+    monkeypatch.setattr(summarizer, 'stream_chunk', stream_chunk)
+    monkeypatch.setattr(summarizer, 'summarize_chunk',
+                        lambda client, chunk, cache, prompt=summarizer.SUMMARY_USER_PROMPT, manifest=None:
+                        ''.join(stream_chunk(client, chunk, cache, prompt, manifest)))
+    monkeypatch.setattr(summarizer, 'get_openai_client', lambda api_key: None)
+    monkeypatch.setattr(summarizer, 'get_summary_cache', lambda: SummaryCache(':memory:'))
+    monkeypatch.setattr(summarizer, 'SUMMARY_CHUNK_TOKENS', 40)
+    return state
+
+
+def test_stream_keeps_a_bounded_window_and_merges_in_order(fake_openai):
+    cues = _cues(120)
+    events = list(summarizer.stream_summary_with_gpt4(CueTexts(cues), 'sk-test', concurrency=3))
+
+    assert fake_openai['max_running'] <= 3
+    plans = [event.index for event in events if event.kind == 'plan']
+    assert plans[-1] == fake_openai['chunks'] > 3
+    assert sum(event.kind == 'chunk_done' for event in events) == fake_openai['chunks']
+    summary = events[-1].text
+    assert events[-1].kind == 'done'
+    # Every chunk summary arrives exactly once, in transcript order
+    parts = summary.split()
+    assert parts == sorted(parts) and len(parts) == len(set(parts)) == fake_openai['chunks']
+
+
+def test_stream_cuts_chunks_lazily(fake_openai, monkeypatch):
+    cut = []
+    iter_chunks = summarizer.iter_chunks
+
+    def counting_iter_chunks(*args, **kwargs):
+        for chunk in iter_chunks(*args, **kwargs):
+            cut.append(chunk)
+            yield chunk
+
+    monkeypatch.setattr(summarizer, 'iter_chunks', counting_iter_chunks)
+    stream = summarizer.stream_summary_with_gpt4(CueTexts(_cues(120)), 'sk-test', concurrency=2)
+    for event in stream:
+        if event.kind == 'chunk_done':
+            break
+    # Only the window and one chunk of lookahead have been cut so far
+    assert len(cut) <= 3
+    stream.close()
+
+
+def test_blocking_and_streamed_paths_agree(fake_openai):
+    cues = _cues(120)
+    streamed = list(summarizer.stream_summary_with_gpt4(CueTexts(cues), 'sk-test', concurrency=3))[-1].text
+    blocking = summarizer.generate_summary_with_gpt4(CueTexts(cues), 'sk-test', concurrency=3)
+    assert blocking == streamed
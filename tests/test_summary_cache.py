@@ -0,0 +1,52 @@
+import itertools
+
+import pytest
+
+import summary_cache
+from summary_cache import SummaryCache, fragments_summary_key, summary_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A clock that moves one second per reading"""
+    class Clock:
+        ticks = itertools.count(1000)
+
+        @classmethod
+        def time(cls):
+            return float(next(cls.ticks))
+
+    monkeypatch.setattr(summary_cache, 'time', Clock)
+    return Clock
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = SummaryCache(':memory:', ttl=5)
+    cache.put('key', 'summary')
+    assert cache.get('key') == 'summary'
+    for _ in range(10):
+        clock.time()
+    assert cache.get('key') is None
+
+
+def test_least_recently_used_entries_are_evicted_above_max_entries(clock):
+    cache = SummaryCache(':memory:', max_entries=2)
+    cache.put('a', 'A')
+    cache.put('b', 'B')
+    assert cache.get('a') == 'A'  # a is now more recent than b
+    cache.put('c', 'C')
+    assert cache.get('a') == 'A'
+    assert cache.get('b') is None
+    assert cache.get('c') == 'C'
+
+
+def test_keys_depend_on_every_input():
+    messages = [{'role': 'user', 'content': 'Summarize'}]
+    key = summary_key('captions', 'gpt-4', messages, temperature=0.3)
+    assert key == summary_key('captions', 'gpt-4', messages, temperature=0.3)
+    assert key != summary_key('captions!', 'gpt-4', messages, temperature=0.3)
+    assert key != summary_key('captions', 'gpt-4o', messages, temperature=0.3)
+    assert key != summary_key('captions', 'gpt-4', messages, temperature=0.7)
+    fragments = ['Say "hi"', 'to\nthe ünïcode', 'crowd']
+    assert fragments_summary_key(fragments, 'gpt-4', messages, temperature=0.3) == \
+        summary_key(' '.join(fragments), 'gpt-4', messages, temperature=0.3)